@@ -0,0 +1,334 @@
+#!/usr/bin/env python3
+"""捕获热路径性能测试
+
+在Linux上无界面运行，剪贴板和前台窗口都使用假的实现。覆盖：
+- utils.sanitize_text / utils.truncate_text
+- utils.save_text_to_docx（文档已有10/1000/10000段）和 DocxWriter 追加
+- utils.probe_selected_text（假剪贴板，有/没有选中文本）
+- capture_core.CaptureProcessor.process 吞吐（过滤、去重、选区合并和打标签）
+- metrics 记录一个阶段耗时的开销
+- Config.get_text_source_tag、Config.set / save_config
+
+结果保存为JSON，指定 --compare 时与之前的结果对比，变慢超过阈值的项标记为退步并以非零状态退出
+
+用法：
+    python benchmarks/bench_hot_path.py [--output results.json] [--compare baseline.json]
+                                        [--threshold 0.25] [--filter 名称片段] [--repeat 5]
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import timeit
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# 配置文件和文档都写到临时目录，不影响用户数据；Qt使用离屏平台
+WORK_DIR = tempfile.mkdtemp(prefix='text_capture_bench_')
+os.environ['APPDATA'] = WORK_DIR
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+import config
+import utils
+from docx_writer import CaptureEntry, DocxWriter
+
+RESULTS_DIR = os.path.join(ROOT, 'benchmarks', 'results')
+
+# 只输出警告以上的日志，避免测试输出被每次保存的INFO日志淹没
+utils.configure_logging(level='WARNING')
+
+# 测试项：名称 -> 准备函数；准备函数返回被测的无参函数，无法运行时抛出 SkipBenchmark
+BENCHMARKS = {}
+
+
+class SkipBenchmark(Exception):
+    """当前环境无法运行该测试项"""
+
+
+def benchmark(name):
+    """注册测试项"""
+    def register(setup):
+        BENCHMARKS[name] = setup
+        return setup
+    return register
+
+
+def make_text(size, seed=1):
+    """生成指定大小（字符数）的中英文混合文本"""
+    rng = random.Random(seed)
+    words = ['capture', 'text', 'tool', 'selection', '文本', '捕获', '剪贴板', '段落', '\t', '　', '  ']
+    parts = []
+    length = 0
+    while length < size:
+        part = '\n' if rng.random() < 0.02 else rng.choice(words) + ' '
+        parts.append(part)
+        length += len(part)
+    return ''.join(parts)[:size]
+
+
+def install_fake_window(process_name='wechat.exe'):
+    """把全局进程名缓存换成固定前台窗口的假实现"""
+    utils.process_name_cache = utils.ProcessNameCache(
+        foreground_window_func=lambda: 1001,
+        window_pid_func=lambda hwnd: 42,
+        create_time_func=lambda pid: 1.0,
+        process_name_func=lambda pid: process_name,
+    )
+
+
+# ---------------------------------------------------------------- 文本处理
+
+@benchmark('sanitize_text[1KB]')
+def bench_sanitize_small():
+    text = make_text(1024)
+    return lambda: utils.sanitize_text(text)
+
+
+@benchmark('sanitize_text[100KB]')
+def bench_sanitize_large():
+    text = make_text(100 * 1024)
+    return lambda: utils.sanitize_text(text)
+
+
+@benchmark('truncate_text[10KB]')
+def bench_truncate():
+    text = make_text(10 * 1024)
+    return lambda: utils.truncate_text(text, 100)
+
+
+# ---------------------------------------------------------------- 文档写入
+
+def make_document(paragraphs):
+    """创建已有 paragraphs 段的临时文档"""
+    from docx_stream import write_docx_stream
+
+    path = os.path.join(WORK_DIR, f'existing_{paragraphs}.docx')
+    write_docx_stream(path, (CaptureEntry(f'已有段落 {i} ' + 'x' * 40, '[测试]') for i in range(paragraphs)))
+    return path
+
+
+def bench_save_text_to_docx(paragraphs):
+    try:
+        import docx  # noqa: F401
+    except ImportError:
+        raise SkipBenchmark('未安装python-docx')
+    path = make_document(paragraphs)
+    return lambda: utils.save_text_to_docx('新捕获的文本', path, '[测试]')
+
+
+for _count in (10, 1000, 10000):
+    benchmark(f'save_text_to_docx[{_count}]')(lambda count=_count: bench_save_text_to_docx(count))
+
+
+@benchmark('DocxWriter.append[flush_every=20]')
+def bench_docx_writer_append():
+    try:
+        import docx  # noqa: F401
+    except ImportError:
+        raise SkipBenchmark('未安装python-docx')
+    writer = DocxWriter(make_document(1000), flush_every=20)
+    writer.open()
+    return lambda: writer.append('新捕获的文本', '[测试]')
+
+
+# ---------------------------------------------------------------- 捕获
+
+@benchmark('probe_selected_text[fake clipboard]')
+def bench_probe():
+    import clipboard_tx
+
+    clipboard = clipboard_tx.MemoryClipboard({'text': '原来的剪贴板内容', 'html': b'<b>html</b>'},
+                                             selection='选中的文本 selected text')
+    stats = utils.ProbeStats()
+    return lambda: utils.probe_selected_text(clipboard, clipboard.send_copy, deadline=0.3, stats=stats)
+
+
+@benchmark('probe_selected_text[no selection]')
+def bench_probe_no_selection():
+    import clipboard_tx
+
+    clipboard = clipboard_tx.MemoryClipboard({'text': '原来的剪贴板内容'})
+    stats = utils.ProbeStats()
+    return lambda: utils.probe_selected_text(clipboard, clipboard.send_copy, deadline=0,
+                                             sleep=lambda seconds: None, stats=stats)
+
+
+@benchmark('CaptureProcessor.process')
+def bench_process():
+    import capture_core
+
+    install_fake_window()
+    processor = capture_core.CaptureProcessor(session_id='bench')
+    # 互不相关的文本，避免被去重或选区合并
+    texts = [f'捕获 {i} ' + make_text(200, seed=i) for i in range(2000)]
+    position = [0]
+
+    def capture():
+        processor.last_selection_time = 0  # 跳过2秒防抖
+        processor.process(texts[position[0] % len(texts)])
+        position[0] += 1
+
+    return capture
+
+
+# ---------------------------------------------------------------- 指标
+
+@benchmark('metrics.timed')
+def bench_metrics_timed():
+    import metrics
+    registry = metrics.MetricsRegistry()
+
+    def record():
+        with registry.timed('probe'):
+            pass
+
+    return record
+
+
+# ---------------------------------------------------------------- 配置
+
+@benchmark('Config.get_text_source_tag[hit]')
+def bench_tag_hit():
+    return lambda: config.config.get_text_source_tag('WeChat.exe')
+
+
+@benchmark('Config.get_text_source_tag[5000 processes]')
+def bench_tag_many():
+    names = [f'process_{i}.exe' for i in range(5000)]
+    position = [0]
+
+    def lookup():
+        config.config.get_text_source_tag(names[position[0] % len(names)])
+        position[0] += 1
+
+    return lookup
+
+
+@benchmark('Config.set[changed]')
+def bench_config_set():
+    values = [1.0, 1.5]
+    position = [0]
+
+    def set_value():
+        config.config.set('capture_interval', values[position[0] % 2])
+        position[0] += 1
+
+    return set_value
+
+
+@benchmark('Config.save_config[unchanged]')
+def bench_config_save_unchanged():
+    config.config.save_config()
+    return config.config.save_config
+
+
+# ---------------------------------------------------------------- 运行与对比
+
+def run_benchmark(func, repeat):
+    """自动确定每轮调用次数（每轮至少0.2秒），返回单次调用耗时的统计（微秒）"""
+    timer = timeit.Timer(func)
+    number, _ = timer.autorange()
+    timings = [t / number * 1e6 for t in timer.repeat(repeat=repeat, number=number)]
+    return {
+        'median_us': round(statistics.median(timings), 3),
+        'min_us': round(min(timings), 3),
+        'number': number,
+        'repeat': repeat,
+    }
+
+
+def git_revision():
+    """当前git提交（不在git仓库中时返回None）"""
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline, threshold):
+    """与基线结果对比，返回退步的测试项名称"""
+    regressions = []
+    print(f"\n与基线对比（{baseline['meta'].get('time')}，{baseline['meta'].get('revision')}）：")
+    for name, result in results.items():
+        old = baseline['results'].get(name)
+        if 'median_us' not in result or not old or 'median_us' not in old:
+            continue
+        ratio = result['median_us'] / old['median_us']
+        flag = ''
+        if ratio > 1 + threshold:
+            flag = '  <-- 退步'
+            regressions.append(name)
+        elif ratio < 1 - threshold:
+            flag = '  (变快)'
+        print(f"  {name:<45} {old['median_us']:>12.2f} -> {result['median_us']:>12.2f}us  x{ratio:.2f}{flag}")
+    return regressions
+
+
+def main():
+    """运行测试、保存结果并与基线对比"""
+    parser = argparse.ArgumentParser(description='捕获热路径性能测试')
+    parser.add_argument('--output', help='结果JSON路径（默认保存到 benchmarks/results/）')
+    parser.add_argument('--compare', help='作为基线的结果JSON')
+    parser.add_argument('--threshold', type=float, default=0.25, help='变慢超过该比例视为退步')
+    parser.add_argument('--filter', help='只运行名称包含该文本的测试项')
+    parser.add_argument('--repeat', type=int, default=5, help='每项测量的轮数')
+    options = parser.parse_args()
+
+    results = {}
+    devnull = open(os.devnull, 'w')
+    try:
+        for name, setup in BENCHMARKS.items():
+            if options.filter and options.filter not in name:
+                continue
+            try:
+                # 被测函数的控制台输出（如保存配置时的提示）不计入结果显示
+                with contextlib.redirect_stdout(devnull):
+                    results[name] = run_benchmark(setup(), options.repeat)
+                print(f"{name:<45} {results[name]['median_us']:>12.2f}us")
+            except SkipBenchmark as e:
+                results[name] = {'skipped': str(e)}
+                print(f"{name:<45} {'跳过':>12}  {e}")
+    finally:
+        devnull.close()
+        utils.stop_logging()
+        shutil.rmtree(WORK_DIR, ignore_errors=True)
+
+    report = {
+        'meta': {
+            'time': datetime.now().isoformat(timespec='seconds'),
+            'revision': git_revision(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+        },
+        'results': results,
+    }
+    output = options.output or os.path.join(
+        RESULTS_DIR, f"hot_path_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\n结果已保存：{output}")
+
+    if options.compare:
+        with open(options.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, options.threshold)
+        if regressions:
+            print(f"性能退步：{', '.join(regressions)}")
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
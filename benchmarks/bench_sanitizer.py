@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""文本清理性能测试
+
+逐次对比旧的多遍清理和新的清理器（都是单次调用的耗时），输入为10KB~1MB的中英文混合文本。
+旧版把换行也合并为空格，与之对应的是不保留段落的策略；默认策略保留段落，单独列出
+
+用法：python benchmarks/bench_sanitizer.py
+"""
+
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import sanitizer
+
+
+def legacy_sanitize(text):
+    """旧版 utils.sanitize_text 的实现"""
+    sanitized = text.strip()
+    sanitized = '\n'.join([line.strip() for line in sanitized.split('\n') if line.strip()])
+    sanitized = ' '.join(sanitized.split())
+    return sanitized
+
+
+def make_text(size, seed=1):
+    """生成指定大小（字符数）的中英文混合文本，包含段落、多余空格、制表符和全角空格"""
+    rng = random.Random(seed)
+    words = ['capture', 'text', 'tool', 'selection', '文本', '捕获', '剪贴板', '段落',
+             'the', 'of', 'and', '数据', '处理', '\t', '　', '  ']
+    parts = []
+    length = 0
+    while length < size:
+        if rng.random() < 0.02:
+            part = rng.choice(['\n', '\r\n', '\n\n  '])
+        else:
+            part = rng.choice(words) + ' '
+        parts.append(part)
+        length += len(part)
+    return ''.join(parts)[:size]
+
+
+def bench(func, text, number, repeat=5):
+    """返回单次调用的耗时（毫秒，取多轮中最快的一轮的平均值）"""
+    return min(timeit.repeat(lambda: func(text), number=number, repeat=repeat)) / number * 1000
+
+
+def main():
+    """运行测试并打印结果"""
+    flat = sanitizer.TextSanitizer(sanitizer.SanitizePolicy(preserve_paragraphs=False))
+    print(f"{'输入大小':>10} {'旧版(ms)':>10} {'新版(ms)':>10} {'加速比':>8} {'保留段落(ms)':>14}")
+    for size in (10 * 1024, 100 * 1024, 1024 * 1024):
+        text = make_text(size)
+        number = max(3, 2000000 // size)
+        legacy = bench(legacy_sanitize, text, number)
+        current = bench(flat.sanitize, text, number)
+        paragraphs = bench(sanitizer.sanitize, text, number)
+        print(f"{size // 1024:>8}KB {legacy:>10.3f} {current:>10.3f} {legacy / current:>7.2f}x {paragraphs:>14.3f}")
+
+
+if __name__ == '__main__':
+    main()
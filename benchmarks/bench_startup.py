@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""启动性能测试
+
+在独立的子进程中多次测量（取中位数），每次都是全新的解释器：
+- 各模块的导入耗时（扣除空解释器的启动时间）
+- 从启动到托盘图标显示的耗时（需要PyQt5，main.py --exit-after-startup；
+  没有显示器时使用 offscreen 平台，托盘无法启动时跳过该项）
+- 无界面守护进程的启动耗时（main.py --headless --exit-after-startup）
+
+程序把日志、默认文档和日志目录写在程序所在目录，测试时在临时目录中的源码副本里运行，
+配置目录（APPDATA）也指向临时目录，不会在仓库或用户目录中留下文件。
+任何一项超过预算时以非零状态退出，可用于发现启动变慢
+
+用法：python benchmarks/bench_startup.py [--runs 7] [--budget-import-ms 150] [--budget-tray-ms 1500]
+                                         [--budget-headless-ms 500]
+"""
+
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 需要测量导入耗时的模块
+IMPORT_MODULES = ('config', 'utils', 'sanitizer', 'docx_writer', 'journal', 'capture_core')
+
+
+def copy_sources(work_dir):
+    """把程序源码复制到临时目录，返回副本目录"""
+    source_dir = os.path.join(work_dir, 'src')
+    shutil.copytree(ROOT, source_dir, ignore=shutil.ignore_patterns(
+        '.git', 'benchmarks', '__pycache__', 'text_capture*', '*.db', '*.journal'))
+    return source_dir
+
+
+def run_once(args, env, cwd):
+    """运行一次子进程，返回耗时（毫秒）"""
+    start = time.perf_counter()
+    subprocess.run([sys.executable] + args, cwd=cwd, env=env, check=True,
+                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return (time.perf_counter() - start) * 1000
+
+
+def median_ms(args, env, cwd, runs):
+    """多次运行取中位数（毫秒）"""
+    return statistics.median(run_once(args, env, cwd) for _ in range(runs))
+
+
+def has_pyqt5(env, cwd):
+    """当前解释器是否能导入PyQt5"""
+    result = subprocess.run([sys.executable, '-c', 'import PyQt5.QtWidgets'], cwd=cwd, env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return result.returncode == 0
+
+
+def main():
+    """运行测试、打印结果并检查预算"""
+    parser = argparse.ArgumentParser(description='启动性能测试')
+    parser.add_argument('--runs', type=int, default=7, help='每项测量的运行次数')
+    parser.add_argument('--budget-import-ms', type=float, default=150.0,
+                        help='单个模块导入耗时预算（毫秒，已扣除解释器启动时间）')
+    parser.add_argument('--budget-tray-ms', type=float, default=1500.0,
+                        help='启动到托盘图标显示的耗时预算（毫秒）')
+    parser.add_argument('--budget-headless-ms', type=float, default=500.0,
+                        help='无界面守护进程启动并退出的耗时预算（毫秒）')
+    options = parser.parse_args()
+
+    # 使用临时配置目录和源码副本，避免读写用户的配置文件或在仓库中留下日志和文档
+    with tempfile.TemporaryDirectory() as app_data:
+        source_dir = copy_sources(app_data)
+        # 副本是临时的，允许写入 __pycache__，预热后各次运行都使用已编译的字节码
+        env = dict(os.environ, APPDATA=app_data)
+        env.pop('PYTHONDONTWRITEBYTECODE', None)
+        # 没有显示器时托盘程序无法创建窗口，使用 offscreen 平台
+        env.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+        # 预热一次，让 __pycache__ 和磁盘缓存就绪
+        run_once(['-c', 'import ' + ', '.join(IMPORT_MODULES)], env, source_dir)
+        baseline = median_ms(['-c', 'pass'], env, source_dir, options.runs)
+        print(f"空解释器启动：{baseline:.1f}ms")
+
+        failures = []
+        for module in IMPORT_MODULES:
+            elapsed = median_ms(['-c', f'import {module}'], env, source_dir, options.runs) - baseline
+            status = 'OK' if elapsed <= options.budget_import_ms else '超出预算'
+            print(f"import {module:<12} {elapsed:>8.1f}ms  {status}")
+            if elapsed > options.budget_import_ms:
+                failures.append(f'import {module}')
+
+        # 会话文档和捕获存储都写到临时目录
+        config_dir = os.path.join(app_data, 'TextCaptureTool')
+        os.makedirs(config_dir, exist_ok=True)
+        with open(os.path.join(config_dir, 'config.json'), 'w', encoding='utf-8') as f:
+            json.dump({'capture_db_path': os.path.join(app_data, 'bench.db')}, f)
+        headless_args = ['main.py', '--headless', '--exit-after-startup',
+                         '--output', os.path.join(app_data, 'bench_session.jsonl')]
+        elapsed = median_ms(headless_args, env, source_dir, options.runs)
+        status = 'OK' if elapsed <= options.budget_headless_ms else '超出预算'
+        print(f"无界面启动         {elapsed:>8.1f}ms  {status}")
+        if elapsed > options.budget_headless_ms:
+            failures.append('无界面启动')
+
+        if has_pyqt5(env, source_dir):
+            try:
+                elapsed = median_ms(['main.py', '--exit-after-startup'], env, source_dir, options.runs)
+            except subprocess.CalledProcessError as e:
+                print(f"托盘程序无法启动（退出码{e.returncode}），跳过托盘图标启动测试")
+            else:
+                status = 'OK' if elapsed <= options.budget_tray_ms else '超出预算'
+                print(f"启动到托盘图标     {elapsed:>8.1f}ms  {status}")
+                if elapsed > options.budget_tray_ms:
+                    failures.append('启动到托盘图标')
+        else:
+            print("未安装PyQt5，跳过托盘图标启动测试")
+
+    if failures:
+        print(f"超出启动预算：{', '.join(failures)}")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
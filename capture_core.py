@@ -0,0 +1,638 @@
+#!/usr/bin/env python3
+"""捕获引擎（不依赖PyQt）
+
+捕获的完整流程：探测 -> 过滤 -> 去重/选区合并 -> 打标签 -> 写入存储和文档。
+托盘程序（tray_app）和无界面守护进程（capture_daemon）共用这里的实现：
+- CaptureLoop：从捕获来源循环获取文本，把文本交给回调
+- CaptureProcessor：过滤、去重、选区合并和打标签，返回需要写入的 CaptureEntry
+- CaptureWriter：有界队列 + 批量写入捕获存储和输出文件
+
+这些类只使用标准库线程，状态变化通过回调通知，
+托盘程序在 QThread 中运行它们并把回调接到Qt信号上
+"""
+
+import os
+import queue
+import threading
+import time
+import traceback
+from datetime import datetime
+
+import capture_scheduler
+import capture_sources
+import capture_store
+import config
+import journal
+import metrics
+import output_sinks
+import sanitizer
+import shards
+import utils
+from dedup import RecentCaptureIndex
+from docx_writer import CaptureEntry
+from selection_merge import SelectionMerger
+
+# 程序所在目录，会话文档默认保存在这里
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# 两次新增捕获的最短间隔（秒），更短的视为重复捕获
+MIN_CAPTURE_INTERVAL = 2
+
+# 捕获引擎
+ENGINE_THREAD = 'thread'  # CaptureLoop：一个线程依次完成各步骤
+ENGINE_ASYNCIO = 'asyncio'  # capture_pipeline.CapturePipeline：分阶段流水线
+
+
+def configure_runtime():
+    """按配置设置日志级别和轮转、清理过期的轮转日志，并创建文本清理器"""
+    utils.configure_logging(
+        level=config.config.get_log_level(),
+        max_bytes=config.config.get_log_max_bytes(),
+        backup_count=config.config.get_log_backup_count(),
+    )
+    utils.clean_old_logs()
+    sanitizer.configure(config.config.get_sanitize_policy())
+
+
+def recover_journals(app_dir=APP_DIR):
+    """恢复上次异常退出时尚未写入文档的捕获，返回恢复的条数"""
+    recovered = journal.replay_pending_journals(app_dir)
+    if recovered:
+        utils.logger.info(f"已从捕获日志恢复{recovered}条文本")
+    return recovered
+
+
+# ---------------------------------------------------------------- 输出
+
+def get_output_format(path=None):
+    """当前配置的输出格式（auto 时按路径的扩展名判断）"""
+    return output_sinks.resolve_output_format(config.config.get_output_format(), path or config.config.get_docx_path())
+
+
+def new_session_path(app_dir=APP_DIR):
+    """新会话文档路径：程序目录下带时间戳的文件，扩展名与输出格式一致"""
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    extension = output_sinks.FORMAT_EXTENSIONS[get_output_format()]
+    return os.path.join(app_dir, f'text_capture_{timestamp}{extension}')
+
+
+def create_output_sink(path):
+    """创建会话输出：配置了分片上限时按上限自动分片（见 shards）"""
+    max_bytes = config.config.get_rollover_max_bytes()
+    max_entries = config.config.get_rollover_max_entries()
+    max_age = config.config.get_rollover_period()
+    if max_bytes > 0 or max_entries > 0 or max_age > 0:
+        return shards.RollingSink(path, create_shard_sink, max_bytes, max_entries, max_age)
+    return create_shard_sink(path)
+
+
+def create_shard_sink(path):
+    """按配置的输出格式和刷新策略创建一个文件的输出（docx格式带预写日志）"""
+    output_format = get_output_format(path)
+    capture_journal = None
+    if output_format == output_sinks.FORMAT_DOCX:
+        capture_journal = journal.CaptureJournal(
+            journal.get_journal_path(path),
+            path,
+            fsync_mode=config.config.get_journal_fsync(),
+            fsync_interval_ms=config.config.get_journal_fsync_interval_ms(),
+        )
+    return output_sinks.create_sink(
+        path,
+        output_format,
+        journal=capture_journal,
+        flush_every=config.config.get_docx_flush_every(),
+        flush_interval=config.config.get_docx_flush_interval(),
+    )
+
+
+def create_store():
+    """按配置创建捕获存储，未开启时返回None"""
+    if config.config.is_capture_store_enabled():
+        return capture_store.CaptureStore(config.config.get_capture_db_path())
+    return None
+
+
+# ---------------------------------------------------------------- 捕获来源
+
+def create_capture_source():
+    """按配置创建捕获来源"""
+    return capture_sources.create_capture_source(
+        config.config.get_capture_backend(),
+        probe_deadline=config.config.get_probe_deadline_ms() / 1000.0,
+    )
+
+
+def create_scheduler():
+    """按配置创建轮询调度器"""
+    return capture_scheduler.create_scheduler(
+        config.config.get_capture_scheduler(),
+        min_interval=config.config.get_capture_interval_min(),
+        max_interval=config.config.get_capture_interval_max(),
+        initial_interval=config.config.get_capture_interval(),
+    )
+
+
+def create_pipeline(source, scheduler, processor, submit, max_capture_time=0, max_capture_count=0, **callbacks):
+    """按配置的队列容量和并发数创建分阶段捕获流水线
+
+    Args:
+        submit: 提交捕获的函数 submit(entry, timeout) -> bool
+        callbacks: on_entry / on_queue_depths 回调，writer_alive 写入线程是否仍在运行
+    """
+    # 只有使用流水线时才加载asyncio
+    import capture_pipeline
+
+    return capture_pipeline.CapturePipeline(
+        source, processor, submit, scheduler, max_capture_time, max_capture_count,
+        queue_size=config.config.get_pipeline_queue_size(),
+        concurrency=config.config.get_pipeline_concurrency(),
+        **callbacks
+    )
+
+
+def get_source_process_name():
+    """获取当前活动窗口的进程名，获取失败时返回None"""
+    try:
+        return utils.get_active_window_process_name()
+    except Exception as e:
+        utils.logger.debug("获取活动窗口进程名时发生错误：%s", e)
+        return None
+
+
+def get_text_source(process_name=None):
+    """根据活动窗口的进程名（未传入时自动获取）和窗口标题判断文本来源"""
+    try:
+        if process_name is None:
+            process_name = utils.get_active_window_process_name()
+
+        # 只有配置了窗口标题规则时才获取窗口标题
+        window_title = None
+        if config.config.get_tag_matcher().has_title_rules:
+            window_title = utils.get_active_window_title()
+
+        if process_name or window_title:
+            # 根据窗口标题和进程名返回对应的标签
+            return config.config.get_text_source_tag(process_name, window_title)
+        else:
+            return '[未知来源]'
+
+    except Exception as e:
+        # 如果无法获取来源信息，返回默认标签
+        utils.logger.debug("获取文本来源时发生错误：%s", e)
+        return '[未知来源]'
+
+
+class CaptureLoop:
+    """捕获循环：从捕获来源获取文本并交给 on_text 回调
+
+    事件驱动的来源阻塞等待变化；轮询来源由调度器决定探测间隔。
+    stop() 可以在任意线程中调用，会立即唤醒等待中的循环
+    """
+
+    def __init__(self, source=None, scheduler=None, max_capture_time=0, max_capture_count=0, on_text=None):
+        """初始化捕获循环
+
+        Args:
+            source: 捕获来源（见 capture_sources），默认为轮询探测
+            scheduler: 轮询调度器（见 capture_scheduler）
+            max_capture_time: 最长捕获时间（秒），<=0 表示不限
+            max_capture_count: 最多捕获次数，<=0 表示不限
+            on_text: 捕获到文本时调用的函数，参数为文本
+        """
+        self.source = source or capture_sources.SelectionProbeSource()
+        self.scheduler = scheduler or capture_scheduler.LadderScheduler()
+        self.timeout = max_capture_time
+        self.max_times = max_capture_count
+        self.on_text = on_text
+        self.is_running = True
+        self.capture_count = 0
+        self.start_time = 0
+        self.stop_event = threading.Event()
+
+    def run(self):
+        """运行捕获循环，直到停止、超时或达到最大次数"""
+        self.start_time = time.time()
+
+        try:
+            if self.source.event_driven:
+                self.run_event_driven()
+            else:
+                self.run_polling()
+        finally:
+            self.source.close()
+            utils.logger.info(f"复制探测耗时统计：{utils.probe_stats.summary()}")
+
+    def should_continue(self):
+        """是否继续捕获（未停止、未超时、未达到最大次数）"""
+        if not self.is_running:
+            return False
+        if self.timeout > 0 and time.time() - self.start_time >= self.timeout:
+            return False
+        if self.max_times > 0 and self.capture_count >= self.max_times:
+            return False
+        return True
+
+    def emit(self, text):
+        """把捕获到的文本交给回调"""
+        if self.on_text is not None:
+            self.on_text(text)
+        self.capture_count += 1
+        metrics.increment('captured_texts')
+
+    def run_event_driven(self):
+        """事件驱动捕获：阻塞等待剪贴板变化，空闲时几乎不占用CPU"""
+        while self.should_continue():
+            try:
+                # 定期醒来检查停止/超时条件
+                selected_text = self.source.next_text(timeout=1.0)
+
+                if selected_text and self.is_running:
+                    self.emit(selected_text)
+
+            except Exception as e:
+                utils.logger.error(f"捕获文本时出错：{e}")
+                utils.logger.error(traceback.format_exc())
+                self.stop_event.wait(1.0)  # 出错后等待1秒
+
+    def run_polling(self):
+        """轮询捕获：由调度器根据命中情况决定探测间隔"""
+        self.scheduler.reset()
+
+        while self.should_continue():
+            try:
+                selected_text = self.source.next_text(timeout=0)
+
+                if selected_text:
+                    self.emit(selected_text)
+
+                # 智能捕获间隔控制（停止时立即醒来）
+                interval = self.scheduler.next_interval(bool(selected_text), utils.is_user_active())
+                self.stop_event.wait(interval)
+
+            except Exception as e:
+                utils.logger.error(f"捕获文本时出错：{e}")
+                utils.logger.error(traceback.format_exc())
+                self.stop_event.wait(1.0)  # 出错后等待1秒
+
+    def stop(self):
+        """停止循环"""
+        self.is_running = False
+        self.stop_event.set()
+        self.source.wake()
+
+
+class CaptureProcessor:
+    """过滤、去重、选区合并和打标签
+
+    process() 对每段捕获到的文本做出决定，需要写入时返回 CaptureEntry，
+    否则返回None；写入由调用方提交给 CaptureWriter
+    """
+
+    def __init__(self, session_id=None, process_name_func=get_source_process_name, tag_func=get_text_source):
+        """初始化处理器
+
+        Args:
+            session_id: 捕获会话编号，默认生成新的编号
+            process_name_func: 获取来源进程名的函数
+            tag_func: 根据进程名获取来源标签的函数
+        """
+        self.process_name_func = process_name_func
+        self.tag_func = tag_func
+
+        # 最近捕获去重索引（按内容摘要跳过最近保存过的文本）
+        self.recent_captures = RecentCaptureIndex(
+            config.config.get_dedup_window_size(),
+            config.config.get_dedup_ttl(),
+        )
+        # 选区增长合并（拖动选择时更新同一条捕获而不是新增段落）
+        self.selection_merger = SelectionMerger(
+            config.config.get_merge_history_size(),
+            config.config.get_merge_window(),
+            config.config.get_merge_max_edit_distance(),
+        )
+        self.next_entry_id = 0
+        self.session_id = session_id or capture_store.new_session_id()
+        self.last_selected_text = ''
+        self.last_selection_time = 0
+        self.capture_count = 0
+
+    def reset(self, session_id=None):
+        """开始新的捕获会话：清空去重和合并状态，生成新的会话编号"""
+        self.recent_captures.clear()
+        self.selection_merger.clear()
+        self.session_id = session_id or capture_store.new_session_id()
+        self.last_selected_text = ''
+        self.last_selection_time = 0
+        self.capture_count = 0
+
+    def log_stats(self):
+        """记录本次会话的去重、合并和进程名缓存统计"""
+        utils.logger.info(f"本次捕获跳过重复文本：{self.recent_captures.suppressed_count}次")
+        utils.logger.info(f"本次捕获合并选区变化：{self.selection_merger.merged_count}次")
+        utils.logger.info(f"进程名缓存统计：{utils.process_name_cache.stats()}")
+
+    def make_entry(self, text, source_tag='[未知来源]', entry_id=None, replace=False, process_name=None):
+        """创建一条属于当前会话的捕获"""
+        return CaptureEntry(text, source_tag, entry_id, replace,
+                            process_name=process_name, captured_at=time.time(), session_id=self.session_id)
+
+    def check_duplicate(self, text):
+        """快速检查文本最近是否已经保存过（对未清理的原始文本计算摘要，重复时不必再清理）
+
+        Returns:
+            bytes: 文本摘要，重复时返回None
+        """
+        digest = self.recent_captures.digest(text)
+        if self.is_duplicate(digest):
+            return None
+        return digest
+
+    def is_duplicate(self, digest):
+        """检查摘要最近是否已经保存过"""
+        if self.recent_captures.is_duplicate(digest):
+            metrics.increment('duplicate_texts')
+            utils.logger.debug("检测到重复文本，已跳过处理")
+            return True
+        return False
+
+    def sanitize(self, text):
+        """清理捕获到的原始文本"""
+        with metrics.timed('sanitize'):
+            return utils.sanitize_text(text)
+
+    def is_valid(self, text):
+        """检查文本长度是否符合要求"""
+        min_length = config.config.get_min_text_length()
+        max_length = config.config.get_max_text_length()
+        if text and min_length <= len(text) <= max_length:
+            return True
+        utils.logger.debug("文本无效或长度不符合要求，已跳过")
+        return False
+
+    def admit(self, text, digest):
+        """决定文本是更新最近的捕获（选区增长）、新增捕获还是跳过，并更新去重状态
+
+        新增捕获时先分配编号并记录到选区合并历史（来源标签在打标签后由 complete() 补上），
+        这样打标签期间到达的选区变化也能合并到这条捕获
+
+        Returns:
+            tuple: (捕获编号, 选区合并记录 RecentEntry, 是否为更新)，跳过时返回None
+        """
+        current_time = time.time()
+
+        # 选区增长：更新最近的那条捕获而不是新增段落
+        merge_target = self.selection_merger.find_target(text)
+        if merge_target is not None:
+            self.selection_merger.update(merge_target, text)
+            metrics.increment('merged_texts')
+            self.recent_captures.add(digest)
+            self.last_selected_text = text
+            self.last_selection_time = current_time
+            return merge_target.entry_id, merge_target, True
+
+        # 选区收缩：最近的捕获已经包含这段文本，保留较长的那条
+        if self.selection_merger.find_covering(text) is not None:
+            metrics.increment('covered_texts')
+            utils.logger.debug("文本已包含在最近的捕获中，已跳过")
+            return None
+
+        # 检查时间间隔，避免重复捕获
+        if current_time - self.last_selection_time <= MIN_CAPTURE_INTERVAL:
+            utils.logger.debug("时间间隔过短，跳过重复捕获")
+            return None
+
+        entry_id = self.next_entry_id
+        self.next_entry_id += 1
+        recent = self.selection_merger.record(entry_id, text, None)
+        self.recent_captures.add(digest)
+        self.last_selected_text = text
+        self.last_selection_time = current_time
+        self.capture_count += 1
+        return entry_id, recent, False
+
+    def lookup_source(self):
+        """获取来源进程名和来源标签
+
+        Returns:
+            tuple: (进程名, 来源标签)
+        """
+        with metrics.timed('process_lookup'):
+            process_name = self.process_name_func()
+        with metrics.timed('tagging'):
+            source_tag = self.tag_func(process_name)
+        return process_name, source_tag
+
+    def complete(self, text, entry_id, recent, replace, process_name=None, source_tag=None):
+        """生成 admit() 接受的文本对应的捕获
+
+        Args:
+            recent: admit() 返回的选区合并记录
+            replace: 是否为更新（使用被更新捕获的来源标签）
+            process_name: 来源进程名（新增捕获）
+            source_tag: 来源标签（新增捕获）
+        """
+        if replace:
+            utils.logger.info(f"选区变化，已更新捕获：{utils.truncate_text(text, 50)}")
+            return self.make_entry(text, recent.source_tag, entry_id, replace=True)
+
+        recent.source_tag = source_tag
+        utils.logger.info(f"捕获到文本：{utils.truncate_text(text, 50)}")
+        utils.logger.info(f"来源：{source_tag}")
+        utils.logger.info(f"总捕获数：{self.capture_count}")
+        return self.make_entry(text, source_tag, entry_id, process_name=process_name)
+
+    def process(self, selected_text):
+        """处理捕获到的原始文本（依次去重、清理、过滤、合并判断和打标签）
+
+        Returns:
+            CaptureEntry: 需要写入的捕获（新增或更新），不需要写入时返回None
+        """
+        handle_start = time.perf_counter()
+        try:
+            # 快速检查：如果文本最近已经保存过，直接跳过
+            digest = self.check_duplicate(selected_text)
+            if digest is None:
+                return None
+            selected_text = self.sanitize(selected_text)
+
+            # 添加详细日志
+            if utils.debug_enabled():
+                utils.logger.debug("检测到选中文本：%s（长度：%d）", utils.truncate_text(selected_text, 100), len(selected_text))
+
+            if not self.is_valid(selected_text):
+                return None
+
+            admitted = self.admit(selected_text, digest)
+            if admitted is None:
+                return None
+
+            entry_id, recent, replace = admitted
+            process_name = source_tag = None
+            if not replace:
+                process_name, source_tag = self.lookup_source()
+            return self.complete(selected_text, entry_id, recent, replace, process_name, source_tag)
+
+        except Exception as e:
+            # 记录详细错误日志
+            utils.logger.error(f"处理捕获到的文本时发生错误：{e}")
+            utils.logger.error(traceback.format_exc())
+            return None
+        finally:
+            metrics.observe('handle', time.perf_counter() - handle_start)
+
+
+# 写入队列中的唤醒标记：停止时让等待中的写入线程立即醒来
+_WAKE = object()
+
+
+class CaptureWriter:
+    """在后台把捕获写入捕获存储和输出文件
+
+    捕获通过有界队列提交，run() 每次取出队列中所有等待的捕获，
+    整批写入后最多保存一次文档；输出可以是任意格式（见 output_sinks）。
+    run() 在写入线程中运行，状态变化通过回调通知（回调也在写入线程中调用）
+    """
+
+    def __init__(self, sink, queue_size=256, max_batch_size=500, store=None,
+                 on_saved=None, on_failed=None, on_queue_depth=None, on_backpressure=None):
+        """初始化写入器
+
+        Args:
+            sink: 输出（见 output_sinks / shards）
+            queue_size: 待写入队列容量
+            max_batch_size: 每批最多写入的捕获数
+            store: 捕获存储（CaptureStore），在写入线程中打开
+            on_saved: 一批捕获写入成功时调用，参数为条数
+            on_failed: 写入失败时调用，参数为错误信息
+            on_queue_depth: 待写入队列深度变化时调用，参数为深度
+            on_backpressure: 磁盘过慢导致队列积压时调用，参数为队列深度
+        """
+        self.sink = sink
+        self.store = store
+        self.queue = queue.Queue(maxsize=max(1, queue_size))
+        self.max_batch_size = max_batch_size
+        self.high_watermark = max(1, self.queue.maxsize * 3 // 4)  # 超过该深度视为积压
+        self.on_saved = on_saved
+        self.on_failed = on_failed
+        self.on_queue_depth = on_queue_depth
+        self.on_backpressure = on_backpressure
+        self.is_running = True
+        self.flush_requested = False  # 下一次循环时立即落盘
+
+    @property
+    def path(self):
+        """写入的文档路径"""
+        return self.sink.path
+
+    def queue_depth(self):
+        """当前待写入的捕获数"""
+        return self.queue.qsize()
+
+    @staticmethod
+    def _notify(callback, *args):
+        """调用回调（未设置时忽略）"""
+        if callback is not None:
+            callback(*args)
+
+    def submit(self, entry, timeout=0.5):
+        """提交一条捕获（CaptureEntry）
+
+        队列已满时最多等待 timeout 秒，仍然写不进去则返回False
+        """
+        depth = self.queue.qsize()
+        if depth >= self.high_watermark:
+            self._notify(self.on_backpressure, depth)
+
+        try:
+            self.queue.put(entry, timeout=timeout)
+        except queue.Full:
+            self._notify(self.on_backpressure, self.queue.qsize())
+            return False
+
+        self._notify(self.on_queue_depth, self.queue.qsize())
+        return True
+
+    def run(self):
+        """写入循环，停止后写完队列中剩余的捕获并关闭输出"""
+        if self.store is not None:
+            try:
+                self.store.open()
+            except Exception as e:
+                utils.logger.error(f"打开捕获存储失败：{e}")
+                self._notify(self.on_failed, f"打开捕获存储失败：{e}")
+                self.store = None
+
+        while self.is_running or not self.queue.empty():
+            try:
+                item = self.queue.get(timeout=0.5)
+            except queue.Empty:
+                # 空闲时按时间策略落盘
+                self.write_batch([])
+                continue
+            if item is _WAKE:
+                continue
+
+            # 取出所有等待中的捕获，整批写入
+            batch = [item]
+            while len(batch) < self.max_batch_size:
+                try:
+                    item = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is not _WAKE:
+                    batch.append(item)
+
+            self.write_batch(batch)
+            self._notify(self.on_queue_depth, self.queue.qsize())
+
+            if self.flush_requested:
+                self.flush()
+
+        try:
+            self.sink.close()
+        except Exception as e:
+            utils.logger.error(f"关闭文档失败：{e}")
+            self._notify(self.on_failed, str(e))
+
+        if self.store is not None:
+            self.store.close()
+
+    def write_batch(self, batch):
+        """写入一批捕获"""
+        try:
+            if batch:
+                # 先写入捕获存储（一个事务），再写入文档
+                if self.store is not None:
+                    with metrics.timed('store_write'):
+                        self.store.write_many(batch)
+                with metrics.timed('document_write'):
+                    self.sink.write_many(batch)
+                metrics.increment('saved_texts', len(batch))
+                self._notify(self.on_saved, len(batch))
+            elif self.flush_requested:
+                self.flush()
+            else:
+                self.sink.flush_if_due()
+        except Exception as e:
+            metrics.increment('save_failures')
+            utils.logger.error(f"写入文档失败：{e}")
+            utils.logger.error(traceback.format_exc())
+            self._notify(self.on_failed, str(e))
+
+    def flush(self):
+        """把已写入的捕获落盘（在写入线程中调用）"""
+        self.flush_requested = False
+        self.sink.flush()
+
+    def request_flush(self):
+        """请求写入线程尽快落盘（可在任意线程中调用）"""
+        self.flush_requested = True
+
+    def stop(self):
+        """停止写入（队列中剩余的捕获写完后 run() 返回）"""
+        self.is_running = False
+        try:
+            self.queue.put_nowait(_WAKE)
+        except queue.Full:
+            pass  # 队列中还有捕获，写入线程不会阻塞等待
@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""无界面捕获守护进程
+
+不加载PyQt，只在后台运行捕获引擎（capture_core），适合只需要后台收集文本的机器：
+    text-capture-tool --headless [--output 路径] [--max-time 秒] [--max-count 次]
+    python capture_daemon.py [同上参数]
+
+收到 SIGINT / SIGTERM（Windows 上还有 Ctrl+Break）时停止捕获，
+写完队列中剩余的捕获、落盘并关闭文档后退出；
+收到 SIGHUP（非Windows）时立即把已写入的捕获落盘，继续运行
+"""
+
+import argparse
+import signal
+import sys
+import threading
+
+import capture_core
+import config
+import metrics
+import profiling
+import utils
+
+
+class CaptureDaemon:
+    """在当前线程运行捕获循环，在写入线程批量写入"""
+
+    def __init__(self, output_path=None, max_capture_time=0, max_capture_count=0, source=None):
+        """初始化守护进程
+
+        Args:
+            output_path: 会话文档路径，默认为程序目录下带时间戳的新文件
+            max_capture_time: 最长捕获时间（秒），<=0 表示一直运行到收到停止信号
+            max_capture_count: 最多捕获次数，<=0 表示不限
+            source: 捕获来源，默认按配置创建
+        """
+        self.output_path = output_path or capture_core.new_session_path()
+        self.processor = capture_core.CaptureProcessor()
+        source = source or capture_core.create_capture_source()
+        scheduler = capture_core.create_scheduler()
+        # 捕获引擎：捕获线程（CaptureLoop）或分阶段流水线（CapturePipeline），都提供 run() / stop()
+        if config.config.get_capture_engine() == capture_core.ENGINE_ASYNCIO:
+            self.engine = capture_core.create_pipeline(
+                source, scheduler, self.processor, self.submit_entry, max_capture_time, max_capture_count,
+                on_queue_depths=self.handle_queue_depths,
+                writer_alive=self.is_writer_alive,
+            )
+        else:
+            self.engine = capture_core.CaptureLoop(source, scheduler, max_capture_time, max_capture_count,
+                                                   on_text=self.handle_text_captured)
+        self.writer = None
+        self.writer_thread = None
+        self.metrics_server = None
+        self.profiler = None
+
+    def start(self):
+        """打开会话文档，启动写入线程、指标接口和性能分析"""
+        sink = capture_core.create_output_sink(self.output_path)
+        sink.open()
+        sink.flush()
+        self.writer = capture_core.CaptureWriter(
+            sink,
+            config.config.get_writer_queue_size(),
+            store=capture_core.create_store(),
+            on_saved=lambda count: utils.logger.info(f"文本保存成功（{count}条）"),
+            on_backpressure=lambda depth: utils.logger.warning(f"写入队列积压，待写入：{depth}"),
+        )
+        self.writer_thread = threading.Thread(target=self.writer.run, name='capture-writer')
+        self.writer_thread.start()
+        utils.logger.info(f"创建新文档：{self.output_path}")
+
+        if config.config.is_metrics_endpoint_enabled():
+            try:
+                self.metrics_server = metrics.MetricsServer(metrics.registry, config.config.get_metrics_port()).start()
+                utils.logger.info(f"指标接口已启动：http://127.0.0.1:{self.metrics_server.port}/metrics")
+            except OSError as e:
+                utils.logger.error(f"启动指标接口失败：{e}")
+
+        if config.config.is_session_profiling_enabled():
+            self.profiler = profiling.SessionProfiler(
+                sample_interval=config.config.get_profile_sample_interval_ms() / 1000.0)
+            self.profiler.start()
+
+    def handle_text_captured(self, selected_text):
+        """处理捕获到的文本：过滤、去重和打标签后提交给写入线程"""
+        entry = self.processor.process(selected_text)
+        if entry is None:
+            return
+        with metrics.timed('submit'):
+            submitted = self.submit_entry(entry)
+        if not submitted:
+            utils.logger.error("保存文本失败：写入队列已满，磁盘写入过慢")
+
+    def submit_entry(self, entry, timeout=0.5):
+        """把一条捕获提交给写入线程"""
+        return self.writer.submit(entry, timeout)
+
+    def is_writer_alive(self):
+        """写入线程是否仍在运行"""
+        return self.writer_thread is not None and self.writer_thread.is_alive()
+
+    def handle_queue_depths(self, depths):
+        """流水线队列深度变化"""
+        if utils.debug_enabled():
+            utils.logger.debug("流水线队列深度：%s", depths)
+
+    def install_signal_handlers(self):
+        """注册停止和落盘信号（只能在主线程中调用）"""
+        signal.signal(signal.SIGINT, self.handle_stop_signal)
+        signal.signal(signal.SIGTERM, self.handle_stop_signal)
+        if hasattr(signal, 'SIGBREAK'):
+            signal.signal(signal.SIGBREAK, self.handle_stop_signal)
+        if hasattr(signal, 'SIGHUP'):
+            signal.signal(signal.SIGHUP, self.handle_flush_signal)
+
+    def handle_stop_signal(self, signum, frame):
+        """收到停止信号：结束捕获循环（之后由 run() 写完剩余捕获）"""
+        utils.logger.info(f"收到信号{signum}，停止捕获")
+        self.engine.stop()
+
+    def handle_flush_signal(self, signum, frame):
+        """收到落盘信号：让写入线程尽快落盘"""
+        utils.logger.info(f"收到信号{signum}，立即落盘")
+        if self.writer is not None:
+            self.writer.request_flush()
+
+    def run(self):
+        """运行到收到停止信号（或超时、达到最大次数），然后落盘退出"""
+        if threading.current_thread() is threading.main_thread():
+            self.install_signal_handlers()
+
+        self.start()
+        utils.logger.info("无界面捕获已开始")
+        try:
+            self.engine.run()
+        finally:
+            self.shutdown()
+        return 0
+
+    def shutdown(self):
+        """停止捕获，等待写入线程写完剩余捕获并关闭文档"""
+        self.engine.stop()
+        if self.writer_thread is not None:
+            self.writer.stop()
+            self.writer_thread.join()
+            self.writer_thread = None
+
+        self.processor.log_stats()
+        if self.profiler is not None:
+            self.profiler.stop()
+        if self.metrics_server is not None:
+            self.metrics_server.stop()
+            self.metrics_server = None
+        utils.logger.info(f"无界面捕获已停止，共捕获{self.processor.capture_count}条：{self.output_path}")
+
+
+def main(argv=None):
+    """无界面捕获入口"""
+    parser = argparse.ArgumentParser(prog='text-capture-tool --headless', description='无界面文本捕获')
+    parser.add_argument('--headless', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--output', help='会话文档路径（默认在程序目录下新建带时间戳的文件）')
+    parser.add_argument('--max-time', type=float, default=0, help='最长捕获时间（秒），0 表示不限')
+    parser.add_argument('--max-count', type=int, default=0, help='最多捕获次数，0 表示不限')
+    parser.add_argument('--exit-after-startup', action='store_true', help=argparse.SUPPRESS)
+    options = parser.parse_args(argv)
+
+    capture_core.configure_runtime()
+    capture_core.recover_journals()
+
+    daemon = CaptureDaemon(options.output, options.max_time, options.max_count)
+    # 启动性能测试：启动完成后立即退出（见 benchmarks/bench_startup.py）
+    if options.exit_after_startup:
+        daemon.engine.stop()
+    return daemon.run()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,371 @@
+#!/usr/bin/env python3
+"""分阶段捕获流水线（asyncio）
+
+CaptureLoop 在一个线程里依次完成获取、过滤、去重、打标签和提交，
+前一段文本打标签或写入变慢时，下一次探测也要等待。
+流水线把这些步骤拆成五个阶段，阶段之间用有界队列连接：
+
+    acquire -> filter -> dedup -> tag -> persist
+
+- acquire：从捕获来源获取文本（剪贴板访问在专用线程中执行，同一来源始终在同一线程）
+- filter：按原始文本快速去重，清理文本并检查长度
+- dedup：确认没有与仍在流水线中的文本重复，选区合并判断，分配捕获编号
+- tag：获取来源进程名并打标签（窗口和进程查询在线程池中执行）
+- persist：提交给写入器（CaptureWriter）写入存储和文档，写入器队列满时在线程中等待；
+  写入线程已经退出，或停止后等待超过 PERSIST_STOP_GRACE 秒时不再等待，把捕获内容记录到日志
+
+下游变慢时队列逐级填满，acquire 阶段在放入队列时等待，不再继续探测（背压）。
+每个阶段的并发数可以配置；acquire、dedup、persist 依赖先后顺序，固定为1。
+并发执行的阶段按进入时的顺序把结果交给下一阶段，选区合并的更新总在被更新的捕获之后写入。
+各阶段的队列深度记录为指标 pipeline_queue_depth
+"""
+
+import asyncio
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+import capture_scheduler
+import metrics
+import utils
+from docx_writer import format_capture
+
+STAGES = ('acquire', 'filter', 'dedup', 'tag', 'persist')
+
+# 依赖先后顺序、只能单个执行的阶段
+SERIAL_STAGES = ('acquire', 'dedup', 'persist')
+
+# 在线程中执行阻塞调用的阶段
+BLOCKING_STAGES = ('acquire', 'tag', 'persist')
+
+# 队列中的停止标记
+_STOP = object()
+
+# 停止后写入器队列仍然满时，persist 阶段最多再等待的秒数
+PERSIST_STOP_GRACE = 5.0
+
+
+class PipelineItem:
+    """在流水线中流动的一段文本及其处理结果"""
+
+    __slots__ = ('seq', 'text', 'digest', 'entry_id', 'recent', 'replace', 'process_name', 'source_tag', 'entry')
+
+    def __init__(self, seq, text):
+        self.seq = seq  # 进入当前阶段时的序号，用于恢复顺序
+        self.text = text
+        self.digest = None
+        self.entry_id = None
+        self.recent = None  # 选区合并记录
+        self.replace = False
+        self.process_name = None
+        self.source_tag = None
+        self.entry = None  # 最终写入的 CaptureEntry
+
+
+class Resequencer:
+    """按序号恢复顺序：并发处理的结果按进入阶段时的顺序交给下一阶段"""
+
+    def __init__(self):
+        self.next_seq = 0
+        self.pending = {}  # 序号 -> 结果（None 表示该项已被丢弃）
+        self.lock = asyncio.Lock()
+
+    async def release(self, seq, item, put):
+        """交回序号为 seq 的结果，按顺序把已就绪的结果交给 put"""
+        self.pending[seq] = item
+        async with self.lock:
+            while self.next_seq in self.pending:
+                ready = self.pending.pop(self.next_seq)
+                self.next_seq += 1
+                if ready is not None:
+                    await put(ready)
+
+
+class CapturePipeline:
+    """分阶段捕获流水线
+
+    run() 在调用线程中创建事件循环并运行到停止；stop() 可以在任意线程中调用
+    """
+
+    def __init__(self, source, processor, submit, scheduler=None, max_capture_time=0, max_capture_count=0,
+                 queue_size=64, concurrency=None, on_entry=None, on_queue_depths=None, depth_interval=0.5,
+                 writer_alive=None):
+        """初始化流水线
+
+        Args:
+            source: 捕获来源（见 capture_sources）
+            processor: 过滤、去重和打标签（capture_core.CaptureProcessor）
+            submit: 提交捕获的函数 submit(entry, timeout) -> bool（CaptureWriter.submit）
+            scheduler: 轮询调度器（见 capture_scheduler）
+            max_capture_time: 最长捕获时间（秒），<=0 表示不限
+            max_capture_count: 最多捕获次数，<=0 表示不限
+            queue_size: 阶段之间的队列容量
+            concurrency: 阶段名 -> 并发数
+            on_entry: 捕获提交写入后调用，参数为 CaptureEntry（在流水线线程中调用）
+            on_queue_depths: 队列深度变化时调用，参数为 {阶段名: 深度}（在流水线线程中调用）
+            depth_interval: 检查队列深度的间隔（秒）
+            writer_alive: 写入线程是否仍在运行的函数；返回False时 persist 阶段不再等待写入器
+        """
+        self.source = source
+        self.processor = processor
+        self.submit = submit
+        self.scheduler = scheduler or capture_scheduler.LadderScheduler()
+        self.timeout = max_capture_time
+        self.max_times = max_capture_count
+        self.queue_size = max(1, int(queue_size))
+        self.on_entry = on_entry
+        self.on_queue_depths = on_queue_depths
+        self.depth_interval = depth_interval
+        self.writer_alive = writer_alive
+
+        self.concurrency = {stage: 1 for stage in STAGES}
+        for stage, count in (concurrency or {}).items():
+            if stage not in self.concurrency:
+                utils.logger.warning(f"未知的流水线阶段：{stage}")
+                continue
+            count = max(1, int(count))
+            if stage in SERIAL_STAGES and count != 1:
+                utils.logger.warning(f"流水线阶段{stage}必须按顺序执行，并发数固定为1")
+                count = 1
+            self.concurrency[stage] = count
+
+        self.is_running = True
+        self.capture_count = 0
+        self.start_time = 0
+        self.loop = None
+        self.stop_event = None
+        self.queues = {}
+        self.executors = {}
+        self.queue_depths = {}
+        self.persist_stop_deadline = None
+
+    # ---------------------------------------------------------------- 控制
+
+    def run(self):
+        """运行流水线，直到停止、超时或达到最大次数（阻塞调用线程）"""
+        asyncio.run(self.run_async())
+
+    def stop(self):
+        """停止流水线（可在任意线程中调用），已获取的文本处理完后 run() 返回"""
+        self.is_running = False
+        self.source.wake()
+        loop, stop_event = self.loop, self.stop_event
+        if loop is not None and stop_event is not None:
+            try:
+                loop.call_soon_threadsafe(stop_event.set)
+            except RuntimeError:
+                pass  # 事件循环已经结束
+
+    def should_continue(self):
+        """是否继续获取（未停止、未超时、未达到最大次数）"""
+        if not self.is_running:
+            return False
+        if self.timeout > 0 and time.time() - self.start_time >= self.timeout:
+            return False
+        if self.max_times > 0 and self.capture_count >= self.max_times:
+            return False
+        return True
+
+    async def run_async(self):
+        """在当前事件循环中运行流水线"""
+        self.loop = asyncio.get_running_loop()
+        self.stop_event = asyncio.Event()
+        if not self.is_running:
+            self.stop_event.set()
+
+        self.queues = {stage: asyncio.Queue(maxsize=self.queue_size) for stage in STAGES[1:]}
+        self.executors = {stage: ThreadPoolExecutor(max_workers=self.concurrency[stage],
+                                                    thread_name_prefix=f'pipeline-{stage}')
+                          for stage in BLOCKING_STAGES}
+        self.filter_order = Resequencer()
+        self.tag_order = Resequencer()
+        self.next_dedup_seq = 0
+        self.persist_stop_deadline = None
+
+        handlers = {
+            'filter': self.filter_stage,
+            'dedup': self.dedup_stage,
+            'tag': self.tag_stage,
+            'persist': self.persist_stage,
+        }
+        workers = {stage: [asyncio.create_task(self.worker(stage, handler))
+                           for _ in range(self.concurrency[stage])]
+                   for stage, handler in handlers.items()}
+        monitor = asyncio.create_task(self.monitor_queues())
+
+        try:
+            await self.acquire_stage()
+            # 超时或达到最大次数时同样进入停止流程
+            self.is_running = False
+
+            # 逐个阶段排空：上游全部结束后再通知下游停止
+            for stage in STAGES[1:]:
+                for _ in workers[stage]:
+                    await self.queues[stage].put(_STOP)
+                await asyncio.gather(*workers[stage])
+        finally:
+            monitor.cancel()
+            try:
+                # 捕获来源在获取文本的线程中释放
+                await self.run_blocking('acquire', self.source.close)
+            finally:
+                for executor in self.executors.values():
+                    executor.shutdown(wait=True)
+                self.report_queue_depths()
+                utils.logger.info(f"复制探测耗时统计：{utils.probe_stats.summary()}")
+
+    async def run_blocking(self, stage, func, *args):
+        """在阶段的线程池中执行阻塞调用"""
+        return await self.loop.run_in_executor(self.executors[stage], func, *args)
+
+    async def sleep(self, seconds):
+        """等待 seconds 秒，停止时立即返回"""
+        try:
+            await asyncio.wait_for(self.stop_event.wait(), timeout=seconds)
+        except asyncio.TimeoutError:
+            pass
+
+    # ---------------------------------------------------------------- 阶段
+
+    async def acquire_stage(self):
+        """获取文本：事件驱动来源阻塞等待变化，轮询来源由调度器决定探测间隔"""
+        self.start_time = time.time()
+        event_driven = self.source.event_driven
+        if not event_driven:
+            self.scheduler.reset()
+
+        while self.should_continue():
+            start = time.perf_counter()
+            try:
+                # 事件驱动来源定期醒来检查停止/超时条件
+                text = await self.run_blocking('acquire', self.source.next_text, 1.0 if event_driven else 0)
+            except Exception as e:
+                utils.logger.error(f"捕获文本时出错：{e}")
+                utils.logger.error(traceback.format_exc())
+                await self.sleep(1.0)  # 出错后等待1秒
+                continue
+            metrics.observe('acquire', time.perf_counter() - start)
+
+            if text and self.is_running:
+                # 下游积压时在这里等待，不再继续探测
+                await self.queues['filter'].put(PipelineItem(self.capture_count, text))
+                self.capture_count += 1
+                metrics.increment('captured_texts')
+
+            if not event_driven:
+                await self.sleep(self.scheduler.next_interval(bool(text), utils.is_user_active()))
+
+    async def worker(self, stage, handler):
+        """阶段工作协程：从阶段队列取出文本并处理，直到收到停止标记"""
+        inbox = self.queues[stage]
+        while True:
+            item = await inbox.get()
+            if item is _STOP:
+                return
+            start = time.perf_counter()
+            try:
+                await handler(item)
+            except Exception as e:
+                utils.logger.error(f"流水线阶段{stage}处理文本时发生错误：{e}")
+                utils.logger.error(traceback.format_exc())
+            finally:
+                metrics.observe(stage, time.perf_counter() - start)
+
+    async def filter_stage(self, item):
+        """过滤：按原始文本快速去重（重复时不必清理），清理文本并检查长度"""
+        try:
+            item.digest = self.processor.check_duplicate(item.text)
+            valid = item.digest is not None
+            if valid:
+                item.text = self.processor.sanitize(item.text)
+                if utils.debug_enabled():
+                    utils.logger.debug("检测到选中文本：%s（长度：%d）",
+                                       utils.truncate_text(item.text, 100), len(item.text))
+                valid = self.processor.is_valid(item.text)
+        except Exception as e:
+            utils.logger.error(f"过滤文本时发生错误：{e}")
+            valid = False
+        await self.filter_order.release(item.seq, item if valid else None, self.queues['dedup'].put)
+
+    async def dedup_stage(self, item):
+        """去重和选区合并判断，分配捕获编号（按顺序执行）
+
+        filter 阶段之后、admit 之前，同样的文本可能已经先一步被接受，这里再确认一次
+        """
+        if self.processor.is_duplicate(item.digest):
+            return
+        admitted = self.processor.admit(item.text, item.digest)
+        if admitted is None:
+            return
+        item.entry_id, item.recent, item.replace = admitted
+        item.seq = self.next_dedup_seq
+        self.next_dedup_seq += 1
+        await self.queues['tag'].put(item)
+
+    async def tag_stage(self, item):
+        """打标签：新增的捕获在线程池中获取来源进程名和标签"""
+        try:
+            if not item.replace:
+                item.process_name, item.source_tag = await self.run_blocking('tag', self.processor.lookup_source)
+        except Exception as e:
+            utils.logger.error(f"获取文本来源时发生错误：{e}")
+            item.source_tag = '[未知来源]'
+        finally:
+            # 无论成功与否都要交回序号，否则后面的捕获会一直等待
+            await self.tag_order.release(item.seq, item, self.complete)
+
+    async def complete(self, item):
+        """按捕获编号顺序生成捕获并交给 persist 阶段
+
+        选区合并的更新使用被更新捕获的来源标签，按顺序生成时该标签已经就绪
+        """
+        item.entry = self.processor.complete(item.text, item.entry_id, item.recent, item.replace,
+                                             item.process_name, item.source_tag)
+        await self.queues['persist'].put(item)
+
+    async def persist_stage(self, item):
+        """提交写入：写入器队列已满时在线程中等待
+
+        写入线程已经退出，或流水线停止后仍等待了 PERSIST_STOP_GRACE 秒时放弃，
+        把捕获内容记录到日志，避免流水线一直等待无法退出
+        """
+        warned = False
+        while not await self.run_blocking('persist', self.submit, item.entry, 0.5):
+            if self.writer_alive is not None and not self.writer_alive():
+                self.drop_entry(item.entry, '写入线程已停止')
+                return
+            if not self.is_running:
+                # 停止后所有剩余捕获共用同一个等待期限
+                if self.persist_stop_deadline is None:
+                    self.persist_stop_deadline = time.monotonic() + PERSIST_STOP_GRACE
+                elif time.monotonic() >= self.persist_stop_deadline:
+                    self.drop_entry(item.entry, '停止捕获时写入队列仍然已满')
+                    return
+            if not warned:
+                utils.logger.warning("写入队列已满，流水线等待写入")
+                warned = True
+        if self.on_entry is not None:
+            self.on_entry(item.entry)
+
+    def drop_entry(self, entry, reason):
+        """无法提交写入的捕获：计数并把内容记录到日志"""
+        metrics.increment('dropped_entries')
+        utils.logger.error(f"{reason}，捕获未能写入（编号{entry.entry_id}）：{format_capture(entry.text, entry.source_tag)}")
+
+    # ---------------------------------------------------------------- 指标
+
+    async def monitor_queues(self):
+        """定期记录各阶段队列深度"""
+        while True:
+            self.report_queue_depths()
+            await asyncio.sleep(self.depth_interval)
+
+    def report_queue_depths(self):
+        """记录各阶段队列深度，变化时通知回调"""
+        depths = {stage: queue.qsize() for stage, queue in self.queues.items()}
+        for stage, depth in depths.items():
+            metrics.set_gauge('pipeline_queue_depth', depth, stage)
+        if depths != self.queue_depths:
+            self.queue_depths = depths
+            if self.on_queue_depths is not None:
+                self.on_queue_depths(dict(depths))
@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""捕获轮询调度器
+
+决定轮询捕获时两次探测之间的间隔：
+- ladder: 原有的固定阶梯（0.5/1/2/5秒）
+- adaptive: 根据最近的捕获命中率（EWMA）指数退避，命中后立即回到快速轮询
+"""
+
+import math
+import time
+
+SCHEDULER_LADDER = 'ladder'
+SCHEDULER_ADAPTIVE = 'adaptive'
+
+
+class CaptureScheduler:
+    """调度器接口"""
+
+    def next_interval(self, hit, user_active=True):
+        """根据本次探测结果计算下一次探测前的等待时间
+
+        Args:
+            hit: 本次探测是否捕获到文本
+            user_active: 用户当前是否活跃
+
+        Returns:
+            float: 等待秒数
+        """
+        raise NotImplementedError
+
+    def reset(self):
+        """重置调度状态（开始新的捕获会话时调用）"""
+
+
+class LadderScheduler(CaptureScheduler):
+    """固定阶梯调度器（与原有捕获线程的间隔完全一致）"""
+
+    def __init__(self):
+        self.consecutive_empty_count = 0  # 连续空捕获计数
+
+    def next_interval(self, hit, user_active=True):
+        """按连续空捕获次数选择固定间隔"""
+        if hit:
+            # 捕获成功后等待1秒，避免过于频繁
+            self.consecutive_empty_count = 0
+            return 1.0
+
+        if not user_active:
+            interval = 5.0
+        elif self.consecutive_empty_count > 5:
+            interval = 2.0
+        elif self.consecutive_empty_count > 2:
+            interval = 1.0
+        else:
+            interval = 0.5
+
+        self.consecutive_empty_count += 1
+        return interval
+
+    def reset(self):
+        """重置连续空捕获计数"""
+        self.consecutive_empty_count = 0
+
+
+class AdaptiveScheduler(CaptureScheduler):
+    """命中率自适应调度器
+
+    命中率用EWMA估计，并按距离上次探测的时间衰减（半衰期 half_life 秒），
+    这样长时间没有探测时旧的命中不会一直影响间隔。
+    未命中时间隔按指数退避增长，命中率越高增长越慢；
+    命中后立即回到最小间隔；用户不活跃时直接使用最大间隔
+    """
+
+    def __init__(self, min_interval=0.5, max_interval=5.0, initial_interval=1.0,
+                 alpha=0.3, backoff=2.0, half_life=30.0, clock=time.monotonic):
+        """初始化调度器
+
+        Args:
+            min_interval: 最小间隔（秒）
+            max_interval: 最大间隔（秒）
+            initial_interval: 初始间隔（秒），即配置中的 capture_interval
+            alpha: EWMA平滑系数
+            backoff: 命中率为0时每次未命中的间隔增长倍数
+            half_life: 命中率随时间衰减的半衰期（秒）
+            clock: 时钟函数，便于测试时注入
+        """
+        self.min_interval = max(0.01, float(min_interval))
+        self.max_interval = max(self.min_interval, float(max_interval))
+        self.initial_interval = self._clamp(float(initial_interval))
+        self.alpha = alpha
+        self.backoff = max(1.0, backoff)
+        self.half_life = half_life
+        self.clock = clock
+        self.reset()
+
+    def _clamp(self, interval):
+        """把间隔限制在上下限之间"""
+        return min(self.max_interval, max(self.min_interval, interval))
+
+    def reset(self):
+        """重置命中率和当前间隔"""
+        self.hit_rate = 0.0
+        self.interval = self.initial_interval
+        self.last_time = None
+
+    def observe(self, hit):
+        """更新命中率估计"""
+        now = self.clock()
+        if self.last_time is not None and self.half_life > 0:
+            elapsed = max(0.0, now - self.last_time)
+            self.hit_rate *= math.pow(0.5, elapsed / self.half_life)
+        self.last_time = now
+        self.hit_rate = (1 - self.alpha) * self.hit_rate + self.alpha * (1.0 if hit else 0.0)
+
+    def next_interval(self, hit, user_active=True):
+        """根据命中率计算下一次探测间隔"""
+        self.observe(hit)
+
+        if not user_active:
+            self.interval = self.max_interval
+        elif hit:
+            # 命中后立即回到快速轮询
+            self.interval = self.min_interval
+        else:
+            factor = 1.0 + (self.backoff - 1.0) * (1.0 - self.hit_rate)
+            self.interval = self._clamp(self.interval * factor)
+
+        return self.interval
+
+
+def create_scheduler(name=SCHEDULER_ADAPTIVE, min_interval=0.5, max_interval=5.0,
+                     initial_interval=1.0, clock=time.monotonic):
+    """根据配置创建调度器"""
+    if name == SCHEDULER_LADDER:
+        return LadderScheduler()
+    return AdaptiveScheduler(min_interval, max_interval, initial_interval, clock=clock)
+
+
+class SimulatedClock:
+    """可手动推进的时钟，用于测试和模拟"""
+
+    def __init__(self, start=0.0):
+        self.now = start
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        """推进时钟"""
+        self.now += seconds
+
+
+def simulate(scheduler, outcomes, clock=None, user_active=True):
+    """用给定的探测结果序列模拟调度，便于和原有阶梯对比
+
+    Args:
+        scheduler: 调度器
+        outcomes: 每次探测是否命中
+        clock: 调度器使用的 SimulatedClock，每次探测后按返回的间隔推进
+        user_active: 用户是否活跃
+
+    Returns:
+        dict: 探测次数、命中次数、总耗时和间隔统计
+    """
+    intervals = []
+    for hit in outcomes:
+        interval = scheduler.next_interval(hit, user_active)
+        intervals.append(interval)
+        if clock is not None:
+            clock.advance(interval)
+
+    return {
+        'probes': len(intervals),
+        'hits': sum(1 for hit in outcomes if hit),
+        'elapsed': sum(intervals),
+        'mean_interval': sum(intervals) / len(intervals) if intervals else 0.0,
+        'max_interval': max(intervals) if intervals else 0.0,
+    }
@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+"""文本捕获来源
+
+捕获线程通过统一的接口从不同后端获取文本：
+- probe: 轮询模拟Ctrl+C获取选中文本（原有方式）
+- clipboard: 监听系统剪贴板变化通知，只在剪贴板序号变化时读取
+- fake: 内存中的假后端，便于在无界面的Linux环境运行和测试捕获循环
+"""
+
+import queue
+import sys
+import threading
+
+import metrics
+import utils
+
+BACKEND_PROBE = 'probe'
+BACKEND_CLIPBOARD = 'clipboard'
+BACKEND_FAKE = 'fake'
+
+
+class CaptureSource:
+    """捕获来源接口"""
+
+    # 事件驱动的来源在 next_text 中阻塞等待变化，捕获线程无需额外休眠
+    event_driven = False
+
+    def next_text(self, timeout):
+        """获取下一段文本
+
+        Args:
+            timeout: 事件驱动来源最多等待的秒数
+
+        Returns:
+            str: 捕获到的原始文本（未清理，由 CaptureProcessor 去重后再清理），没有新文本时返回空字符串
+        """
+        raise NotImplementedError
+
+    def wake(self):
+        """唤醒阻塞在 next_text 中的线程（停止捕获时调用）"""
+
+    def close(self):
+        """释放资源（在调用 next_text 的线程中调用）"""
+
+
+class SelectionProbeSource(CaptureSource):
+    """轮询探测来源：每次调用都模拟Ctrl+C读取选中文本"""
+
+    def __init__(self, deadline=0.3):
+        self.deadline = deadline  # 等待复制完成的最长时间（秒）
+
+    def next_text(self, timeout):
+        """探测一次当前选中的文本"""
+        return utils.get_selected_text(deadline=self.deadline, sanitize=False)
+
+
+class FakeCaptureSource(CaptureSource):
+    """内存中的假来源
+
+    push() 模拟一次剪贴板变化，next_text() 阻塞直到有新文本或超时
+    """
+
+    event_driven = True
+
+    def __init__(self, texts=None):
+        self.queue = queue.Queue()
+        self.sequence = 0  # 模拟剪贴板序号
+        for text in texts or []:
+            self.push(text)
+
+    def push(self, text):
+        """模拟剪贴板内容变化"""
+        self.sequence += 1
+        self.queue.put(text)
+
+    def next_text(self, timeout):
+        """等待下一次变化"""
+        try:
+            text = self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return ''
+        return text
+
+    def wake(self):
+        """用空文本唤醒等待中的线程"""
+        self.queue.put('')
+
+
+class ClipboardListenerSource(CaptureSource):
+    """剪贴板变化通知来源（Windows）
+
+    在调用线程中创建一个仅消息窗口并注册 AddClipboardFormatListener，
+    空闲时阻塞在 MsgWaitForMultipleObjects 中，
+    只有收到 WM_CLIPBOARDUPDATE 且剪贴板序号确实变化时才读取剪贴板
+    """
+
+    event_driven = True
+
+    WM_CLIPBOARDUPDATE = 0x031D
+    WM_APP = 0x8000
+    HWND_MESSAGE = -3
+    PM_REMOVE = 0x0001
+    QS_ALLINPUT = 0x04FF
+    WAIT_TIMEOUT = 0x00000102
+
+    def __init__(self):
+        if sys.platform != 'win32':
+            raise OSError("剪贴板变化通知仅支持Windows")
+
+        import ctypes
+        from ctypes import wintypes
+
+        self.ctypes = ctypes
+        self.wintypes = wintypes
+        self.user32 = ctypes.WinDLL('user32', use_last_error=True)
+        self.user32.CreateWindowExW.restype = wintypes.HWND
+        self.user32.CreateWindowExW.argtypes = [
+            wintypes.DWORD, wintypes.LPCWSTR, wintypes.LPCWSTR, wintypes.DWORD,
+            ctypes.c_int, ctypes.c_int, ctypes.c_int, ctypes.c_int,
+            wintypes.HWND, wintypes.HMENU, wintypes.HINSTANCE, wintypes.LPVOID,
+        ]
+        self.user32.PostMessageW.argtypes = [wintypes.HWND, wintypes.UINT, wintypes.WPARAM, wintypes.LPARAM]
+        self.user32.GetClipboardSequenceNumber.restype = wintypes.DWORD
+
+        self.hwnd = None
+        self.lock = threading.Lock()
+        self.last_sequence = self.user32.GetClipboardSequenceNumber()
+
+    def _ensure_window(self):
+        """在当前线程创建仅消息窗口并注册剪贴板监听"""
+        if self.hwnd:
+            return
+
+        hwnd = self.user32.CreateWindowExW(
+            0, 'STATIC', 'TextCaptureClipboardListener', 0,
+            0, 0, 0, 0, self.HWND_MESSAGE, None, None, None,
+        )
+        if not hwnd:
+            raise self.ctypes.WinError(self.ctypes.get_last_error())
+
+        if not self.user32.AddClipboardFormatListener(hwnd):
+            error = self.ctypes.get_last_error()
+            self.user32.DestroyWindow(hwnd)
+            raise self.ctypes.WinError(error)
+
+        with self.lock:
+            self.hwnd = hwnd
+        utils.logger.info("剪贴板变化监听已启动")
+
+    def _wait_for_change(self, timeout):
+        """等待剪贴板变化通知，返回是否收到通知"""
+        wait_result = self.user32.MsgWaitForMultipleObjects(
+            0, None, False, int(max(0, timeout) * 1000), self.QS_ALLINPUT,
+        )
+        if wait_result == self.WAIT_TIMEOUT:
+            return False
+
+        changed = False
+        msg = self.wintypes.MSG()
+        while self.user32.PeekMessageW(self.ctypes.byref(msg), None, 0, 0, self.PM_REMOVE):
+            if msg.message == self.WM_CLIPBOARDUPDATE:
+                changed = True
+            else:
+                self.user32.TranslateMessage(self.ctypes.byref(msg))
+                self.user32.DispatchMessageW(self.ctypes.byref(msg))
+        return changed
+
+    def next_text(self, timeout):
+        """阻塞等待剪贴板变化，变化后读取文本"""
+        self._ensure_window()
+
+        if not self._wait_for_change(timeout):
+            return ''
+
+        sequence = self.user32.GetClipboardSequenceNumber()
+        if sequence == self.last_sequence:
+            return ''
+        self.last_sequence = sequence
+
+        try:
+            import clipboard_tx
+            with metrics.timed('paste'):
+                return clipboard_tx.get_clipboard().read_text()
+        except Exception as e:
+            utils.logger.error(f"读取剪贴板失败: {e}")
+            return ''
+
+    def wake(self):
+        """向监听窗口投递消息，唤醒等待中的线程"""
+        with self.lock:
+            if self.hwnd:
+                self.user32.PostMessageW(self.hwnd, self.WM_APP, 0, 0)
+
+    def close(self):
+        """注销剪贴板监听并销毁窗口"""
+        with self.lock:
+            hwnd, self.hwnd = self.hwnd, None
+        if hwnd:
+            self.user32.RemoveClipboardFormatListener(hwnd)
+            self.user32.DestroyWindow(hwnd)
+            utils.logger.info("剪贴板变化监听已停止")
+
+
+def create_capture_source(backend=BACKEND_PROBE, probe_deadline=0.3):
+    """根据配置创建捕获来源，剪贴板监听不可用时回退到轮询探测
+
+    Args:
+        backend: 捕获后端名称
+        probe_deadline: 轮询探测等待复制完成的最长时间（秒）
+    """
+    if backend == BACKEND_FAKE:
+        return FakeCaptureSource()
+
+    if backend == BACKEND_CLIPBOARD:
+        try:
+            return ClipboardListenerSource()
+        except Exception as e:
+            utils.logger.warning(f"剪贴板变化监听不可用，改用轮询探测: {e}")
+
+    elif backend != BACKEND_PROBE:
+        utils.logger.warning(f"未知的捕获后端：{backend}，使用轮询探测")
+
+    return SelectionProbeSource(probe_deadline)
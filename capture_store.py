@@ -0,0 +1,282 @@
+#!/usr/bin/env python3
+"""捕获存储
+
+所有捕获保存在本地SQLite数据库中（WAL模式），每条记录包括文本、来源标签、
+进程名、捕获时间和会话编号，并建立FTS5全文索引，支持跨会话搜索。
+
+存储是完整的捕获记录；会话文档（DOCX/Markdown等）仍由写入线程逐条追加，
+而不是每批从存储重新生成（那样每次都要重写整个文档）。写入线程每批先写存储再写文档，
+两者不一致时（如文档被删除或写入失败）以存储为准，可以用 export 重新生成文档
+
+命令行用法：
+    python capture_store.py search 关键词 [--tag 标签] [--session 会话] [--limit 50]
+    python capture_store.py recent [--limit 20]
+    python capture_store.py sessions
+    python capture_store.py export 输出.docx [--session 会话]
+"""
+
+import argparse
+import os
+import sqlite3
+import sys
+import time
+from collections import namedtuple
+from datetime import datetime
+
+import utils
+
+# 一条已存储的捕获
+CaptureRecord = namedtuple('CaptureRecord', ['id', 'session_id', 'entry_id', 'captured_at',
+                                             'source_tag', 'process_name', 'text'])
+
+# 一个捕获会话的概况
+SessionSummary = namedtuple('SessionSummary', ['session_id', 'capture_count', 'started_at', 'ended_at'])
+
+DEFAULT_DB_NAME = 'text_capture.db'
+
+# trigram 分词按三个字符切分，中文等没有空格的文本也能按子串搜索
+FTS_TOKENIZERS = ('trigram', 'unicode61')
+# trigram 分词下，短于三个字符的查询无法使用全文索引
+FTS_MIN_QUERY_LENGTH = 3
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS captures (
+    id INTEGER PRIMARY KEY,
+    session_id TEXT NOT NULL,
+    entry_id INTEGER,
+    captured_at REAL NOT NULL,
+    source_tag TEXT,
+    process_name TEXT,
+    text TEXT NOT NULL
+);
+CREATE UNIQUE INDEX IF NOT EXISTS captures_entry ON captures(session_id, entry_id);
+CREATE INDEX IF NOT EXISTS captures_time ON captures(captured_at);
+"""
+
+_FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS captures_fts USING fts5(
+    text, source_tag, content='captures', content_rowid='id', tokenize='{tokenizer}'
+);
+CREATE TRIGGER IF NOT EXISTS captures_ai AFTER INSERT ON captures BEGIN
+    INSERT INTO captures_fts(rowid, text, source_tag) VALUES (new.id, new.text, new.source_tag);
+END;
+CREATE TRIGGER IF NOT EXISTS captures_ad AFTER DELETE ON captures BEGIN
+    INSERT INTO captures_fts(captures_fts, rowid, text, source_tag) VALUES ('delete', old.id, old.text, old.source_tag);
+END;
+CREATE TRIGGER IF NOT EXISTS captures_au AFTER UPDATE ON captures BEGIN
+    INSERT INTO captures_fts(captures_fts, rowid, text, source_tag) VALUES ('delete', old.id, old.text, old.source_tag);
+    INSERT INTO captures_fts(rowid, text, source_tag) VALUES (new.id, new.text, new.source_tag);
+END;
+"""
+
+_COLUMNS = ('captures.id, captures.session_id, captures.entry_id, captures.captured_at, '
+            'captures.source_tag, captures.process_name, captures.text')
+
+
+def get_default_db_path():
+    """默认数据库路径（程序所在目录）"""
+    return os.path.join(os.path.dirname(os.path.abspath(__file__)), DEFAULT_DB_NAME)
+
+
+def new_session_id():
+    """生成捕获会话编号（开始时间 + 随机后缀）"""
+    return f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{os.urandom(2).hex()}"
+
+
+class CaptureStore:
+    """SQLite捕获存储
+
+    连接只能在创建它的线程中使用：写入线程在自己的线程里 open()，
+    每批捕获在一个事务中写入
+    """
+
+    def __init__(self, db_path=None):
+        self.db_path = db_path or get_default_db_path()
+        self.connection = None
+        self.fts_enabled = False
+
+    def open(self):
+        """打开数据库，创建表和全文索引"""
+        if self.connection is not None:
+            return self
+        self.connection = sqlite3.connect(self.db_path)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        self.connection.executescript(_SCHEMA)
+        self.fts_enabled = self._create_fts()
+        if not self.fts_enabled:
+            utils.logger.warning("SQLite不支持FTS5，搜索将退回到逐条匹配")
+        return self
+
+    def _create_fts(self):
+        """创建全文索引，依次尝试可用的分词器；不支持FTS5时返回False"""
+        for tokenizer in FTS_TOKENIZERS:
+            try:
+                self.connection.executescript(_FTS_SCHEMA.format(tokenizer=tokenizer))
+                return True
+            except sqlite3.OperationalError:
+                continue
+        return False
+
+    @property
+    def is_open(self):
+        """数据库是否已打开"""
+        return self.connection is not None
+
+    def write_many(self, entries):
+        """在一个事务中写入一批捕获（CaptureEntry）
+
+        同一会话中 entry_id 相同的捕获（选区增长合并）更新原记录而不是新增，
+        整批只执行一次 executemany
+        """
+        rows = [(entry.session_id or '', entry.entry_id, entry.captured_at or time.time(),
+                 entry.source_tag, entry.process_name, entry.text) for entry in entries]
+        with self.connection:
+            self.connection.executemany(
+                'INSERT INTO captures (session_id, entry_id, captured_at, source_tag, process_name, text) '
+                'VALUES (?, ?, ?, ?, ?, ?) '
+                'ON CONFLICT(session_id, entry_id) DO UPDATE SET '
+                'text = excluded.text, captured_at = excluded.captured_at, '
+                'source_tag = COALESCE(excluded.source_tag, source_tag), '
+                'process_name = COALESCE(excluded.process_name, process_name)', rows)
+
+    def search(self, query, limit=50, source_tag=None, session_id=None, since=None, until=None):
+        """全文搜索捕获，按捕获时间从新到旧返回 CaptureRecord 列表
+
+        Args:
+            query: 搜索文本（按短语匹配）；为空时只按其它条件筛选
+            limit: 最多返回的条数
+            source_tag: 只返回该来源标签的捕获
+            session_id: 只返回该会话的捕获
+            since/until: 捕获时间范围（时间戳）
+        """
+        conditions = []
+        params = []
+        source = 'captures'
+        if query:
+            if self.fts_enabled and len(query) >= FTS_MIN_QUERY_LENGTH:
+                source = 'captures JOIN captures_fts ON captures_fts.rowid = captures.id'
+                conditions.append('captures_fts.text MATCH ?')
+                params.append('"' + query.replace('"', '""') + '"')
+            else:
+                conditions.append("instr(lower(captures.text), lower(?)) > 0")
+                params.append(query)
+        if source_tag:
+            conditions.append('captures.source_tag = ?')
+            params.append(source_tag)
+        if session_id:
+            conditions.append('session_id = ?')
+            params.append(session_id)
+        if since is not None:
+            conditions.append('captured_at >= ?')
+            params.append(since)
+        if until is not None:
+            conditions.append('captured_at < ?')
+            params.append(until)
+
+        sql = f'SELECT {_COLUMNS} FROM {source}'
+        if conditions:
+            sql += ' WHERE ' + ' AND '.join(conditions)
+        sql += ' ORDER BY captured_at DESC, captures.id DESC LIMIT ?'
+        params.append(int(limit))
+        return [CaptureRecord(*row) for row in self.connection.execute(sql, params)]
+
+    def recent(self, limit=20):
+        """最近的捕获（从新到旧）"""
+        return self.search(None, limit=limit)
+
+    def iter_captures(self, session_id=None):
+        """按捕获顺序逐条返回捕获（用于导出，不一次性加载到内存）"""
+        sql = f'SELECT {_COLUMNS} FROM captures'
+        params = ()
+        if session_id:
+            sql += ' WHERE session_id = ?'
+            params = (session_id,)
+        sql += ' ORDER BY id'
+        for row in self.connection.execute(sql, params):
+            yield CaptureRecord(*row)
+
+    def sessions(self):
+        """所有会话的概况（从新到旧）"""
+        rows = self.connection.execute(
+            'SELECT session_id, COUNT(*), MIN(captured_at), MAX(captured_at) FROM captures '
+            'GROUP BY session_id ORDER BY MIN(captured_at) DESC')
+        return [SessionSummary(*row) for row in rows]
+
+    def count(self):
+        """捕获总数"""
+        return self.connection.execute('SELECT COUNT(*) FROM captures').fetchone()[0]
+
+    def close(self):
+        """关闭数据库"""
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+
+def export_docx(store, docx_path, session_id=None, title='文本捕获记录'):
+    """把存储中的捕获导出为Word文档（流式写出，内存占用与捕获条数无关）
+
+    Returns:
+        int: 导出的捕获数
+    """
+    from docx_stream import write_docx_stream
+
+    return write_docx_stream(docx_path, store.iter_captures(session_id), title=title)
+
+
+def format_record(record, width=80):
+    """格式化一条捕获用于命令行输出"""
+    captured_at = datetime.fromtimestamp(record.captured_at).strftime('%Y-%m-%d %H:%M:%S')
+    text = ' '.join(record.text.split())
+    return f"{captured_at} {record.source_tag or ''} {utils.truncate_text(text, width)}"
+
+
+def main(argv=None):
+    """命令行入口"""
+    parser = argparse.ArgumentParser(description='查询文本捕获存储')
+    parser.add_argument('--db', default=get_default_db_path(), help='数据库路径')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    search_parser = commands.add_parser('search', help='全文搜索捕获')
+    search_parser.add_argument('query', help='搜索文本')
+    search_parser.add_argument('--tag', help='只搜索该来源标签，例如 [微信]')
+    search_parser.add_argument('--session', help='只搜索该会话')
+    search_parser.add_argument('--limit', type=int, default=50, help='最多显示的条数')
+
+    recent_parser = commands.add_parser('recent', help='显示最近的捕获')
+    recent_parser.add_argument('--limit', type=int, default=20, help='最多显示的条数')
+
+    commands.add_parser('sessions', help='列出捕获会话')
+
+    export_parser = commands.add_parser('export', help='导出为Word文档')
+    export_parser.add_argument('output', help='输出的DOCX路径')
+    export_parser.add_argument('--session', help='只导出该会话')
+
+    args = parser.parse_args(argv)
+    if not os.path.exists(args.db):
+        print(f"数据库不存在：{args.db}")
+        return 1
+
+    store = CaptureStore(args.db).open()
+    try:
+        if args.command == 'search':
+            for record in store.search(args.query, limit=args.limit, source_tag=args.tag, session_id=args.session):
+                print(format_record(record))
+        elif args.command == 'recent':
+            for record in store.recent(args.limit):
+                print(format_record(record))
+        elif args.command == 'sessions':
+            for session in store.sessions():
+                started = datetime.fromtimestamp(session.started_at).strftime('%Y-%m-%d %H:%M:%S')
+                print(f"{session.session_id}  {started}  {session.capture_count}条")
+        elif args.command == 'export':
+            count = export_docx(store, args.output, args.session)
+            print(f"已导出{count}条捕获到：{args.output}")
+    finally:
+        store.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,378 @@
+#!/usr/bin/env python3
+"""剪贴板事务
+
+复制探测需要借用系统剪贴板：模拟Ctrl+C之前记住原内容，读到选中文本后再放回去。
+原来的做法每次探测都要 读取→清空→读取→写回 四次打开剪贴板，而且只保存了文本，
+剪贴板里原有的图片、文件列表、HTML等格式会在恢复后丢失。
+
+这里把剪贴板操作放在统一的接口后面：
+- snapshot() 一次取得所有格式的快照；剪贴板序号没有变化时直接沿用上次的快照，不再读取
+- ClipboardTransaction 只在剪贴板确实被改动过（序号变化）时才恢复，
+  没有选中文本、复制按键什么也没放进剪贴板时不做任何写入
+
+后端：
+- Win32Clipboard: Windows，按格式保存全部内存块数据，用剪贴板序号判断变化
+- PyperclipClipboard: 其他平台，只支持文本，没有序号，需要先清空剪贴板才能判断复制是否完成
+- MemoryClipboard: 内存中的假剪贴板，用于性能测试和在无界面环境中验证探测流程
+"""
+
+import sys
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+
+import metrics
+import utils
+
+# 剪贴板快照：formats 为 格式 -> 数据，sequence 为拍快照时的剪贴板序号（不支持时为None）
+ClipboardSnapshot = namedtuple('ClipboardSnapshot', ['formats', 'sequence'])
+
+# MemoryClipboard / PyperclipClipboard 中文本格式的名称
+TEXT_FORMAT = 'text'
+
+
+class Clipboard:
+    """剪贴板接口
+
+    子类实现 read_formats / write_formats / read_text / clear，
+    支持剪贴板序号的后端再实现 sequence 并把 supports_sequence 设为True
+    """
+
+    # 能否用序号判断剪贴板是否变化；不能时探测前需要先清空剪贴板
+    supports_sequence = False
+
+    def __init__(self):
+        self._snapshot = None  # 最近一次的快照，序号不变时沿用
+
+    def sequence(self):
+        """剪贴板序号，每次剪贴板内容变化时递增；不支持时返回None"""
+        return None
+
+    def read_formats(self):
+        """读取剪贴板中所有格式的数据"""
+        raise NotImplementedError
+
+    def write_formats(self, formats):
+        """清空剪贴板并写入给定的所有格式（为空时只清空）"""
+        raise NotImplementedError
+
+    def read_text(self):
+        """读取剪贴板中的文本，没有文本时返回空字符串"""
+        raise NotImplementedError
+
+    def clear(self):
+        """清空剪贴板"""
+        self.write_formats({})
+
+    def snapshot(self):
+        """取得剪贴板所有格式的快照
+
+        支持序号时，序号与上次快照（或上次恢复后）相同说明内容没有变化，直接返回上次的快照
+        """
+        sequence = self.sequence()
+        if sequence is not None and self._snapshot is not None and self._snapshot.sequence == sequence:
+            metrics.increment('clipboard_snapshot_reused')
+            return self._snapshot
+
+        snapshot = ClipboardSnapshot(self.read_formats(), sequence)
+        metrics.increment('clipboard_snapshots')
+        if sequence is not None:
+            self._snapshot = snapshot
+        return snapshot
+
+    def restore(self, snapshot):
+        """把剪贴板恢复为快照中的内容"""
+        self.write_formats(snapshot.formats)
+        sequence = self.sequence()
+        if sequence is not None:
+            # 恢复本身会改变序号；记下恢复后的序号，下次探测时沿用这份快照
+            self._snapshot = ClipboardSnapshot(snapshot.formats, sequence)
+
+    def begin(self):
+        """开始一次会改动剪贴板的操作"""
+        return ClipboardTransaction(self)
+
+
+class ClipboardTransaction:
+    """一次会改动剪贴板的操作
+
+    开始时取得原内容的快照，rollback() 只在剪贴板确实被改动过时恢复。
+    不支持序号的后端无法自己判断是否改动过，由调用方在写入剪贴板后调用 mark_changed()
+
+    用法：
+        with clipboard.begin() as transaction:
+            send_copy()
+            ...
+    """
+
+    def __init__(self, clipboard):
+        self.clipboard = clipboard
+        self.snapshot = clipboard.snapshot()
+        self.start_sequence = self.snapshot.sequence
+        self.marked = False
+
+    def mark_changed(self):
+        """标记剪贴板已被改动（用于不支持序号的后端）"""
+        self.marked = True
+
+    @property
+    def changed(self):
+        """剪贴板在事务开始后是否被改动过"""
+        if self.marked:
+            return True
+        if self.start_sequence is None:
+            return False
+        return self.clipboard.sequence() != self.start_sequence
+
+    def rollback(self):
+        """剪贴板被改动过时恢复原内容
+
+        Returns:
+            bool: 是否进行了恢复
+        """
+        if not self.changed:
+            metrics.increment('clipboard_restores_skipped')
+            return False
+        with metrics.timed('clipboard_restore'):
+            self.clipboard.restore(self.snapshot)
+        metrics.increment('clipboard_restores')
+        return True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        try:
+            self.rollback()
+        except Exception as e:
+            utils.logger.error(f"恢复剪贴板内容失败: {e}")
+        return False
+
+
+class MemoryClipboard(Clipboard):
+    """内存中的假剪贴板
+
+    可以放入多种格式，每次写入序号加一；select() 设置“当前选中的文本”，
+    send_copy() 模拟复制按键：有选中文本时把它放进剪贴板，没有时剪贴板不变。
+    reads / writes 记录打开剪贴板读取和写入的次数
+    """
+
+    supports_sequence = True
+
+    def __init__(self, formats=None, selection='', use_sequence=True):
+        """初始化假剪贴板
+
+        Args:
+            formats: 初始内容（格式 -> 数据）
+            selection: 当前选中的文本
+            use_sequence: 为False时模拟不支持序号的平台
+        """
+        super().__init__()
+        self.formats = dict(formats or {})
+        self.selection = selection
+        self.supports_sequence = use_sequence
+        self.sequence_number = 1
+        self.reads = 0
+        self.writes = 0
+
+    def sequence(self):
+        return self.sequence_number if self.supports_sequence else None
+
+    def read_formats(self):
+        self.reads += 1
+        return dict(self.formats)
+
+    def write_formats(self, formats):
+        self.writes += 1
+        self.formats = dict(formats)
+        self.sequence_number += 1
+
+    def read_text(self):
+        self.reads += 1
+        return self.formats.get(TEXT_FORMAT, '')
+
+    def set_text(self, text):
+        """模拟用户或其他程序复制了一段文本"""
+        self.write_formats({TEXT_FORMAT: text})
+
+    def select(self, text):
+        """设置当前选中的文本（空字符串表示没有选中）"""
+        self.selection = text
+
+    def send_copy(self):
+        """模拟Ctrl+C"""
+        if self.selection:
+            self.set_text(self.selection)
+
+
+class PyperclipClipboard(Clipboard):
+    """基于 pyperclip 的剪贴板（非Windows平台），只支持文本，没有序号"""
+
+    def __init__(self):
+        super().__init__()
+        import pyperclip
+
+        self.pyperclip = pyperclip
+
+    def read_formats(self):
+        try:
+            text = self.pyperclip.paste()
+        except Exception:
+            text = ''
+        return {TEXT_FORMAT: text} if text else {}
+
+    def write_formats(self, formats):
+        self.pyperclip.copy(formats.get(TEXT_FORMAT, ''))
+
+    def read_text(self):
+        return self.pyperclip.paste() or ''
+
+
+class Win32Clipboard(Clipboard):
+    """Windows 剪贴板，保存和恢复所有格式
+
+    剪贴板中的大多数格式（文本、HTML、RTF、文件列表 CF_HDROP、位图 CF_DIB 等）
+    都是全局内存块，可以按字节复制保存；GDI句柄类的格式（CF_BITMAP、CF_ENHMETAFILE 等）
+    无法按字节保存，跳过后由系统在恢复时从 CF_DIB 等格式自动合成
+    """
+
+    supports_sequence = True
+
+    CF_UNICODETEXT = 13
+    GMEM_MOVEABLE = 0x0002
+    # 不是全局内存块的格式
+    HANDLE_FORMATS = frozenset({
+        2,     # CF_BITMAP
+        3,     # CF_METAFILEPICT
+        9,     # CF_PALETTE
+        14,    # CF_ENHMETAFILE
+        0x80,  # CF_OWNERDISPLAY
+        0x82,  # CF_DSPBITMAP
+        0x83,  # CF_DSPMETAFILEPICT
+        0x8E,  # CF_DSPENHMETAFILE
+    })
+
+    def __init__(self, open_attempts=5, retry_delay=0.01):
+        """初始化剪贴板
+
+        Args:
+            open_attempts: 剪贴板被其他程序占用时尝试打开的次数
+            retry_delay: 两次尝试之间的间隔（秒）
+        """
+        if sys.platform != 'win32':
+            raise OSError("Win32剪贴板仅支持Windows")
+
+        super().__init__()
+        import ctypes
+        from ctypes import wintypes
+
+        self.ctypes = ctypes
+        self.open_attempts = max(1, open_attempts)
+        self.retry_delay = retry_delay
+
+        self.user32 = ctypes.WinDLL('user32', use_last_error=True)
+        self.kernel32 = ctypes.WinDLL('kernel32', use_last_error=True)
+        self.user32.OpenClipboard.argtypes = [wintypes.HWND]
+        self.user32.OpenClipboard.restype = wintypes.BOOL
+        self.user32.EnumClipboardFormats.argtypes = [wintypes.UINT]
+        self.user32.EnumClipboardFormats.restype = wintypes.UINT
+        self.user32.GetClipboardData.argtypes = [wintypes.UINT]
+        self.user32.GetClipboardData.restype = wintypes.HANDLE
+        self.user32.SetClipboardData.argtypes = [wintypes.UINT, wintypes.HANDLE]
+        self.user32.SetClipboardData.restype = wintypes.HANDLE
+        self.user32.GetClipboardSequenceNumber.restype = wintypes.DWORD
+        self.kernel32.GlobalAlloc.argtypes = [wintypes.UINT, ctypes.c_size_t]
+        self.kernel32.GlobalAlloc.restype = wintypes.HGLOBAL
+        self.kernel32.GlobalFree.argtypes = [wintypes.HGLOBAL]
+        self.kernel32.GlobalFree.restype = wintypes.HGLOBAL
+        self.kernel32.GlobalLock.argtypes = [wintypes.HGLOBAL]
+        self.kernel32.GlobalLock.restype = wintypes.LPVOID
+        self.kernel32.GlobalUnlock.argtypes = [wintypes.HGLOBAL]
+        self.kernel32.GlobalUnlock.restype = wintypes.BOOL
+        self.kernel32.GlobalSize.argtypes = [wintypes.HGLOBAL]
+        self.kernel32.GlobalSize.restype = ctypes.c_size_t
+
+    @contextmanager
+    def _opened(self):
+        """打开剪贴板，剪贴板被其他程序占用时稍后重试"""
+        for attempt in range(self.open_attempts):
+            if self.user32.OpenClipboard(None):
+                break
+            if attempt + 1 < self.open_attempts:
+                time.sleep(self.retry_delay)
+        else:
+            raise self.ctypes.WinError(self.ctypes.get_last_error())
+        try:
+            yield
+        finally:
+            self.user32.CloseClipboard()
+
+    def _read_handle(self, handle):
+        """复制一个全局内存块的内容，无法锁定时返回None"""
+        pointer = self.kernel32.GlobalLock(handle)
+        if not pointer:
+            return None
+        try:
+            return self.ctypes.string_at(pointer, self.kernel32.GlobalSize(handle))
+        finally:
+            self.kernel32.GlobalUnlock(handle)
+
+    def sequence(self):
+        return self.user32.GetClipboardSequenceNumber()
+
+    def read_formats(self):
+        formats = {}
+        with self._opened():
+            clipboard_format = self.user32.EnumClipboardFormats(0)
+            while clipboard_format:
+                if clipboard_format not in self.HANDLE_FORMATS:
+                    handle = self.user32.GetClipboardData(clipboard_format)
+                    data = self._read_handle(handle) if handle else None
+                    if data is not None:
+                        formats[clipboard_format] = data
+                clipboard_format = self.user32.EnumClipboardFormats(clipboard_format)
+        return formats
+
+    def write_formats(self, formats):
+        with self._opened():
+            self.user32.EmptyClipboard()
+            for clipboard_format, data in formats.items():
+                handle = self.kernel32.GlobalAlloc(self.GMEM_MOVEABLE, max(1, len(data)))
+                if not handle:
+                    continue
+                pointer = self.kernel32.GlobalLock(handle)
+                if not pointer:
+                    self.kernel32.GlobalFree(handle)
+                    continue
+                self.ctypes.memmove(pointer, data, len(data))
+                self.kernel32.GlobalUnlock(handle)
+                # 成功后内存块归系统所有，失败时需要自己释放
+                if not self.user32.SetClipboardData(clipboard_format, handle):
+                    self.kernel32.GlobalFree(handle)
+
+    def read_text(self):
+        with self._opened():
+            handle = self.user32.GetClipboardData(self.CF_UNICODETEXT)
+            data = self._read_handle(handle) if handle else None
+        if not data:
+            return ''
+        return data.decode('utf-16-le', errors='replace').split('\x00', 1)[0]
+
+
+# 全局剪贴板（首次使用时按平台创建）
+_clipboard = None
+
+
+def get_clipboard():
+    """获取系统剪贴板：Windows 上为 Win32Clipboard，其他平台为 PyperclipClipboard"""
+    global _clipboard
+    if _clipboard is None:
+        if sys.platform == 'win32':
+            try:
+                _clipboard = Win32Clipboard()
+            except Exception as e:
+                utils.logger.warning(f"无法使用Win32剪贴板，只保存文本格式: {e}")
+                _clipboard = PyperclipClipboard()
+        else:
+            _clipboard = PyperclipClipboard()
+    return _clipboard
@@ -5,6 +5,9 @@
 """
 
 import os
+import copy
+import json
+from contextlib import contextmanager
 from datetime import datetime
 
 class Config:
@@ -19,14 +22,55 @@ class Config:
         self.default_config = {
             'docx_path': os.path.join(app_dir, 'text_capture.docx'),
             'capture_interval': 1.0,  # 文本捕获间隔（秒）
+            'capture_scheduler': 'adaptive',  # 轮询调度器：adaptive（按命中率自适应）/ladder（固定阶梯）
+            'capture_interval_min': 0.5,  # 轮询最小间隔（秒）
+            'capture_interval_max': 5.0,  # 轮询最大间隔（秒）
+            'probe_deadline_ms': 300,  # 模拟复制后等待剪贴板变化的最长时间（毫秒）
+            'capture_backend': 'probe',  # 捕获后端：probe（模拟Ctrl+C轮询）/clipboard（剪贴板变化通知）/fake
+            'capture_engine': 'thread',  # 捕获引擎：thread（捕获线程）/asyncio（分阶段流水线，见 capture_pipeline）
+            'pipeline_queue_size': 64,  # 流水线各阶段之间的队列容量
+            'pipeline_concurrency': {  # 流水线各阶段的并发数（acquire/dedup/persist 必须按顺序执行，固定为1）
+                'acquire': 1,
+                'filter': 1,
+                'dedup': 1,
+                'tag': 2,
+                'persist': 1,
+            },
             'min_text_length': 1,  # 最小捕获文本长度
             'max_text_length': 10000,  # 最大捕获文本长度
+            'dedup_window_size': 256,  # 去重索引记录的最近捕获数
+            'dedup_ttl': 600,  # 去重记录有效期（秒）
+            'merge_window': 5.0,  # 选区增长合并的时间窗口（秒）
+            'merge_history_size': 3,  # 参与选区合并比较的最近捕获数
+            'merge_max_edit_distance': 8,  # 视为同一选区的最大差异字符数
+            'sanitize_policy': {  # 文本清理策略
+                'preserve_paragraphs': True,  # 保留段落换行
+                'collapse_spaces': True,  # 合并连续空白
+                'cjk_fullwidth_space': True,  # 全角空格视为空白
+                'strip_zero_width': True,  # 删除零宽字符
+                'normalize_unicode': None,  # Unicode规范化形式（NFC/NFKC），None表示不规范化
+            },
             'enable_auto_save': True,  # 启用自动保存
             'show_notifications': True,  # 显示通知
-            'text_source_tags': {
-                'chrome.exe': '[网页]',
-                'msedge.exe': '[网页]',
-                'firefox.exe': '[网页]',
+            'output_format': 'auto',  # 输出格式：auto（按文档扩展名）/docx/jsonl/markdown/text
+            'rollover_max_bytes': 50 * 1024 * 1024,  # 会话文档分片的大小上限（字节），0表示不限
+            'rollover_max_entries': 0,  # 会话文档分片的段落数上限，0表示不限
+            'rollover_period': 0,  # 会话文档分片的时长上限（秒），0表示不限
+            'docx_flush_every': 20,  # 累计多少条捕获后写入文档
+            'docx_flush_interval': 5.0,  # 距离上次写入多少秒后写入文档
+            'writer_queue_size': 256,  # 写入线程队列长度
+            'journal_fsync': 'interval',  # 捕获日志fsync策略：always/interval/none
+            'journal_fsync_interval_ms': 200,  # 捕获日志组提交间隔（毫秒）
+            'capture_store_enabled': True,  # 把捕获写入SQLite捕获存储（支持全文搜索）
+            'capture_db_path': os.path.join(app_dir, 'text_capture.db'),  # 捕获存储路径
+            'metrics_endpoint_enabled': False,  # 开启本地指标接口（http://127.0.0.1:端口/metrics）
+            'metrics_port': 9464,  # 指标接口端口
+            'profile_capture_sessions': False,  # 对每次捕获会话进行性能分析（也可设置环境变量 TEXT_CAPTURE_PROFILE=1）
+            'profile_sample_interval_ms': 5,  # 性能分析的调用栈采样间隔（毫秒）
+            'log_level': 'INFO',  # 日志级别：DEBUG/INFO/WARNING/ERROR
+            'log_max_bytes': 5 * 1024 * 1024,  # 日志文件达到该大小（字节）后轮转
+            'log_backup_count': 3,  # 保留的轮转日志个数
+            'text_source_tags': {  # 进程名 -> 标签（不区分大小写）
                 'wechat.exe': '[微信]',
                 'QQ.exe': '[QQ]',
                 'winword.exe': '[Word]',
@@ -47,11 +91,21 @@ class Config:
                 'teams.exe': '[Microsoft Teams]',
                 'zoom.exe': '[Zoom]',
                 'skype.exe': '[Skype]',
-            }
+            },
+            # 标签规则：match 为 exact/glob/regex，field 为 process（进程名，默认）/title（窗口标题）
+            # 例如 {'match': 'glob', 'pattern': 'wps*.exe', 'tag': '[WPS]'}
+            #      {'match': 'regex', 'field': 'title', 'pattern': 'YouTube', 'tag': '[视频]'}
+            'text_source_tag_rules': [],
         }
         
         # 当前配置
-        self.config = self.default_config.copy()
+        self.config = copy.deepcopy(self.default_config)
+        
+        # 批量修改状态
+        self._batch_depth = 0  # 嵌套的 batch() 层数
+        self._dirty = False  # 是否有尚未写入文件的修改
+        self._saved_json = None  # 最近一次加载或保存的配置内容，用于跳过没有变化的写入
+        self._tag_matcher = None  # 编译好的来源标签匹配器，标签配置变化时重新编译
         
         # 加载配置文件
         self.load_config()
@@ -63,9 +117,10 @@ class Config:
             
             if os.path.exists(config_file):
                 with open(config_file, 'r', encoding='utf-8') as f:
-                    import json
                     loaded_config = json.load(f)
                     self.config.update(loaded_config)
+                self._saved_json = self._serialize()
+                self._tag_matcher = None
                 print(f"配置文件已加载：{config_file}")
             else:
                 print(f"配置文件不存在，使用默认配置：{config_file}")
@@ -74,11 +129,25 @@ class Config:
         except Exception as e:
             print(f"加载配置文件失败：{e}")
             print("使用默认配置")
-            self.config = self.default_config.copy()
+            self.config = copy.deepcopy(self.default_config)
+            self._tag_matcher = None
             
+    def _serialize(self):
+        """把当前配置序列化为JSON文本"""
+        return json.dumps(self.config, indent=2, ensure_ascii=False)
+        
     def save_config(self):
-        """保存配置文件"""
+        """保存配置文件
+        
+        配置内容与上次加载或保存时相同则跳过写入；
+        先写入临时文件再替换，避免写入中途失败导致配置文件损坏
+        """
         try:
+            content = self._serialize()
+            if content == self._saved_json:
+                self._dirty = False
+                return
+            
             config_file = self.get_config_file_path()
             config_dir = os.path.dirname(config_file)
             
@@ -88,14 +157,48 @@ class Config:
                 print(f"配置目录已创建：{config_dir}")
                 
             # 保存配置文件
-            with open(config_file, 'w', encoding='utf-8') as f:
-                import json
-                json.dump(self.config, f, indent=2, ensure_ascii=False)
+            temp_file = config_file + '.tmp'
+            with open(temp_file, 'w', encoding='utf-8') as f:
+                f.write(content)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_file, config_file)
+            
+            self._saved_json = content
+            self._dirty = False
             print(f"配置文件已保存：{config_file}")
             
         except Exception as e:
             print(f"保存配置文件失败：{e}")
             
+    @contextmanager
+    def batch(self):
+        """批量修改配置
+        
+        块内的 set() 只修改内存中的配置，退出时一次性写入文件；
+        块内抛出异常时回滚到进入前的配置，不写入文件。可以嵌套，最外层退出时提交
+        
+        用法：
+            with config.batch():
+                config.set_min_text_length(1)
+                config.set_max_text_length(5000)
+        """
+        if self._batch_depth == 0:
+            snapshot = (copy.deepcopy(self.config), self._dirty)
+        self._batch_depth += 1
+        try:
+            yield self
+        except BaseException:
+            self._batch_depth -= 1
+            if self._batch_depth == 0:
+                self.config, self._dirty = snapshot
+                self._tag_matcher = None
+            raise
+        else:
+            self._batch_depth -= 1
+            if self._batch_depth == 0 and self._dirty:
+                self.save_config()
+            
     def get_config_file_path(self):
         """获取配置文件路径"""
         app_data_dir = os.path.join(os.getenv('APPDATA', os.path.expanduser('~')), 'TextCaptureTool')
@@ -106,9 +209,13 @@ class Config:
         return self.config.get(key, default)
         
     def set(self, key, value):
-        """设置配置值"""
+        """设置配置值（在 batch() 中时延迟到提交时写入）"""
         self.config[key] = value
-        self.save_config()
+        self._dirty = True
+        if key in ('text_source_tags', 'text_source_tag_rules'):
+            self._tag_matcher = None
+        if self._batch_depth == 0:
+            self.save_config()
         
 
         
@@ -128,6 +235,40 @@ class Config:
         """设置文本捕获间隔"""
         self.set('capture_interval', interval)
         
+    def get_capture_scheduler(self):
+        """获取轮询调度器名称"""
+        return self.get('capture_scheduler', self.default_config['capture_scheduler'])
+        
+    def get_capture_interval_min(self):
+        """获取轮询最小间隔（秒）"""
+        return self.get('capture_interval_min', self.default_config['capture_interval_min'])
+        
+    def get_capture_interval_max(self):
+        """获取轮询最大间隔（秒）"""
+        return self.get('capture_interval_max', self.default_config['capture_interval_max'])
+        
+    def get_probe_deadline_ms(self):
+        """获取复制探测截止时间（毫秒）"""
+        return self.get('probe_deadline_ms', self.default_config['probe_deadline_ms'])
+        
+    def get_capture_backend(self):
+        """获取捕获后端"""
+        return self.get('capture_backend', self.default_config['capture_backend'])
+        
+    def get_capture_engine(self):
+        """获取捕获引擎"""
+        return self.get('capture_engine', self.default_config['capture_engine'])
+        
+    def get_pipeline_queue_size(self):
+        """获取流水线阶段之间的队列容量"""
+        return self.get('pipeline_queue_size', self.default_config['pipeline_queue_size'])
+        
+    def get_pipeline_concurrency(self):
+        """获取流水线各阶段的并发数（未配置的阶段使用默认值）"""
+        concurrency = dict(self.default_config['pipeline_concurrency'])
+        concurrency.update(self.get('pipeline_concurrency', None) or {})
+        return concurrency
+        
     def get_min_text_length(self):
         """获取最小捕获文本长度"""
         return self.get('min_text_length', self.default_config['min_text_length'])
@@ -146,6 +287,30 @@ class Config:
         
 
         
+    def get_dedup_window_size(self):
+        """获取去重索引容量"""
+        return self.get('dedup_window_size', self.default_config['dedup_window_size'])
+        
+    def get_dedup_ttl(self):
+        """获取去重记录有效期（秒）"""
+        return self.get('dedup_ttl', self.default_config['dedup_ttl'])
+        
+    def get_merge_window(self):
+        """获取选区增长合并的时间窗口（秒）"""
+        return self.get('merge_window', self.default_config['merge_window'])
+        
+    def get_merge_history_size(self):
+        """获取参与选区合并比较的最近捕获数"""
+        return self.get('merge_history_size', self.default_config['merge_history_size'])
+        
+    def get_merge_max_edit_distance(self):
+        """获取视为同一选区的最大差异字符数"""
+        return self.get('merge_max_edit_distance', self.default_config['merge_max_edit_distance'])
+        
+    def get_sanitize_policy(self):
+        """获取文本清理策略"""
+        return self.get('sanitize_policy', self.default_config['sanitize_policy'])
+        
     def is_auto_save_enabled(self):
         """检查是否启用自动保存"""
         return self.get('enable_auto_save', self.default_config['enable_auto_save'])
@@ -154,10 +319,98 @@ class Config:
         """检查是否显示通知"""
         return self.get('show_notifications', self.default_config['show_notifications'])
         
-    def get_text_source_tag(self, process_name):
+    def get_output_format(self):
+        """获取输出格式"""
+        return self.get('output_format', self.default_config['output_format'])
+        
+    def get_rollover_max_bytes(self):
+        """获取文档分片大小上限（字节）"""
+        return self.get('rollover_max_bytes', self.default_config['rollover_max_bytes'])
+        
+    def get_rollover_max_entries(self):
+        """获取文档分片段落数上限"""
+        return self.get('rollover_max_entries', self.default_config['rollover_max_entries'])
+        
+    def get_rollover_period(self):
+        """获取文档分片时长上限（秒）"""
+        return self.get('rollover_period', self.default_config['rollover_period'])
+        
+    def get_docx_flush_every(self):
+        """获取文档刷新条数阈值"""
+        return self.get('docx_flush_every', self.default_config['docx_flush_every'])
+        
+    def get_docx_flush_interval(self):
+        """获取文档刷新时间间隔（秒）"""
+        return self.get('docx_flush_interval', self.default_config['docx_flush_interval'])
+        
+    def get_writer_queue_size(self):
+        """获取写入线程队列长度"""
+        return self.get('writer_queue_size', self.default_config['writer_queue_size'])
+        
+    def is_capture_store_enabled(self):
+        """检查是否写入捕获存储"""
+        return self.get('capture_store_enabled', self.default_config['capture_store_enabled'])
+        
+    def get_capture_db_path(self):
+        """获取捕获存储路径"""
+        return self.get('capture_db_path', self.default_config['capture_db_path'])
+        
+    def is_metrics_endpoint_enabled(self):
+        """检查是否开启本地指标接口"""
+        return self.get('metrics_endpoint_enabled', self.default_config['metrics_endpoint_enabled'])
+        
+    def get_metrics_port(self):
+        """获取指标接口端口"""
+        return self.get('metrics_port', self.default_config['metrics_port'])
+        
+    def is_session_profiling_enabled(self):
+        """检查是否对每次捕获会话进行性能分析（配置或环境变量 TEXT_CAPTURE_PROFILE）"""
+        if os.environ.get('TEXT_CAPTURE_PROFILE', '') not in ('', '0'):
+            return True
+        return self.get('profile_capture_sessions', self.default_config['profile_capture_sessions'])
+        
+    def get_profile_sample_interval_ms(self):
+        """获取性能分析的采样间隔（毫秒）"""
+        return self.get('profile_sample_interval_ms', self.default_config['profile_sample_interval_ms'])
+        
+    def get_log_level(self):
+        """获取日志级别"""
+        return self.get('log_level', self.default_config['log_level'])
+        
+    def get_log_max_bytes(self):
+        """获取日志轮转大小（字节）"""
+        return self.get('log_max_bytes', self.default_config['log_max_bytes'])
+        
+    def get_log_backup_count(self):
+        """获取保留的轮转日志个数"""
+        return self.get('log_backup_count', self.default_config['log_backup_count'])
+        
+    def get_journal_fsync(self):
+        """获取捕获日志fsync策略"""
+        return self.get('journal_fsync', self.default_config['journal_fsync'])
+        
+    def get_journal_fsync_interval_ms(self):
+        """获取捕获日志组提交间隔（毫秒）"""
+        return self.get('journal_fsync_interval_ms', self.default_config['journal_fsync_interval_ms'])
+        
+    def get_tag_matcher(self):
+        """获取编译好的来源标签匹配器（标签配置变化后首次使用时重新编译）"""
+        if self._tag_matcher is None:
+            from tag_rules import TagMatcher
+            
+            try:
+                self._tag_matcher = TagMatcher(
+                    self.get('text_source_tags', self.default_config['text_source_tags']),
+                    self.get('text_source_tag_rules', self.default_config['text_source_tag_rules']),
+                )
+            except Exception as e:
+                print(f"来源标签规则无效，只使用进程名标签：{e}")
+                self._tag_matcher = TagMatcher(self.get('text_source_tags', self.default_config['text_source_tags']))
+        return self._tag_matcher
+        
+    def get_text_source_tag(self, process_name, window_title=None):
         """获取文本来源标签"""
-        tags = self.get('text_source_tags', self.default_config['text_source_tags'])
-        return tags.get(process_name, f'[{process_name}]')
+        return self.get_tag_matcher().match(process_name, window_title)
         
     def add_text_source_tag(self, process_name, tag):
         """添加文本来源标签"""
@@ -167,10 +420,27 @@ class Config:
         
     def reset_to_default(self):
         """重置为默认配置"""
-        self.config = self.default_config.copy()
+        self.config = copy.deepcopy(self.default_config)
+        self._tag_matcher = None
         self.save_config()
         print("配置已重置为默认值")
         
 
-# 创建全局配置对象
-config = Config()
\ No newline at end of file
+_config = None
+
+
+def get_config():
+    """获取全局配置对象（首次使用时才创建并读取配置文件）"""
+    global _config
+    if _config is None:
+        _config = Config()
+        # 之后访问 config.config 直接命中模块属性，不再经过 __getattr__
+        globals()['config'] = _config
+    return _config
+
+
+def __getattr__(name):
+    """延迟创建全局配置对象：import config 时不读写配置文件，首次访问 config.config 时才创建"""
+    if name == 'config':
+        return get_config()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
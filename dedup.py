@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""最近捕获去重索引
+
+以内容摘要为键记录最近保存过的文本，容量有限并按时间淘汰，
+用于在任何清理、打标签和保存工作之前快速跳过重复捕获
+"""
+
+import hashlib
+import time
+from collections import OrderedDict
+
+
+class RecentCaptureIndex:
+    """有界的最近捕获去重索引
+
+    - 键为文本的blake2b摘要（16字节），内存占用与文本长度无关
+    - 超过 max_size 时淘汰最早加入的记录
+    - 加入或最近一次命中超过 ttl 秒的记录视为过期，同样的文本可以再次保存；
+      一直没有变化的选区每次命中都会续期，不会每隔 ttl 秒重复保存
+    """
+
+    def __init__(self, max_size=256, ttl=600.0, clock=time.monotonic):
+        """初始化索引
+
+        Args:
+            max_size: 最多记录的摘要数
+            ttl: 记录的有效期（秒），<=0 表示不按时间淘汰
+            clock: 时钟函数，便于测试时注入
+        """
+        self.max_size = max(1, int(max_size))
+        self.ttl = float(ttl)
+        self.clock = clock
+        self.entries = OrderedDict()  # 摘要 -> 加入或最近命中时间，按该时间排列
+        self.suppressed_count = 0  # 被跳过的重复捕获数
+
+    @staticmethod
+    def digest(text):
+        """计算文本摘要"""
+        return hashlib.blake2b(text.encode('utf-8', 'surrogatepass'), digest_size=16).digest()
+
+    def _evict_expired(self, now):
+        """淘汰过期记录（记录按加入或命中时间有序，只需从头检查）"""
+        if self.ttl <= 0:
+            return
+        while self.entries:
+            key, added_time = next(iter(self.entries.items()))
+            if now - added_time < self.ttl:
+                break
+            del self.entries[key]
+
+    def is_duplicate(self, digest):
+        """检查摘要是否在索引中，是则计为一次被跳过的重复并续期"""
+        now = self.clock()
+        self._evict_expired(now)
+        if digest in self.entries:
+            self.entries.move_to_end(digest)
+            self.entries[digest] = now
+            self.suppressed_count += 1
+            return True
+        return False
+
+    def add(self, digest):
+        """记录一条已保存的捕获"""
+        now = self.clock()
+        self._evict_expired(now)
+        self.entries.pop(digest, None)
+        self.entries[digest] = now
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+
+    def clear(self):
+        """清空索引和计数"""
+        self.entries.clear()
+        self.suppressed_count = 0
+
+    def __len__(self):
+        return len(self.entries)
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""流式DOCX导出
+
+python-docx 会在内存中构建整个文档树，导出几十万条捕获时又慢又占内存。
+这里直接把 word/document.xml 以流的方式写入zip：逐条读取捕获、
+按块写出段落，内存占用与捕获条数无关。
+生成的文档版式与 DocxWriter / utils.save_text_to_docx 一致：
+一个"Title"样式的标题，之后每条捕获一个"[标签] 文本"段落
+"""
+
+import os
+import re
+import zipfile
+from datetime import datetime, timezone
+from xml.sax.saxutils import escape
+
+from docx_writer import format_capture
+
+# XML 1.0 不允许的控制字符（制表符、换行、回车除外）
+_INVALID_XML_CHARS = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f\ufffe\uffff]')
+# python-docx 把换行和制表符写成 <w:br/> 和 <w:tab/>
+_RUN_SPECIAL_CHARS = re.compile('(\r\n|[\r\n\t])')
+
+_W_NAMESPACE = 'http://schemas.openxmlformats.org/wordprocessingml/2006/main'
+_R_NAMESPACE = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships'
+
+_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/word/document.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/>'
+    '<Override PartName="/word/styles.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.styles+xml"/>'
+    '<Override PartName="/docProps/core.xml" '
+    'ContentType="application/vnd.openxmlformats-package.core-properties+xml"/>'
+    '</Types>'
+)
+
+_PACKAGE_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+    'Target="word/document.xml"/>'
+    '<Relationship Id="rId2" '
+    'Type="http://schemas.openxmlformats.org/package/2006/relationships/metadata/core-properties" '
+    'Target="docProps/core.xml"/>'
+    '</Relationships>'
+)
+
+_DOCUMENT_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" '
+    'Target="styles.xml"/>'
+    '</Relationships>'
+)
+
+# Normal 和 Title 两个样式，取值与 python-docx 默认模板一致
+_STYLES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    f'<w:styles xmlns:w="{_W_NAMESPACE}">'
+    '<w:docDefaults>'
+    '<w:rPrDefault><w:rPr><w:rFonts w:asciiTheme="minorHAnsi" w:eastAsiaTheme="minorEastAsia" '
+    'w:hAnsiTheme="minorHAnsi" w:cstheme="minorBidi"/><w:sz w:val="24"/><w:szCs w:val="24"/>'
+    '<w:lang w:val="en-US" w:eastAsia="zh-CN" w:bidi="ar-SA"/></w:rPr></w:rPrDefault>'
+    '<w:pPrDefault/>'
+    '</w:docDefaults>'
+    '<w:style w:type="paragraph" w:default="1" w:styleId="Normal"><w:name w:val="Normal"/><w:qFormat/></w:style>'
+    '<w:style w:type="paragraph" w:styleId="Title"><w:name w:val="Title"/><w:basedOn w:val="Normal"/>'
+    '<w:next w:val="Normal"/><w:qFormat/>'
+    '<w:pPr><w:pBdr><w:bottom w:val="single" w:sz="8" w:space="4" w:color="4F81BD" w:themeColor="accent1"/>'
+    '</w:pBdr><w:spacing w:after="300" w:line="240" w:lineRule="auto"/><w:contextualSpacing/></w:pPr>'
+    '<w:rPr><w:rFonts w:asciiTheme="majorHAnsi" w:eastAsiaTheme="majorEastAsia" w:hAnsiTheme="majorHAnsi" '
+    'w:cstheme="majorBidi"/><w:color w:val="17365D" w:themeColor="text2" w:themeShade="BF"/>'
+    '<w:spacing w:val="5"/><w:kern w:val="28"/><w:sz w:val="52"/><w:szCs w:val="52"/></w:rPr>'
+    '</w:style>'
+    '</w:styles>'
+)
+
+_DOCUMENT_HEAD = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    f'<w:document xmlns:w="{_W_NAMESPACE}" xmlns:r="{_R_NAMESPACE}"><w:body>'
+)
+
+# 与 python-docx 默认模板相同的页面设置（Letter，左右边距1.25英寸）
+_DOCUMENT_TAIL = (
+    '<w:sectPr><w:pgSz w:w="12240" w:h="15840"/>'
+    '<w:pgMar w:top="1440" w:right="1800" w:bottom="1440" w:left="1800" w:header="720" w:footer="720" w:gutter="0"/>'
+    '<w:cols w:space="720"/><w:docGrid w:linePitch="360"/></w:sectPr>'
+    '</w:body></w:document>'
+)
+
+
+def _core_properties(title):
+    """文档属性（标题和创建时间）"""
+    created = datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+    return (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<cp:coreProperties xmlns:cp="http://schemas.openxmlformats.org/package/2006/metadata/core-properties" '
+        'xmlns:dc="http://purl.org/dc/elements/1.1/" xmlns:dcterms="http://purl.org/dc/terms/" '
+        'xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance">'
+        f'<dc:title>{escape(title)}</dc:title>'
+        f'<dcterms:created xsi:type="dcterms:W3CDTF">{created}</dcterms:created>'
+        '</cp:coreProperties>'
+    )
+
+
+def paragraph_xml(text, style=None):
+    """生成一个段落的XML，换行和制表符的写法与 python-docx 的 add_paragraph 相同"""
+    text = _INVALID_XML_CHARS.sub('', text)
+    parts = []
+    for piece in _RUN_SPECIAL_CHARS.split(text):
+        if not piece:
+            continue
+        if piece == '\t':
+            parts.append('<w:tab/>')
+        elif piece in ('\r\n', '\r', '\n'):
+            parts.append('<w:br/>')
+        else:
+            parts.append(f'<w:t xml:space="preserve">{escape(piece)}</w:t>')
+
+    properties = f'<w:pPr><w:pStyle w:val="{style}"/></w:pPr>' if style else ''
+    run = f'<w:r>{"".join(parts)}</w:r>' if parts else ''
+    return f'<w:p>{properties}{run}</w:p>'
+
+
+def write_docx_stream(docx_path, captures, title='文本捕获记录', chunk_size=256):
+    """把捕获流式写成DOCX文档
+
+    先写入临时文件再替换，导出中途失败不会损坏已有文件
+
+    Args:
+        docx_path: 输出路径
+        captures: 捕获的可迭代对象，元素需有 text 和 source_tag 属性
+                  （CaptureRecord、CaptureEntry），逐条读取，不会整体加载
+        title: 文档标题
+        chunk_size: 每累计多少个段落写入一次zip流
+
+    Returns:
+        int: 写入的捕获数
+    """
+    temp_path = docx_path + '.tmp'
+    count = 0
+    try:
+        with zipfile.ZipFile(temp_path, 'w', compression=zipfile.ZIP_DEFLATED) as package:
+            package.writestr('[Content_Types].xml', _CONTENT_TYPES)
+            package.writestr('_rels/.rels', _PACKAGE_RELS)
+            package.writestr('docProps/core.xml', _core_properties(title))
+            package.writestr('word/_rels/document.xml.rels', _DOCUMENT_RELS)
+            package.writestr('word/styles.xml', _STYLES)
+
+            # force_zip64：写入前不知道最终大小，超大文档也能正确写出
+            with package.open('word/document.xml', 'w', force_zip64=True) as stream:
+                chunk = [_DOCUMENT_HEAD, paragraph_xml(title, style='Title')]
+                for capture in captures:
+                    chunk.append(paragraph_xml(format_capture(capture.text, capture.source_tag)))
+                    count += 1
+                    if len(chunk) >= chunk_size:
+                        stream.write(''.join(chunk).encode('utf-8'))
+                        chunk.clear()
+                chunk.append(_DOCUMENT_TAIL)
+                stream.write(''.join(chunk).encode('utf-8'))
+
+        os.replace(temp_path, docx_path)
+    except Exception:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    return count
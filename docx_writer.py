@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+"""增量Word文档写入器
+
+在整个捕获会话中保持文档打开，只追加段落，按策略落盘，
+避免每次捕获都重新解析并重写整个DOCX文件。
+配合预写日志使用时，捕获先写入日志，文档落盘后再提交日志
+"""
+
+import os
+import shutil
+import time
+from collections import OrderedDict, namedtuple
+
+import utils
+
+# 一条待写入的捕获
+# entry_id 由调用方分配，用于之后更新同一条捕获；replace 为True时更新该条而不是新增段落
+# process_name、captured_at、session_id 只写入捕获存储，不写入文档
+CaptureEntry = namedtuple('CaptureEntry',
+                          ['text', 'source_tag', 'entry_id', 'replace', 'process_name', 'captured_at', 'session_id'],
+                          defaults=(None, None, False, None, None, None))
+
+
+def format_capture(text, source_tag=None):
+    """格式化一条捕获对应的段落文本"""
+    return f"{source_tag} {text}" if source_tag else text
+
+
+def save_document_atomic(document, docx_path):
+    """先保存到临时文件再替换，避免写入中途崩溃导致文档损坏"""
+    temp_path = docx_path + '.tmp'
+    document.save(temp_path)
+    os.replace(temp_path, docx_path)
+
+
+def copy_document(source_path, target_path):
+    """把文档另存到 target_path
+    
+    不解析文档，直接按字节复制整个文件（原有段落和格式原样保留），耗时与段落数无关；
+    先复制到临时文件再替换，中途失败不会留下不完整的目标文件
+    """
+    temp_path = target_path + '.tmp'
+    try:
+        shutil.copyfile(source_path, temp_path)
+        os.replace(temp_path, target_path)
+    except Exception:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+class DocxWriter:
+    """会话级DOCX追加写入器
+
+    文档只在打开时解析一次，之后的 append 只是在内存中追加段落，
+    真正的磁盘写入由刷新策略决定：
+    - 每累计 flush_every 条未保存的捕获刷新一次
+    - 距离上次刷新超过 flush_interval 秒刷新一次
+    - close() 时强制刷新
+
+    传入 journal 时，每条捕获先追加到日志，文档落盘后提交日志，
+    正常关闭时删除日志。
+    最近写入的 max_recent 条捕获保留段落引用，可以原地更新（选区增长合并）
+    """
+
+    max_recent = 16
+
+    def __init__(self, docx_path, flush_every=20, flush_interval=5.0, title='文本捕获记录', journal=None):
+        """初始化写入器
+
+        Args:
+            docx_path: 文档路径
+            flush_every: 累计多少条未保存的捕获后刷新，<=1 表示每条都刷新
+            flush_interval: 距离上次刷新多少秒后刷新，<=0 表示不按时间刷新
+            title: 新建文档时使用的标题
+            journal: 预写日志（CaptureJournal），为None时不记录日志
+        """
+        self.docx_path = docx_path
+        self.flush_every = max(1, int(flush_every or 1))
+        self.flush_interval = float(flush_interval or 0)
+        self.title = title
+        self.journal = journal
+        self.document = None
+        self.pending_count = 0  # 尚未落盘的段落数
+        self.paragraph_count = 0  # 文档中的段落数（不含标题）
+        self.last_flush_time = time.monotonic()
+        self.recent_paragraphs = OrderedDict()  # entry_id -> (段落序号, 段落)
+
+    def open(self):
+        """打开或创建文档（整个会话只解析一次）"""
+        if self.document is not None:
+            return self.document
+
+        from docx import Document
+
+        is_valid, error_msg = utils.validate_file_path(self.docx_path, extension='.docx')
+        if not is_valid:
+            raise ValueError(error_msg)
+
+        if os.path.exists(self.docx_path):
+            self.document = Document(self.docx_path)
+            # 第一段为标题
+            self.paragraph_count = max(0, len(self.document.paragraphs) - 1)
+        else:
+            self.document = Document()
+            self.document.add_heading(self.title, 0)
+            self.paragraph_count = 0
+            self.pending_count = 1  # 新文档尚未写入磁盘
+
+        self.last_flush_time = time.monotonic()
+        utils.logger.info(f"文档写入器已打开：{self.docx_path}")
+        return self.document
+
+    @property
+    def path(self):
+        """输出文件路径（与其它输出的接口一致）"""
+        return self.docx_path
+
+    @property
+    def is_open(self):
+        """文档是否已打开"""
+        return self.document is not None
+
+    def append(self, text, source_tag=None):
+        """追加一段文本，必要时按策略刷新
+
+        Args:
+            text: 已清理的文本
+            source_tag: 来源标签
+
+        Returns:
+            bool: 本次追加是否触发了刷新
+        """
+        return self.write_many([CaptureEntry(text, source_tag)])
+
+    def write_many(self, entries):
+        """批量写入捕获，整批只同步一次日志、最多刷新一次文档
+
+        Args:
+            entries: CaptureEntry 列表；replace 为True且目标段落仍在最近记录中时原地更新，
+                     否则追加新段落
+
+        Returns:
+            bool: 本批写入是否触发了刷新
+        """
+        document = self.open()
+        for entry in entries:
+            if not entry.text:
+                continue
+
+            target = self.recent_paragraphs.get(entry.entry_id) if entry.replace else None
+            if target is not None:
+                index, paragraph = target
+                if self.journal:
+                    self.journal.replace(index, entry.text, entry.source_tag, sync=False)
+                paragraph.text = format_capture(entry.text, entry.source_tag)
+            else:
+                index = self.paragraph_count
+                if self.journal:
+                    self.journal.append(entry.text, entry.source_tag, index=index, sync=False)
+                paragraph = document.add_paragraph(format_capture(entry.text, entry.source_tag))
+                self.paragraph_count += 1
+
+            if entry.entry_id is not None:
+                self.recent_paragraphs.pop(entry.entry_id, None)
+                self.recent_paragraphs[entry.entry_id] = (index, paragraph)
+                while len(self.recent_paragraphs) > self.max_recent:
+                    self.recent_paragraphs.popitem(last=False)
+
+            self.pending_count += 1
+
+        if self.journal:
+            self.journal.group_commit()
+        return self.flush_if_due()
+
+    def can_replace(self, entry_id):
+        """编号为 entry_id 的捕获能否原地更新（仍在最近写入的段落中）"""
+        return entry_id in self.recent_paragraphs
+
+    def flush_if_due(self):
+        """如果满足刷新条件则刷新
+
+        Returns:
+            bool: 是否执行了刷新
+        """
+        if self.journal:
+            self.journal.sync_if_due()
+
+        if self.pending_count == 0:
+            return False
+
+        if self.pending_count >= self.flush_every:
+            self.flush()
+            return True
+
+        if self.flush_interval > 0 and time.monotonic() - self.last_flush_time >= self.flush_interval:
+            self.flush()
+            return True
+
+        return False
+
+    def flush(self):
+        """将内存中的文档写入磁盘"""
+        if self.document is None or self.pending_count == 0:
+            return
+
+        save_document_atomic(self.document, self.docx_path)
+        if self.journal:
+            self.journal.commit()
+        utils.logger.debug("文档已刷新：%s（%d条新内容）", self.docx_path, self.pending_count)
+        self.pending_count = 0
+        self.last_flush_time = time.monotonic()
+
+    def close(self):
+        """刷新并关闭文档，全部内容落盘后删除日志"""
+        try:
+            self.flush()
+            if self.journal:
+                self.journal.close(remove=True)
+        finally:
+            if self.journal:
+                self.journal.close()
+            self.document = None
+            self.pending_count = 0
+            self.recent_paragraphs.clear()
@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+"""捕获预写日志
+
+每条捕获在写入DOCX之前先追加到JSONL日志中，
+DOCX成功落盘后写入提交记录；程序异常退出后，
+启动时根据日志把尚未写入DOCX的捕获补回文档
+"""
+
+import glob
+import json
+import os
+import time
+
+import utils
+
+JOURNAL_SUFFIX = '.journal'
+
+FSYNC_ALWAYS = 'always'  # 每条捕获都fsync
+FSYNC_INTERVAL = 'interval'  # 组提交：距离上次fsync超过间隔才fsync
+FSYNC_NONE = 'none'  # 只写入操作系统缓冲区，不主动fsync
+
+FSYNC_MODES = (FSYNC_ALWAYS, FSYNC_INTERVAL, FSYNC_NONE)
+
+
+def get_journal_path(docx_path):
+    """获取文档对应的日志文件路径"""
+    return docx_path + JOURNAL_SUFFIX
+
+
+class CaptureJournal:
+    """追加写入的捕获日志
+
+    日志为JSONL格式，每行一条记录：
+    - header: 日志对应的文档路径
+    - capture: 一条捕获（seq递增，index为其在文档中的段落序号，不含标题）
+    - replace: 更新第index段的内容（选区增长合并）
+    - commit: seq及之前的记录均已写入文档
+    """
+
+    def __init__(self, journal_path, docx_path, fsync_mode=FSYNC_INTERVAL, fsync_interval_ms=200):
+        """初始化日志
+
+        Args:
+            journal_path: 日志文件路径
+            docx_path: 日志对应的文档路径
+            fsync_mode: fsync策略，always/interval/none
+            fsync_interval_ms: interval模式下的组提交间隔（毫秒）
+        """
+        if fsync_mode not in FSYNC_MODES:
+            utils.logger.warning(f"未知的日志fsync策略：{fsync_mode}，使用{FSYNC_INTERVAL}")
+            fsync_mode = FSYNC_INTERVAL
+
+        self.journal_path = journal_path
+        self.docx_path = docx_path
+        self.fsync_mode = fsync_mode
+        self.fsync_interval = max(0, fsync_interval_ms) / 1000.0
+        self.file = None
+        self.last_seq = 0
+        self.committed_seq = 0
+        self.unsynced = False
+        self.last_sync_time = time.monotonic()
+
+    def open(self):
+        """打开日志文件，已存在时接着原有序号继续写入"""
+        if self.file is not None:
+            return
+
+        if os.path.exists(self.journal_path):
+            _, records, committed_seq = read_journal(self.journal_path)
+            self.last_seq = records[-1]['seq'] if records else 0
+            self.committed_seq = committed_seq
+            self._truncate_torn_tail()
+            self.file = open(self.journal_path, 'ab')
+        else:
+            self.file = open(self.journal_path, 'ab')
+            self._write({'type': 'header', 'docx': self.docx_path, 'created': utils.get_timestamp()})
+            self.sync()
+
+    def append(self, text, source_tag=None, index=None, sync=True):
+        """追加一条捕获
+
+        Args:
+            text: 捕获的文本
+            source_tag: 来源标签
+            index: 捕获在文档中的段落序号（不含标题）
+            sync: 是否按fsync策略立即同步，批量写入时由调用方最后调用 group_commit()
+
+        Returns:
+            int: 记录的序号
+        """
+        return self._append_record('capture', text, source_tag, index, sync)
+
+    def replace(self, index, text, source_tag=None, sync=True):
+        """记录第index段被更新为新的捕获内容
+
+        Returns:
+            int: 记录的序号
+        """
+        return self._append_record('replace', text, source_tag, index, sync)
+
+    def _append_record(self, record_type, text, source_tag, index, sync):
+        """追加一条捕获或更新记录"""
+        self.open()
+        self.last_seq += 1
+        self._write({
+            'type': record_type,
+            'seq': self.last_seq,
+            'index': index,
+            'time': utils.get_timestamp(),
+            'tag': source_tag,
+            'text': text,
+        })
+        if sync:
+            self.group_commit()
+        return self.last_seq
+
+    def group_commit(self):
+        """按fsync策略同步已追加的捕获"""
+        if self.fsync_mode == FSYNC_ALWAYS:
+            if self.unsynced:
+                self.sync()
+        else:
+            self.sync_if_due()
+
+    def commit(self):
+        """记录当前所有捕获均已写入文档"""
+        if self.file is None or self.committed_seq == self.last_seq:
+            return
+        self._write({'type': 'commit', 'seq': self.last_seq})
+        self.committed_seq = self.last_seq
+        if self.fsync_mode != FSYNC_NONE:
+            self.sync()
+
+    def sync_if_due(self):
+        """组提交：距离上次fsync超过间隔时fsync"""
+        if self.fsync_mode == FSYNC_INTERVAL and self.unsynced and \
+           time.monotonic() - self.last_sync_time >= self.fsync_interval:
+            self.sync()
+
+    def sync(self):
+        """将日志写入磁盘"""
+        if self.file is None:
+            return
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.unsynced = False
+        self.last_sync_time = time.monotonic()
+
+    def close(self, remove=False):
+        """关闭日志
+
+        Args:
+            remove: 是否删除日志文件（所有捕获都已提交时使用）
+        """
+        if self.file is not None:
+            try:
+                if self.fsync_mode != FSYNC_NONE and self.unsynced:
+                    self.sync()
+            finally:
+                self.file.close()
+                self.file = None
+
+        if remove and os.path.exists(self.journal_path):
+            os.remove(self.journal_path)
+
+    def _truncate_torn_tail(self):
+        """截掉崩溃时写了一半的最后一行，避免后续记录与其粘连"""
+        with open(self.journal_path, 'r+b') as f:
+            data = f.read()
+            if data and not data.endswith(b'\n'):
+                f.truncate(data.rfind(b'\n') + 1)
+
+    def _write(self, record):
+        """写入一条记录"""
+        line = json.dumps(record, ensure_ascii=False) + '\n'
+        self.file.write(line.encode('utf-8'))
+        self.file.flush()
+        self.unsynced = True
+
+
+def read_journal(journal_path):
+    """读取日志文件
+
+    最后一行可能因为进程崩溃而不完整，遇到无法解析的记录时停止读取
+
+    Returns:
+        tuple: (header, records, committed_seq)，records 为按顺序排列的 capture/replace 记录
+    """
+    header = None
+    records = []
+    committed_seq = 0
+
+    with open(journal_path, 'rb') as f:
+        for line in f:
+            try:
+                record = json.loads(line.decode('utf-8'))
+            except (UnicodeDecodeError, ValueError):
+                utils.logger.warning(f"日志记录不完整，已停止读取：{journal_path}")
+                break
+
+            record_type = record.get('type')
+            if record_type == 'header':
+                header = record
+            elif record_type in ('capture', 'replace'):
+                records.append(record)
+            elif record_type == 'commit':
+                committed_seq = max(committed_seq, record.get('seq', 0))
+
+    return header, records, committed_seq
+
+
+def replay_journal(journal_path, title='文本捕获记录'):
+    """把日志中尚未写入文档的捕获补回文档
+
+    记录带有段落序号，重放是幂等的：已经在文档中的段落会被覆盖为日志中的内容，
+    不存在的段落才追加。文档损坏无法打开时，用日志中的全部记录重建文档，
+    原文件保留为 .corrupt 备份
+
+    Returns:
+        int: 补回的记录条数
+    """
+    from docx import Document
+    from docx_writer import format_capture, save_document_atomic
+
+    header, records, committed_seq = read_journal(journal_path)
+    if not header or not header.get('docx'):
+        utils.logger.warning(f"日志缺少文档信息，无法恢复：{journal_path}")
+        return 0
+
+    docx_path = header['docx']
+    pending = [record for record in records if record['seq'] > committed_seq]
+
+    if not pending and os.path.exists(docx_path):
+        os.remove(journal_path)
+        return 0
+
+    document = None
+    if os.path.exists(docx_path):
+        try:
+            document = Document(docx_path)
+        except Exception as e:
+            backup_path = docx_path + '.corrupt'
+            utils.logger.error(f"文档已损坏，将根据日志重建 {docx_path}: {e}")
+            os.replace(docx_path, backup_path)
+
+    if document is None:
+        document = Document()
+        document.add_heading(title, 0)
+        pending = records
+
+    # 第一段为标题
+    paragraphs = document.paragraphs[1:]
+    for record in pending:
+        text = format_capture(record['text'], record.get('tag'))
+        index = record.get('index')
+        if index is not None and index < len(paragraphs):
+            paragraphs[index].text = text
+        elif record['type'] == 'capture':
+            paragraphs.append(document.add_paragraph(text))
+        else:
+            utils.logger.warning(f"日志中的更新记录找不到对应段落：{index}")
+
+    save_document_atomic(document, docx_path)
+    os.remove(journal_path)
+    utils.logger.info(f"已根据日志恢复{len(pending)}条记录到文档：{docx_path}")
+    return len(pending)
+
+
+def replay_pending_journals(directory):
+    """恢复目录下所有遗留日志
+
+    Returns:
+        int: 补回的捕获总数
+    """
+    total = 0
+    for journal_path in glob.glob(os.path.join(directory, '*.docx' + JOURNAL_SUFFIX)):
+        try:
+            total += replay_journal(journal_path)
+        except Exception as e:
+            utils.logger.error(f"恢复日志失败 {journal_path}: {e}")
+    return total
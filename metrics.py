@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+"""捕获流程指标
+
+记录捕获流程各阶段的计数和耗时直方图（模拟复制、读取剪贴板、清理、
+进程名查询、打标签、写入存储和文档等），用于定位捕获变慢的原因。
+
+指标始终在内存中累计（每次记录只是一次二分查找和几次加法）；
+本地HTTP接口默认关闭，开启后只监听 127.0.0.1：
+    /metrics       Prometheus 文本格式
+    /metrics.json  JSON
+"""
+
+import bisect
+import json
+import threading
+import time
+from contextlib import contextmanager
+
+# 耗时直方图的桶上界（秒），覆盖0.1毫秒到10秒
+DEFAULT_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025,
+                   0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# 阶段名 -> 托盘提示中的显示名称
+STAGE_LABELS = {
+    'probe': '探测',
+    'paste': '读剪贴板',
+    'clipboard_restore': '恢复剪贴板',
+    'sanitize': '清理',
+    'process_lookup': '进程名',
+    'tagging': '标签',
+    'handle': '处理',
+    'submit': '提交',
+    'store_write': '写存储',
+    'document_write': '写文档',
+    'acquire': '获取',
+    'filter': '过滤',
+    'dedup': '去重',
+    'tag': '打标签',
+    'persist': '提交写入',
+}
+
+METRIC_PREFIX = 'text_capture'
+
+
+class Histogram:
+    """固定桶的耗时直方图"""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # 最后一个桶为 +Inf
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        """记录一次耗时（秒）"""
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q):
+        """按桶估算分位数（取所在桶的上界），没有数据时返回None"""
+        if not self.count:
+            return None
+        rank = q * self.count
+        cumulative = 0
+        for index, bucket_count in enumerate(self.counts):
+            cumulative += bucket_count
+            if cumulative >= rank:
+                return self.buckets[index] if index < len(self.buckets) else float('inf')
+        return float('inf')
+
+    def snapshot(self):
+        """直方图数据（用于JSON输出）"""
+        return {
+            'count': self.count,
+            'sum': self.sum,
+            'buckets': dict(zip([str(bucket) for bucket in self.buckets] + ['+Inf'], self.counts)),
+            'p50': self.quantile(0.5),
+            'p95': self.quantile(0.95),
+        }
+
+
+class MetricsRegistry:
+    """计数器和各阶段耗时直方图
+
+    捕获线程、写入线程和主线程都会记录指标，修改在锁内完成
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counters = {}  # 名称 -> 数值
+        self.gauges = {}  # (名称, 阶段) -> 当前值（如各阶段的队列深度）
+        self.stages = {}  # 阶段名 -> Histogram
+        self.lock = threading.Lock()
+        self.start_time = time.time()
+
+    def increment(self, name, amount=1):
+        """计数器加 amount"""
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def set_gauge(self, name, value, stage=None):
+        """设置当前值指标（stage 为None时不带阶段标签）"""
+        with self.lock:
+            self.gauges[(name, stage)] = value
+
+    def observe(self, stage, seconds):
+        """记录一个阶段的耗时（秒）"""
+        with self.lock:
+            histogram = self.stages.get(stage)
+            if histogram is None:
+                histogram = self.stages[stage] = Histogram(self.buckets)
+            histogram.observe(seconds)
+
+    @contextmanager
+    def timed(self, stage):
+        """记录代码块耗时的上下文管理器（代码块抛出异常时同样记录）"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start)
+
+    def reset(self):
+        """清空所有指标"""
+        with self.lock:
+            self.counters.clear()
+            self.gauges.clear()
+            self.stages.clear()
+            self.start_time = time.time()
+
+    def to_dict(self):
+        """全部指标（JSON格式）"""
+        with self.lock:
+            return {
+                'uptime_seconds': round(time.time() - self.start_time, 3),
+                'counters': dict(self.counters),
+                'gauges': {name if stage is None else f'{name}[{stage}]': value
+                           for (name, stage), value in self.gauges.items()},
+                'stages': {stage: histogram.snapshot() for stage, histogram in self.stages.items()},
+            }
+
+    def to_prometheus(self):
+        """全部指标（Prometheus 文本格式）"""
+        lines = []
+        with self.lock:
+            for name, value in sorted(self.counters.items()):
+                metric = f'{METRIC_PREFIX}_{name}_total'
+                lines.append(f'# TYPE {metric} counter')
+                lines.append(f'{metric} {value}')
+
+            typed = set()
+            for (name, stage), value in sorted(self.gauges.items(), key=lambda item: (item[0][0], item[0][1] or '')):
+                metric = f'{METRIC_PREFIX}_{name}'
+                if name not in typed:
+                    lines.append(f'# TYPE {metric} gauge')
+                    typed.add(name)
+                labels = '' if stage is None else f'{{stage="{stage}"}}'
+                lines.append(f'{metric}{labels} {value}')
+
+            if self.stages:
+                metric = f'{METRIC_PREFIX}_stage_seconds'
+                lines.append(f'# HELP {metric} Capture pipeline stage latency in seconds.')
+                lines.append(f'# TYPE {metric} histogram')
+                for stage, histogram in sorted(self.stages.items()):
+                    cumulative = 0
+                    for bucket, bucket_count in zip(histogram.buckets, histogram.counts):
+                        cumulative += bucket_count
+                        lines.append(f'{metric}_bucket{{stage="{stage}",le="{bucket}"}} {cumulative}')
+                    lines.append(f'{metric}_bucket{{stage="{stage}",le="+Inf"}} {histogram.count}')
+                    lines.append(f'{metric}_sum{{stage="{stage}"}} {histogram.sum}')
+                    lines.append(f'{metric}_count{{stage="{stage}"}} {histogram.count}')
+        return '\n'.join(lines) + '\n'
+
+    def summary(self, stages=('probe', 'handle', 'document_write')):
+        """简短的中位耗时摘要（用于托盘提示），没有数据时返回空字符串"""
+        parts = []
+        with self.lock:
+            for stage in stages:
+                histogram = self.stages.get(stage)
+                if histogram is None or not histogram.count:
+                    continue
+                p50 = histogram.quantile(0.5)
+                value = '>10s' if p50 == float('inf') else f'≤{p50 * 1000:g}ms'
+                parts.append(f'{STAGE_LABELS.get(stage, stage)}{value}')
+        return ' '.join(parts)
+
+
+class MetricsServer:
+    """只监听本机的指标HTTP接口（后台线程）"""
+
+    def __init__(self, registry, port=9464, host='127.0.0.1'):
+        self.registry = registry
+        self.host = host
+        self.port = port
+        self.server = None
+        self.thread = None
+
+    def start(self):
+        """启动HTTP服务"""
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        registry = self.registry
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                path = self.path.split('?', 1)[0]
+                if path == '/metrics':
+                    body = registry.to_prometheus().encode('utf-8')
+                    content_type = 'text/plain; version=0.0.4; charset=utf-8'
+                elif path == '/metrics.json':
+                    body = json.dumps(registry.to_dict(), ensure_ascii=False).encode('utf-8')
+                    content_type = 'application/json; charset=utf-8'
+                else:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass  # 不输出访问日志
+
+        self.server = ThreadingHTTPServer((self.host, self.port), Handler)
+        self.port = self.server.server_address[1]  # port=0 时为系统分配的端口
+        self.thread = threading.Thread(target=self.server.serve_forever, name='metrics-server', daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        """停止HTTP服务"""
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+            self.thread = None
+
+
+# 全局指标
+registry = MetricsRegistry()
+increment = registry.increment
+set_gauge = registry.set_gauge
+observe = registry.observe
+timed = registry.timed
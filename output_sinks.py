@@ -0,0 +1,316 @@
+#!/usr/bin/env python3
+"""捕获输出
+
+捕获可以写入不同格式的输出文件：
+- docx：Word文档（DocxWriter，落盘时整体重写zip）
+- jsonl / markdown / text：追加写入的文本文件，每条捕获只追加几行，开销与文件大小无关
+
+所有输出提供相同的接口（open / write_many / can_replace / flush_if_due / flush / close / path），
+写入线程不关心具体格式。格式由配置 output_format 指定，为 auto 时按文件扩展名选择
+"""
+
+import json
+import os
+import time
+from collections import deque
+from datetime import datetime
+
+import utils
+from docx_writer import CaptureEntry, DocxWriter, format_capture
+
+FORMAT_AUTO = 'auto'
+FORMAT_DOCX = 'docx'
+FORMAT_JSONL = 'jsonl'
+FORMAT_MARKDOWN = 'markdown'
+FORMAT_TEXT = 'text'
+
+# 格式 -> 默认扩展名
+FORMAT_EXTENSIONS = {
+    FORMAT_DOCX: '.docx',
+    FORMAT_JSONL: '.jsonl',
+    FORMAT_MARKDOWN: '.md',
+    FORMAT_TEXT: '.txt',
+}
+
+# 扩展名 -> 格式
+EXTENSION_FORMATS = {
+    '.docx': FORMAT_DOCX,
+    '.jsonl': FORMAT_JSONL,
+    '.md': FORMAT_MARKDOWN,
+    '.markdown': FORMAT_MARKDOWN,
+    '.txt': FORMAT_TEXT,
+}
+
+# 格式 -> 文件对话框过滤器
+FORMAT_FILE_FILTERS = {
+    FORMAT_DOCX: 'Word文档 (*.docx)',
+    FORMAT_JSONL: 'JSON Lines (*.jsonl)',
+    FORMAT_MARKDOWN: 'Markdown (*.md *.markdown)',
+    FORMAT_TEXT: '文本文件 (*.txt)',
+}
+
+
+def resolve_output_format(output_format, path=None):
+    """确定输出格式：指定了具体格式时直接使用，auto 时按扩展名判断，无法判断时使用docx"""
+    if output_format in FORMAT_EXTENSIONS:
+        return output_format
+    extension = os.path.splitext(path or '')[1].lower()
+    return EXTENSION_FORMATS.get(extension, FORMAT_DOCX)
+
+
+def with_format_extension(path, output_format):
+    """把路径的扩展名改为输出格式对应的扩展名（已经匹配时原样返回）"""
+    root, extension = os.path.splitext(path)
+    if EXTENSION_FORMATS.get(extension.lower()) == output_format:
+        return path
+    return root + FORMAT_EXTENSIONS[output_format]
+
+
+def get_file_filter(output_format):
+    """获取输出格式对应的文件对话框过滤器"""
+    return FORMAT_FILE_FILTERS.get(output_format, FORMAT_FILE_FILTERS[FORMAT_DOCX])
+
+
+class TextSink:
+    """追加写入的文本输出
+
+    每条捕获追加到文件末尾，不重写已有内容。
+    选区增长合并时，如果要更新的捕获在最近写入的 max_recent 条之中，
+    从它的起始位置截断文件，写入更新后的内容，再重写它之后的几条（与 DocxWriter 原地更新段落一致）；
+    已经不在最近记录中的捕获无法更新，记录警告后追加为新记录
+    （JSONL 记录带 replace 标记，读取时以最后一条为准）。
+    刷新策略与 DocxWriter 相同：累计 flush_every 条或超过 flush_interval 秒后 fsync
+    """
+
+    format_name = None
+    max_recent = 16
+
+    def __init__(self, path, flush_every=20, flush_interval=5.0, title='文本捕获记录'):
+        """初始化输出
+
+        Args:
+            path: 输出文件路径
+            flush_every: 累计多少条未落盘的捕获后刷新，<=1 表示每条都刷新
+            flush_interval: 距离上次刷新多少秒后刷新，<=0 表示不按时间刷新
+            title: 新建文件时写入的标题（JSONL 没有标题）
+        """
+        self.path = path
+        self.flush_every = max(1, int(flush_every or 1))
+        self.flush_interval = float(flush_interval or 0)
+        self.title = title
+        self.file = None
+        self.size = 0  # 文件当前长度（字节）
+        self.pending_count = 0  # 尚未落盘的捕获数
+        self.last_flush_time = time.monotonic()
+        # 文件末尾最近写入的捕获：(entry_id, 起始位置, 内容)，按文件中的顺序排列，一直覆盖到文件末尾
+        self.recent_entries = deque()
+
+    def open(self):
+        """打开或创建输出文件"""
+        if self.file is not None:
+            return self.file
+
+        is_valid, error_msg = utils.validate_file_path(self.path)
+        if not is_valid:
+            raise ValueError(error_msg)
+
+        self.file = open(self.path, 'ab')
+        self.size = os.fstat(self.file.fileno()).st_size
+        if self.size == 0:
+            header = self.format_header()
+            if header:
+                self._write(header)
+                self.pending_count = 1  # 新文件尚未写入磁盘
+
+        self.last_flush_time = time.monotonic()
+        utils.logger.info(f"输出文件已打开：{self.path}")
+        return self.file
+
+    @property
+    def is_open(self):
+        """文件是否已打开"""
+        return self.file is not None
+
+    def format_header(self):
+        """新文件的开头内容"""
+        return ''
+
+    def format_entry(self, entry):
+        """一条捕获对应的文本"""
+        raise NotImplementedError
+
+    def _write(self, data):
+        """在文件末尾写入文本"""
+        self._write_bytes(data.encode('utf-8'))
+
+    def _write_bytes(self, data):
+        """在文件末尾写入字节"""
+        self.file.write(data)
+        self.size += len(data)
+
+    def _append_entry(self, entry_id, data):
+        """在文件末尾写入一条捕获并记录到最近写入的捕获中"""
+        self.recent_entries.append((entry_id, self.size, data))
+        self._write_bytes(data)
+        if len(self.recent_entries) > self.max_recent:
+            self.recent_entries.popleft()
+
+    def _replace_entry(self, entry_id, data):
+        """更新最近写入的一条捕获：从它的起始位置截断，写入新内容后重写之后的捕获
+
+        Returns:
+            bool: 是否找到并更新了这条捕获
+        """
+        for position, (recent_id, offset, _) in enumerate(self.recent_entries):
+            if recent_id == entry_id:
+                break
+        else:
+            return False
+
+        following = list(self.recent_entries)[position + 1:]
+        for _ in range(len(self.recent_entries) - position):
+            self.recent_entries.pop()
+
+        self.file.flush()
+        self.file.truncate(offset)
+        self.size = offset
+        self._append_entry(entry_id, data)
+        for recent_id, _, recent_data in following:
+            self._append_entry(recent_id, recent_data)
+        return True
+
+    def append(self, text, source_tag=None):
+        """追加一条捕获，必要时按策略刷新"""
+        return self.write_many([CaptureEntry(text, source_tag)])
+
+    def write_many(self, entries):
+        """批量写入捕获，整批最多刷新一次
+
+        Returns:
+            bool: 本批写入是否触发了刷新
+        """
+        self.open()
+        for entry in entries:
+            if not entry.text:
+                continue
+
+            data = self.format_entry(entry).encode('utf-8')
+            self.pending_count += 1
+            if entry.replace and entry.entry_id is not None:
+                if self._replace_entry(entry.entry_id, data):
+                    continue
+                utils.logger.warning(f"要更新的捕获（编号{entry.entry_id}）已不在最近写入的"
+                                     f"{self.max_recent}条中，追加为新记录：{self.path}")
+            self._append_entry(entry.entry_id, data)
+
+        self.file.flush()
+        return self.flush_if_due()
+
+    def can_replace(self, entry_id):
+        """编号为 entry_id 的捕获能否原地更新（仍在最近写入的捕获中）"""
+        return any(recent_id == entry_id for recent_id, _, _ in self.recent_entries)
+
+    def flush_if_due(self):
+        """如果满足刷新条件则刷新
+
+        Returns:
+            bool: 是否执行了刷新
+        """
+        if self.pending_count == 0:
+            return False
+
+        if self.pending_count >= self.flush_every or \
+           (self.flush_interval > 0 and time.monotonic() - self.last_flush_time >= self.flush_interval):
+            self.flush()
+            return True
+
+        return False
+
+    def flush(self):
+        """把写入的内容同步到磁盘"""
+        if self.file is None or self.pending_count == 0:
+            return
+
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        utils.logger.debug("输出文件已刷新：%s（%d条新内容）", self.path, self.pending_count)
+        self.pending_count = 0
+        self.last_flush_time = time.monotonic()
+
+    def close(self):
+        """刷新并关闭文件"""
+        if self.file is None:
+            return
+        try:
+            self.flush()
+        finally:
+            self.file.close()
+            self.file = None
+            self.pending_count = 0
+            self.recent_entries.clear()
+
+
+class JsonlSink(TextSink):
+    """JSON Lines 输出：每条捕获一行JSON，包含时间、来源和会话等字段"""
+
+    format_name = FORMAT_JSONL
+
+    def format_entry(self, entry):
+        record = {
+            'time': datetime.fromtimestamp(entry.captured_at or time.time()).isoformat(timespec='seconds'),
+            'session_id': entry.session_id,
+            'entry_id': entry.entry_id,
+            'source_tag': entry.source_tag,
+            'process_name': entry.process_name,
+            'text': entry.text,
+        }
+        if entry.replace:
+            record['replace'] = True
+        return json.dumps(record, ensure_ascii=False) + '\n'
+
+
+class MarkdownSink(TextSink):
+    """Markdown 输出：一级标题，之后每条捕获一个段落，捕获内的换行写成硬换行"""
+
+    format_name = FORMAT_MARKDOWN
+
+    def format_header(self):
+        return f"# {self.title}\n\n"
+
+    def format_entry(self, entry):
+        text = '  \n'.join(entry.text.splitlines())
+        return format_capture(text, entry.source_tag) + '\n\n'
+
+
+class PlainTextSink(TextSink):
+    """纯文本输出：标题行，之后每条捕获之间空一行"""
+
+    format_name = FORMAT_TEXT
+
+    def format_header(self):
+        return f"{self.title}\n\n"
+
+    def format_entry(self, entry):
+        return format_capture(entry.text, entry.source_tag) + '\n\n'
+
+
+TEXT_SINKS = {
+    FORMAT_JSONL: JsonlSink,
+    FORMAT_MARKDOWN: MarkdownSink,
+    FORMAT_TEXT: PlainTextSink,
+}
+
+
+def create_sink(path, output_format=FORMAT_AUTO, journal=None, **options):
+    """创建输出
+
+    Args:
+        path: 输出文件路径
+        output_format: 输出格式（docx/jsonl/markdown/text），auto 时按扩展名选择
+        journal: 预写日志，只有docx输出使用（文本输出本身就是追加写入）
+        options: 传给输出的刷新策略等参数（flush_every、flush_interval、title）
+    """
+    output_format = resolve_output_format(output_format, path)
+    if output_format == FORMAT_DOCX:
+        return DocxWriter(path, journal=journal, **options)
+    return TEXT_SINKS[output_format](path, **options)
@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+"""捕获会话性能分析
+
+用于排查现场变慢的捕获会话：在一段时间内（通常是一次捕获会话，从开始捕获到停止捕获）
+- 用采样方式记录所有线程的调用栈（捕获线程、写入线程和主线程都包括在内），
+  不像 cProfile 那样只分析调用它的线程，也不会拖慢被分析的代码。
+  采样按墙钟时间进行，结果是墙钟时间分布而不是CPU时间：停在已知空闲等待中的线程
+  （Event/Condition 等待、selector、线程池和日志队列取任务、剪贴板消息等待、Qt 事件循环）
+  不计入结果，只统计空闲次数；time.sleep 等其他阻塞调用仍会计入
+- 用 tracemalloc 在开始和结束时各拍一次内存快照，对比内存增长最多的代码行
+
+结束时把结果写到应用数据目录的 profiles 子目录：
+    profile_<时间>.txt     按函数统计的采样结果（自身/累计）
+    profile_<时间>.folded  折叠调用栈，可直接用 flamegraph.pl / speedscope 生成火焰图
+    memory_<时间>.txt      内存增长最多的代码行
+
+可以从托盘菜单随时开始/停止；配置 profile_capture_sessions 或环境变量
+TEXT_CAPTURE_PROFILE=1 时每次捕获会话自动分析。
+没有开始分析时不启动任何线程，也不开启 tracemalloc，没有额外开销
+"""
+
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from datetime import datetime
+
+import utils
+
+PROFILE_DIR_NAME = 'profiles'
+
+# 最内层为这些函数（文件名, 函数名）的线程视为空闲等待，不计入采样
+IDLE_FRAMES = frozenset({
+    ('threading.py', 'wait'),                  # Event / Condition 等待（包括 queue.Queue.get）
+    ('threading.py', '_wait_for_tstate_lock'),  # Thread.join
+    ('selectors.py', 'select'),                # asyncio 事件循环、HTTP 指标接口
+    ('windows_events.py', '_poll'),            # Windows 上的 asyncio 事件循环
+    ('thread.py', '_worker'),                  # 线程池等待任务
+    ('handlers.py', 'dequeue'),                # 日志监听线程等待日志
+    ('capture_sources.py', '_wait_for_change'),  # 等待剪贴板变化消息
+    ('tray_app.py', 'run'),                    # Qt 事件循环（exec_）
+})
+
+
+def get_profile_dir():
+    """性能分析结果目录（应用数据目录下的 profiles）"""
+    path = os.path.join(utils.get_app_data_dir(), PROFILE_DIR_NAME)
+    utils.ensure_dir_exists(path)
+    return path
+
+
+def is_idle_frame(frame):
+    """线程的最内层帧是否停在已知的空闲等待中"""
+    code = frame.f_code
+    return (os.path.basename(code.co_filename), code.co_name) in IDLE_FRAMES
+
+
+def _frame_label(frame):
+    """调用栈中一帧的显示名称：函数名 (文件名:定义行号)"""
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class StackSampler:
+    """采样分析器：后台线程按墙钟时间定期读取所有线程的调用栈并计数
+
+    停在空闲等待中的线程（见 IDLE_FRAMES）只计入空闲次数，不记录调用栈
+    """
+
+    def __init__(self, interval=0.005, max_depth=64, skip_idle=True):
+        """初始化分析器
+
+        Args:
+            interval: 采样间隔（秒）
+            max_depth: 每个调用栈最多记录的层数
+            skip_idle: 是否跳过停在空闲等待中的线程
+        """
+        self.interval = max(0.001, float(interval))
+        self.max_depth = max_depth
+        self.skip_idle = skip_idle
+        self.stacks = Counter()  # (线程名, 从外到内的帧名...) -> 采样次数
+        self.idle_counts = Counter()  # 线程名 -> 空闲等待的采样次数
+        self.sample_count = 0
+        self.thread = None
+        self.stop_event = threading.Event()
+
+    def start(self):
+        """开始采样"""
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self._run, name='profile-sampler', daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """停止采样"""
+        if self.thread is not None:
+            self.stop_event.set()
+            self.thread.join()
+            self.thread = None
+
+    def _run(self):
+        """采样循环"""
+        own_id = threading.get_ident()
+        while not self.stop_event.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                if self.skip_idle and is_idle_frame(frame):
+                    self.idle_counts[names.get(thread_id, f'thread-{thread_id}')] += 1
+                    continue
+                stack = []
+                while frame is not None and len(stack) < self.max_depth:
+                    stack.append(_frame_label(frame))
+                    frame = frame.f_back
+                stack.append(names.get(thread_id, f'thread-{thread_id}'))
+                stack.reverse()
+                self.stacks[tuple(stack)] += 1
+            self.sample_count += 1
+
+    def function_stats(self):
+        """按函数汇总：返回 [(函数, 自身采样数, 累计采样数)]，按自身采样数降序"""
+        own = Counter()
+        total = Counter()
+        for stack, count in self.stacks.items():
+            frames = stack[1:]  # 去掉线程名
+            if not frames:
+                continue
+            own[frames[-1]] += count
+            for label in set(frames):
+                total[label] += count
+        return sorted(((label, own[label], total[label]) for label in total),
+                      key=lambda item: (item[1], item[2]), reverse=True)
+
+    def write_report(self, path, duration, limit=60):
+        """写出按函数统计的采样结果"""
+        lines = [
+            f"采样间隔：{self.interval * 1000:g}ms，采样轮数：{self.sample_count}，时长：{duration:.1f}秒",
+            f"按墙钟时间采样（不是CPU时间），空闲等待中的采样{sum(self.idle_counts.values())}次未计入",
+            '',
+            f"{'自身':>8} {'累计':>8}  函数",
+        ]
+        for label, own, total in self.function_stats()[:limit]:
+            lines.append(f"{own:>8} {total:>8}  {label}")
+
+        lines.append('')
+        lines.append('按线程：')
+        threads = Counter()
+        for stack, count in self.stacks.items():
+            threads[stack[0]] += count
+        for name, count in threads.most_common():
+            lines.append(f"{count:>8}  {name}")
+
+        if self.idle_counts:
+            lines.append('')
+            lines.append('空闲等待（未计入）：')
+            for name, count in self.idle_counts.most_common():
+                lines.append(f"{count:>8}  {name}")
+
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write('\n'.join(lines) + '\n')
+
+    def write_folded(self, path):
+        """写出折叠调用栈（每行："线程;外层;...;内层 次数"）"""
+        with open(path, 'w', encoding='utf-8') as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{';'.join(label.replace(';', ':') for label in stack)} {count}\n")
+
+
+class SessionProfiler:
+    """一段时间内的调用栈采样（墙钟时间）和内存增长分析"""
+
+    def __init__(self, output_dir=None, sample_interval=0.005, memory_frames=10, memory_limit=40):
+        """初始化分析器
+
+        Args:
+            output_dir: 结果目录，默认为应用数据目录下的 profiles
+            sample_interval: 调用栈采样间隔（秒）
+            memory_frames: tracemalloc 为每次分配记录的调用栈层数
+            memory_limit: 内存报告中列出的代码行数
+        """
+        self.output_dir = output_dir
+        self.sample_interval = sample_interval
+        self.memory_frames = memory_frames
+        self.memory_limit = memory_limit
+        self.sampler = None
+        self.start_snapshot = None
+        self.started_tracemalloc = False
+        self.start_time = 0
+        self.label = None
+
+    @property
+    def is_running(self):
+        """是否正在分析"""
+        return self.sampler is not None
+
+    def start(self):
+        """开始分析"""
+        if self.is_running:
+            return
+        self.label = datetime.now().strftime('%Y%m%d_%H%M%S')
+        self.start_time = time.perf_counter()
+
+        # 已被其他地方开启时沿用，结束时也不关闭
+        self.started_tracemalloc = not tracemalloc.is_tracing()
+        if self.started_tracemalloc:
+            tracemalloc.start(self.memory_frames)
+        self.start_snapshot = tracemalloc.take_snapshot()
+
+        self.sampler = StackSampler(self.sample_interval)
+        self.sampler.start()
+        utils.logger.info(f"性能分析已开始（采样间隔{self.sample_interval * 1000:g}ms）")
+
+    def stop(self):
+        """结束分析并写出结果
+
+        Returns:
+            list: 写出的结果文件路径，没有在分析时返回空列表
+        """
+        if not self.is_running:
+            return []
+
+        self.sampler.stop()
+        duration = time.perf_counter() - self.start_time
+        end_snapshot = tracemalloc.take_snapshot()
+        traced_memory = tracemalloc.get_traced_memory()
+        if self.started_tracemalloc:
+            tracemalloc.stop()
+
+        output_dir = self.output_dir or get_profile_dir()
+        profile_path = os.path.join(output_dir, f'profile_{self.label}.txt')
+        folded_path = os.path.join(output_dir, f'profile_{self.label}.folded')
+        memory_path = os.path.join(output_dir, f'memory_{self.label}.txt')
+
+        written = []
+        try:
+            self.sampler.write_report(profile_path, duration)
+            self.sampler.write_folded(folded_path)
+            written += [profile_path, folded_path]
+            self.write_memory_report(memory_path, self.start_snapshot, end_snapshot, duration, traced_memory)
+            written.append(memory_path)
+        except OSError as e:
+            utils.logger.error(f"写入性能分析结果失败：{e}")
+        finally:
+            self.sampler = None
+            self.start_snapshot = None
+
+        utils.logger.info(f"性能分析已结束（{duration:.1f}秒），结果：{output_dir}")
+        return written
+
+    def write_memory_report(self, path, start_snapshot, end_snapshot, duration, traced_memory=None):
+        """写出内存增长最多的代码行
+
+        Args:
+            traced_memory: 结束时 tracemalloc 跟踪的 (当前, 峰值) 字节数
+        """
+        # 不统计 tracemalloc 自身和导入机制的分配
+        filters = [
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+            tracemalloc.Filter(False, '<frozen importlib._bootstrap_external>'),
+            tracemalloc.Filter(False, '<unknown>'),
+        ]
+        start_snapshot = start_snapshot.filter_traces(filters)
+        end_snapshot = end_snapshot.filter_traces(filters)
+        differences = end_snapshot.compare_to(start_snapshot, 'lineno')
+
+        total_growth = sum(stat.size_diff for stat in differences)
+        lines = [f"时长：{duration:.1f}秒，净增长：{total_growth / 1024:.1f}KB"]
+        if traced_memory:
+            current, peak = traced_memory
+            lines.append(f"当前跟踪：{current / 1024:.1f}KB，峰值：{peak / 1024:.1f}KB")
+        lines += ['', f"{'增长(KB)':>10} {'对象数增长':>10}  代码行"]
+        for stat in differences[:self.memory_limit]:
+            frame = stat.traceback[0]
+            lines.append(f"{stat.size_diff / 1024:>10.1f} {stat.count_diff:>10}  {frame.filename}:{frame.lineno}")
+
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write('\n'.join(lines) + '\n')
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""文本清理
+
+按策略清理捕获的文本，每次捕获只清理一次。
+合并空白使用CPython在C层实现的 str.split/str.splitlines，
+一次遍历完成换行、制表符、全角空格等所有Unicode空白的处理；
+需要逐字符替换的情况（零宽字符、不合并空白时的换行）使用预编译的翻译表
+"""
+
+import re
+import unicodedata
+
+# 直接删除的零宽字符
+ZERO_WIDTH_CHARS = '\u200b\u200c\u200d\u2060\ufeff'
+# 全角空格（中日韩文本中常见）
+FULLWIDTH_SPACE = '\u3000'
+# 不把全角空格视为空白时，清理期间用私有区字符临时替代
+FULLWIDTH_PLACEHOLDER = '\ue000'
+# str.splitlines 视为换行的字符
+LINE_BREAK_CHARS = '\n\r\x0b\x0c\x1c\x1d\x1e\x85\u2028\u2029'
+
+
+class SanitizePolicy:
+    """文本清理策略"""
+
+    OPTIONS = ('preserve_paragraphs', 'collapse_spaces', 'cjk_fullwidth_space',
+               'strip_zero_width', 'normalize_unicode')
+
+    def __init__(self, preserve_paragraphs=True, collapse_spaces=True,
+                 cjk_fullwidth_space=True, strip_zero_width=True, normalize_unicode=None):
+        """初始化策略
+
+        Args:
+            preserve_paragraphs: 保留段落（换行），空行合并；为False时换行也视为空格
+            collapse_spaces: 合并连续空白，去掉行首行尾空白
+            cjk_fullwidth_space: 把全角空格视为空白；为False时原样保留
+            strip_zero_width: 删除零宽字符
+            normalize_unicode: Unicode规范化形式（NFC/NFKC等），None表示不规范化
+        """
+        self.preserve_paragraphs = preserve_paragraphs
+        self.collapse_spaces = collapse_spaces
+        self.cjk_fullwidth_space = cjk_fullwidth_space
+        self.strip_zero_width = strip_zero_width
+        self.normalize_unicode = normalize_unicode
+
+    @classmethod
+    def from_dict(cls, options):
+        """从配置字典创建策略，忽略未知的键"""
+        return cls(**{key: value for key, value in (options or {}).items() if key in cls.OPTIONS})
+
+
+class TextSanitizer:
+    """按策略清理文本的清理器
+
+    创建时根据策略预编译翻译表并选定清理函数，清理时不再判断策略
+    """
+
+    def __init__(self, policy=None):
+        self.policy = policy or SanitizePolicy()
+
+        table = {}
+        if self.policy.strip_zero_width:
+            table.update({ord(char): None for char in ZERO_WIDTH_CHARS})
+        # 需要翻译表的字符；文本中不含这些字符时跳过翻译（逐字符翻译比C层的查找慢得多）
+        table_chars = ZERO_WIDTH_CHARS if self.policy.strip_zero_width else ''
+        if not self.policy.collapse_spaces and not self.policy.preserve_paragraphs:
+            table.update({ord(char): ' ' for char in LINE_BREAK_CHARS})
+            table_chars += LINE_BREAK_CHARS
+        self.table = str.maketrans(table) if table else None
+        # 一次扫描判断文本中是否有需要翻译的字符；这些字符都不是ASCII时，纯ASCII文本不必扫描
+        self.table_has_ascii = any(char.isascii() for char in table_chars)
+        self.table_pattern = re.compile(f'[{re.escape(table_chars)}]') if table_chars else None
+
+        if self.policy.collapse_spaces:
+            if self.policy.preserve_paragraphs:
+                self.clean = self._collapse_keep_paragraphs
+            else:
+                self.clean = self._collapse_all
+        elif self.policy.preserve_paragraphs:
+            self.clean = self._drop_empty_lines
+        else:
+            self.clean = str.strip
+
+    @staticmethod
+    def _collapse_keep_paragraphs(text):
+        """每行合并空白，去掉空行，行间保留一个换行"""
+        return '\n'.join(filter(None, map(' '.join, map(str.split, text.splitlines()))))
+
+    @staticmethod
+    def _collapse_all(text):
+        """所有空白（包括换行）合并为一个空格"""
+        return ' '.join(text.split())
+
+    @staticmethod
+    def _drop_empty_lines(text):
+        """只去掉空行，行内空白原样保留"""
+        return '\n'.join([line for line in text.splitlines() if line and not line.isspace()])
+
+    def sanitize(self, text):
+        """清理文本"""
+        if not isinstance(text, str):
+            return ""
+
+        if self.policy.normalize_unicode:
+            text = unicodedata.normalize(self.policy.normalize_unicode, text)
+
+        if self.table is not None and (self.table_has_ascii or not text.isascii()) and self.table_pattern.search(text):
+            text = text.translate(self.table)
+
+        protect_fullwidth = not self.policy.cjk_fullwidth_space and FULLWIDTH_SPACE in text
+        if protect_fullwidth:
+            text = text.replace(FULLWIDTH_SPACE, FULLWIDTH_PLACEHOLDER)
+
+        text = self.clean(text)
+
+        if protect_fullwidth:
+            text = text.replace(FULLWIDTH_PLACEHOLDER, FULLWIDTH_SPACE)
+        return text
+
+
+# 默认清理器
+default_sanitizer = TextSanitizer()
+
+
+def configure(options):
+    """根据配置中的清理策略重建默认清理器"""
+    global default_sanitizer
+    default_sanitizer = TextSanitizer(SanitizePolicy.from_dict(options))
+    return default_sanitizer
+
+
+def sanitize(text):
+    """使用默认清理器清理文本"""
+    return default_sanitizer.sanitize(text)
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""选区增长合并
+
+拖动选择文本时，轮询会捕获到选区的各个中间状态。
+如果新捕获是最近几条捕获的扩展（以它为前缀、后缀、包含它或只有少量编辑），
+就更新那一条捕获而不是新增段落（差异须以插入为主，替换了部分字符的新选区单独保存）；
+如果新捕获只是最近某条捕获的一部分（选区收缩或重新选中了其中一段），
+保留那条较长的捕获，新捕获不再保存
+"""
+
+import time
+from collections import deque
+
+
+class RecentEntry:
+    """一条最近捕获"""
+
+    __slots__ = ('entry_id', 'text', 'source_tag', 'time')
+
+    def __init__(self, entry_id, text, source_tag, time):
+        self.entry_id = entry_id
+        self.text = text
+        self.source_tag = source_tag
+        self.time = time
+
+
+def common_prefix_length(a, b):
+    """两个字符串公共前缀的长度
+
+    用二分查找比较切片，比较在C层完成，长文本下也只需十几次比较
+    """
+    low, high = 0, min(len(a), len(b))
+    while low < high:
+        middle = (low + high + 1) // 2
+        if a[:middle] == b[:middle]:
+            low = middle
+        else:
+            high = middle - 1
+    return low
+
+
+def common_suffix_length(a, b, limit):
+    """两个字符串公共后缀的长度（不超过 limit）"""
+    low, high = 0, min(len(a), len(b), limit)
+    while low < high:
+        middle = (low + high + 1) // 2
+        if a[len(a) - middle:] == b[len(b) - middle:]:
+            low = middle
+        else:
+            high = middle - 1
+    return low
+
+
+def is_selection_growth(old, new, max_edit_distance=8):
+    """判断新捕获是否是旧捕获的选区扩展（可以用新捕获替换旧捕获）
+
+    新文本不短于旧文本，并满足以下任一条件：
+    - 旧文本是新文本的前缀或后缀（从一端扩展选区）
+    - 新文本包含旧文本，且旧文本至少占新文本的一半（两端同时扩展）
+    - 新文本更长，去掉公共前后缀后新文本剩余差异不超过 max_edit_distance 个字符、
+      不超过新文本的四分之一，且旧文本剩余部分不到它的四分之一
+      （差异以插入为主，这是编辑距离的上界，计算量与文本长度近似无关）
+
+    选区收缩时新文本更短，不视为扩展，否则较短的文本会替换掉已保存的完整内容；
+    等长或以替换为主的差异（编号、日期不同的相邻条目）是另一段选区，不视为扩展
+    """
+    if not old or not new or len(new) < len(old):
+        return False
+
+    if new.startswith(old) or new.endswith(old):
+        return True
+
+    if len(old) * 2 >= len(new) and old in new:
+        return True
+
+    limit = min(max_edit_distance, len(new) // 4)
+    if len(new) == len(old) or len(new) - len(old) > limit:
+        return False
+
+    prefix = common_prefix_length(old, new)
+    suffix = common_suffix_length(old, new, len(old) - prefix)
+    new_middle = len(new) - prefix - suffix
+    old_middle = len(old) - prefix - suffix
+    return new_middle <= limit and old_middle * 4 < new_middle
+
+
+class SelectionMerger:
+    """记录最近几条捕获，查找新捕获应当合并到的那一条"""
+
+    def __init__(self, history_size=3, merge_window=5.0, max_edit_distance=8, clock=time.monotonic):
+        """初始化合并器
+
+        Args:
+            history_size: 参与比较的最近捕获条数
+            merge_window: 只合并到多少秒内的捕获
+            max_edit_distance: 视为同一选区的最大差异字符数
+            clock: 时钟函数，便于测试时注入
+        """
+        self.recent = deque(maxlen=max(1, int(history_size)))
+        self.merge_window = float(merge_window)
+        self.max_edit_distance = int(max_edit_distance)
+        self.clock = clock
+        self.merged_count = 0  # 合并的捕获数
+
+    def find_target(self, text):
+        """查找新捕获应当合并到的最近捕获
+
+        Returns:
+            RecentEntry: 要更新的捕获，没有则返回None
+        """
+        now = self.clock()
+        for entry in reversed(self.recent):
+            if now - entry.time > self.merge_window:
+                break
+            if is_selection_growth(entry.text, text, self.max_edit_distance):
+                return entry
+        return None
+
+    def find_covering(self, text):
+        """查找已经包含新捕获的最近捕获（选区收缩或重新选中了其中一段）
+
+        Returns:
+            RecentEntry: 包含新捕获的较长捕获，没有则返回None
+        """
+        now = self.clock()
+        for entry in reversed(self.recent):
+            if now - entry.time > self.merge_window:
+                break
+            if entry.text and text in entry.text:
+                return entry
+        return None
+
+    def record(self, entry_id, text, source_tag):
+        """记录一条新捕获
+
+        Returns:
+            RecentEntry: 新的记录
+        """
+        entry = RecentEntry(entry_id, text, source_tag, self.clock())
+        self.recent.append(entry)
+        return entry
+
+    def update(self, entry, text):
+        """记录一次合并：更新捕获内容并移到最近位置"""
+        self.recent.remove(entry)
+        entry.text = text
+        entry.time = self.clock()
+        self.recent.append(entry)
+        self.merged_count += 1
+
+    def clear(self):
+        """清空最近捕获"""
+        self.recent.clear()
+        self.merged_count = 0
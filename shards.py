@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+"""会话文档分片
+
+一个会话的文档过大时，Word打开和重写都会变慢。
+RollingSink 包装任意输出（见 output_sinks），当前分片达到大小、段落数或时长上限时，
+关闭它并开始下一个分片。
+
+命名规则（以 text_capture_20240101_120000.docx 为例）：
+    第1片：text_capture_20240101_120000.docx
+    第2片：text_capture_20240101_120000.part002.docx
+    ...
+    索引：  text_capture_20240101_120000.shards.json（按顺序列出所有分片，第一次分片时创建）
+"""
+
+import json
+import os
+import time
+from datetime import datetime
+
+import utils
+from docx_writer import copy_document
+
+INDEX_SUFFIX = '.shards.json'
+
+
+def shard_path(base_path, number):
+    """第 number 个分片的路径（从1开始，第1片就是会话文档本身）"""
+    if number <= 1:
+        return base_path
+    root, extension = os.path.splitext(base_path)
+    return f"{root}.part{number:03d}{extension}"
+
+
+def get_index_path(base_path):
+    """分片索引文件路径"""
+    return os.path.splitext(base_path)[0] + INDEX_SUFFIX
+
+
+def read_index(base_path):
+    """读取分片索引，没有索引时返回None"""
+    index_path = get_index_path(base_path)
+    if not os.path.exists(index_path):
+        return None
+    try:
+        with open(index_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        utils.logger.error(f"读取分片索引失败 {index_path}: {e}")
+        return None
+
+
+def write_index(base_path, shards):
+    """写入分片索引（先写临时文件再替换）
+
+    Args:
+        base_path: 会话文档路径（第1片）
+        shards: 分片信息列表，每项为 {'path': 文件名, 'created': 创建时间, 'count': 段落数}
+    """
+    index_path = get_index_path(base_path)
+    temp_path = index_path + '.tmp'
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump({'base': os.path.basename(base_path), 'shards': shards}, f, ensure_ascii=False, indent=2)
+    os.replace(temp_path, index_path)
+
+
+def list_shards(base_path):
+    """会话的所有分片路径（按顺序）；没有索引时只有会话文档本身"""
+    index = read_index(base_path)
+    if not index or not index.get('shards'):
+        return [base_path]
+    directory = os.path.dirname(base_path)
+    return [os.path.join(directory, shard['path']) for shard in index['shards']]
+
+
+def latest_shard(base_path):
+    """会话中最新的分片路径"""
+    return list_shards(base_path)[-1]
+
+
+def copy_shards(base_path, target_path):
+    """把多分片会话另存到 target_path：按同样的命名规则复制每个分片并写入新的索引
+
+    Returns:
+        list: 复制出的分片路径
+    """
+    index = read_index(base_path) or {}
+    shards = index.get('shards') or [{'path': os.path.basename(base_path)}]
+    directory = os.path.dirname(base_path)
+
+    copied = []
+    new_shards = []
+    for number, shard in enumerate(shards, 1):
+        target = shard_path(target_path, number)
+        copy_document(os.path.join(directory, shard['path']), target)
+        copied.append(target)
+        new_shards.append(dict(shard, path=os.path.basename(target)))
+
+    if len(copied) > 1:
+        write_index(target_path, new_shards)
+    return copied
+
+
+class RollingSink:
+    """按大小、段落数或时长自动分片的输出
+
+    对外的 path 始终是会话文档（第1片）的路径，current_path 是正在写入的分片。
+    选区增长合并只能更新当前分片中的段落；目标在之前的分片（或已不在底层输出的最近记录中）时，
+    底层输出会追加新段落，这样的更新和新增捕获一样计入分片段落数并检查是否需要切换分片
+    """
+
+    def __init__(self, base_path, sink_factory, max_bytes=0, max_entries=0, max_age=0, clock=time.monotonic):
+        """初始化输出
+
+        Args:
+            base_path: 会话文档路径（第1片）
+            sink_factory: 根据分片路径创建底层输出的函数
+            max_bytes: 分片文件大小上限（字节），<=0 表示不限
+            max_entries: 分片段落数上限，<=0 表示不限
+            max_age: 分片写入时长上限（秒），<=0 表示不限
+            clock: 时钟函数，便于测试时注入
+        """
+        self.base_path = base_path
+        self.sink_factory = sink_factory
+        self.max_bytes = int(max_bytes or 0)
+        self.max_entries = int(max_entries or 0)
+        self.max_age = float(max_age or 0)
+        self.clock = clock
+        self.sink = None
+        self.shard_number = 0
+        self.shard_entries = 0  # 当前分片的段落数
+        self.shard_start_time = 0
+        self.shards = []  # 分片索引内容
+
+    @property
+    def path(self):
+        """会话文档路径（第1片）"""
+        return self.base_path
+
+    @property
+    def current_path(self):
+        """正在写入的分片路径"""
+        return shard_path(self.base_path, self.shard_number or 1)
+
+    @property
+    def is_open(self):
+        """输出是否已打开"""
+        return self.sink is not None
+
+    def open(self):
+        """打开会话中最新的分片（已有索引时接着写）"""
+        if self.sink is not None:
+            return self.sink
+
+        index = read_index(self.base_path)
+        self.shards = list(index['shards']) if index and index.get('shards') else []
+        self.shard_number = max(1, len(self.shards))
+        self.shard_entries = self.shards[-1].get('count', 0) if self.shards else 0
+        return self._open_shard()
+
+    def _open_shard(self):
+        """打开当前编号的分片并更新索引"""
+        path = self.current_path
+        self.sink = self.sink_factory(path)
+        self.sink.open()
+        self.shard_start_time = self.clock()
+
+        if len(self.shards) < self.shard_number:
+            self.shards.append({'path': os.path.basename(path),
+                                'created': datetime.now().isoformat(timespec='seconds'),
+                                'count': 0})
+            self._write_index()
+        return self.sink
+
+    def _write_index(self):
+        """更新索引（记录当前分片的段落数）；只有一个分片时不需要索引"""
+        if self.shards:
+            self.shards[-1]['count'] = self.shard_entries
+        if len(self.shards) < 2:
+            return
+        try:
+            write_index(self.base_path, self.shards)
+        except OSError as e:
+            utils.logger.error(f"写入分片索引失败：{e}")
+
+    def should_roll(self, check_size=False):
+        """当前分片是否达到上限"""
+        if self.max_entries > 0 and self.shard_entries >= self.max_entries:
+            return True
+        if self.max_age > 0 and self.clock() - self.shard_start_time >= self.max_age:
+            return True
+        if check_size and self.max_bytes > 0 and utils.get_file_size(self.current_path) >= self.max_bytes:
+            return True
+        return False
+
+    def roll(self):
+        """关闭当前分片，开始下一个分片"""
+        self.sink.close()
+        self._write_index()
+        utils.logger.info(f"分片已写满：{self.current_path}（{self.shard_entries}条）")
+        self.shard_number += 1
+        self.shard_entries = 0
+        self._open_shard()
+        utils.logger.info(f"开始新分片：{self.current_path}")
+
+    def write_many(self, entries):
+        """批量写入捕获，达到上限时在批次中间切换分片
+
+        文件大小只在每批开始时检查一次（DOCX落盘前大小不会变化）
+
+        Returns:
+            bool: 本批写入是否触发了刷新
+        """
+        self.open()
+        if self.should_roll(check_size=True):
+            self.roll()
+
+        flushed = False
+        chunk = []
+        chunk_ids = set()  # 本片中尚未交给底层输出的捕获编号
+        for entry in entries:
+            if not self._can_replace(entry, chunk_ids):
+                if self.shard_entries and self.should_roll():
+                    flushed = self.sink.write_many(chunk) or flushed
+                    chunk = []
+                    chunk_ids.clear()
+                    self.roll()
+                self.shard_entries += 1
+            chunk.append(entry)
+            if entry.entry_id is not None:
+                chunk_ids.add(entry.entry_id)
+
+        if chunk:
+            flushed = self.sink.write_many(chunk) or flushed
+        return flushed
+
+    def can_replace(self, entry_id):
+        """编号为 entry_id 的捕获能否在当前分片中原地更新"""
+        return self.sink is not None and self.sink.can_replace(entry_id)
+
+    def _can_replace(self, entry, chunk_ids):
+        """捕获是否是对当前分片中段落的原地更新（否则底层输出会追加新段落）"""
+        if not entry.replace or entry.entry_id is None:
+            return False
+        return entry.entry_id in chunk_ids or self.sink.can_replace(entry.entry_id)
+
+    def flush_if_due(self):
+        """如果满足刷新条件则刷新"""
+        if self.sink is None:
+            return False
+        return self.sink.flush_if_due()
+
+    def flush(self):
+        """刷新当前分片"""
+        if self.sink is not None:
+            self.sink.flush()
+
+    def close(self):
+        """关闭当前分片并更新索引"""
+        if self.sink is None:
+            return
+        try:
+            self.sink.close()
+        finally:
+            self._write_index()
+            self.sink = None
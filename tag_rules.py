@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""文本来源标签规则
+
+把进程名精确标签（text_source_tags）和规则列表（text_source_tag_rules）
+编译成一个匹配器：
+- 精确进程名：不区分大小写的字典查找
+- 进程名通配符/正则：合并成一个正则，一次匹配按规则顺序取第一条命中的规则
+- 窗口标题规则：同样合并成一个正则，优先于进程名规则
+
+匹配器在配置加载或修改时编译一次，进程名的匹配结果按进程缓存，
+每次捕获的打标签开销与规则数量无关
+"""
+
+import fnmatch
+import re
+
+# 规则类型
+MATCH_EXACT = 'exact'
+MATCH_GLOB = 'glob'
+MATCH_REGEX = 'regex'
+
+# 规则匹配的字段
+FIELD_PROCESS = 'process'
+FIELD_TITLE = 'title'
+
+UNKNOWN_SOURCE_TAG = '[未知来源]'
+
+
+def _rule_to_regex(match_type, pattern):
+    """把一条规则转换为从字符串开头匹配的正则片段
+
+    统一从开头匹配，合并后的正则在位置0按规则顺序依次尝试，
+    因此第一条能匹配的规则胜出；正则规则保持"包含匹配"的语义
+    """
+    if match_type == MATCH_EXACT:
+        return re.escape(pattern) + r'\Z'
+    if match_type == MATCH_GLOB:
+        return fnmatch.translate(pattern)
+    if match_type == MATCH_REGEX:
+        re.compile(pattern)  # 单独校验，便于报出是哪条规则写错了
+        return '.*?(?:' + pattern + ')'
+    raise ValueError(f"未知的规则类型：{match_type}")
+
+
+# 用户正则中会影响合并的写法：转义、条件分组、全局内联标志、命名分组
+_REGEX_TOKEN = re.compile(
+    r'\\(?P<escape>.)'
+    r'|\(\?(?P<condition>\()'
+    r'|\(\?(?P<flags>[aiLmsux]+)\)'
+    r'|\(\?P<(?P<name>\w+)>',
+    re.DOTALL)
+
+
+def _regex_group_names(pattern):
+    """返回正则规则定义的命名分组；无法安全合并时返回None
+
+    合并时每条规则外面会再包一层分组，编号反向引用（\\1）和条件分组（(?(1)...)）
+    会指向别的规则的分组；全局内联标志（(?i)）不在开头时无法编译或会作用于所有规则
+    """
+    names = set()
+    for token in _REGEX_TOKEN.finditer(pattern):
+        if token.group('escape') is not None:
+            if token.group('escape') in '123456789':
+                return None
+        elif token.group('condition') is not None or token.group('flags') is not None:
+            return None
+        elif token.group('name') is not None:
+            names.add(token.group('name'))
+    return names
+
+
+class _CompiledRules:
+    """合并后的一组规则
+
+    能安全合并的规则编译成一个正则；含编号反向引用、全局内联标志或
+    命名分组重名的正则规则单独编译，匹配时按规则顺序与合并结果比较
+    """
+
+    def __init__(self, rules):
+        self.tags = [tag for _, _, tag in rules]
+        self.pattern = None
+        self.fallback = []
+        if not rules:
+            return
+
+        flags = re.IGNORECASE | re.DOTALL
+        parts = []
+        used_names = set()
+        for index, (match_type, pattern, _) in enumerate(rules):
+            part = _rule_to_regex(match_type, pattern)
+            if match_type == MATCH_REGEX:
+                names = _regex_group_names(pattern)
+                if (names is None or names & used_names
+                        or any(re.fullmatch(r'r\d+', name) for name in names)):
+                    # 单独编译原始正则，search 与合并时的 ".*?(?:...)" 语义相同
+                    self.fallback.append((index, re.compile(pattern, flags).search))
+                    continue
+                used_names |= names
+            parts.append(f'(?P<r{index}>{part})')
+
+        if not parts:
+            return
+        try:
+            self.pattern = re.compile('|'.join(parts), flags)
+        except re.error:
+            # 兜底：仍无法合并时全部逐条匹配
+            self.pattern = None
+            self.fallback = [
+                (index, re.compile(pattern, flags).search if match_type == MATCH_REGEX
+                 else re.compile(_rule_to_regex(match_type, pattern), flags).match)
+                for index, (match_type, pattern, _) in enumerate(rules)]
+
+    def match(self, value):
+        """返回第一条匹配规则的标签，没有匹配时返回None"""
+        best = len(self.tags)
+        if self.pattern is not None:
+            found = self.pattern.match(value)
+            if found:
+                # 外层规则分组最后闭合，lastgroup 即命中的规则
+                best = int(found.lastgroup[1:])
+
+        # 单独编译的规则只需检查排在合并结果之前的
+        for index, matcher in self.fallback:
+            if index >= best:
+                break
+            if matcher(value):
+                return self.tags[index]
+        return self.tags[best] if best < len(self.tags) else None
+
+
+class TagMatcher:
+    """文本来源标签匹配器"""
+
+    def __init__(self, exact_tags=None, rules=None, memo_size=1024):
+        """编译匹配器
+
+        Args:
+            exact_tags: 进程名 -> 标签（不区分大小写）
+            rules: 规则列表，每条为 {'match': exact/glob/regex, 'pattern': ..., 'tag': ...,
+                   'field': process/title}，field 默认为 process
+            memo_size: 进程名匹配结果缓存的最大条数
+        """
+        self.exact = {name.lower(): tag for name, tag in (exact_tags or {}).items()}
+
+        process_rules = []
+        title_rules = []
+        for rule in rules or []:
+            entry = (rule.get('match', MATCH_GLOB), rule['pattern'], rule['tag'])
+            if rule.get('field', FIELD_PROCESS) == FIELD_TITLE:
+                title_rules.append(entry)
+            else:
+                process_rules.append(entry)
+
+        self.process_rules = _CompiledRules(process_rules)
+        self.title_rules = _CompiledRules(title_rules)
+        self.memo = {}
+        self.memo_size = memo_size
+
+    @property
+    def has_title_rules(self):
+        """是否有窗口标题规则（没有时无需获取窗口标题）"""
+        return bool(self.title_rules.tags)
+
+    def match(self, process_name, window_title=None):
+        """获取文本来源标签
+
+        优先级：窗口标题规则 > 精确进程名 > 进程名通配符/正则 > [进程名]
+        """
+        if window_title and self.has_title_rules:
+            tag = self.title_rules.match(window_title)
+            if tag is not None:
+                return tag
+
+        if not process_name:
+            return UNKNOWN_SOURCE_TAG
+
+        tag = self.memo.get(process_name)
+        if tag is None:
+            key = process_name.lower()
+            tag = self.exact.get(key)
+            if tag is None:
+                tag = self.process_rules.match(process_name)
+            if tag is None:
+                tag = f'[{process_name}]'
+
+            if len(self.memo) >= self.memo_size:
+                self.memo.clear()
+            self.memo[process_name] = tag
+        return tag
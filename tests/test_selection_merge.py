@@ -0,0 +1,34 @@
+#!/usr/bin/env python3
+"""选区增长合并测试"""
+
+import unittest
+
+from selection_merge import SelectionMerger, is_selection_growth
+
+
+class SelectionGrowthTest(unittest.TestCase):
+
+    def test_extension_is_growth(self):
+        self.assertTrue(is_selection_growth('hello', 'hello world'))
+        self.assertTrue(is_selection_growth('world', 'hello world'))
+        self.assertTrue(is_selection_growth('the quick fox jumps over the lazy dog', 'the quick brown fox jumps over the lazy dog'))
+
+    def test_equal_length_substitution_is_not_growth(self):
+        self.assertFalse(is_selection_growth('unrelated thing 1', 'unrelated thing 2'))
+        self.assertFalse(is_selection_growth('2024-01-05 meeting', '2024-01-06 meeting'))
+
+    def test_mostly_substituted_longer_text_is_not_growth(self):
+        self.assertFalse(is_selection_growth('order id 1234 shipped', 'order id 56789 shipped'))
+
+    def test_shrinking_selection_is_not_growth(self):
+        self.assertFalse(is_selection_growth('hello world', 'hello'))
+
+    def test_substituted_selections_kept_as_separate_entries(self):
+        merger = SelectionMerger(clock=lambda: 0.0)
+        merger.record(1, 'unrelated thing 1', '[app]')
+        self.assertIsNone(merger.find_target('unrelated thing 2'))
+        self.assertIsNone(merger.find_covering('unrelated thing 2'))
+
+
+if __name__ == '__main__':
+    unittest.main()
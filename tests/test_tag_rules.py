@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+"""文本来源标签规则测试"""
+
+import unittest
+
+from tag_rules import TagMatcher
+
+
+class TagMatcherTest(unittest.TestCase):
+
+    def test_backreference_rule_after_other_rules(self):
+        matcher = TagMatcher(rules=[
+            {'match': 'glob', 'pattern': 'wps*.exe', 'tag': '[WPS]'},
+            {'match': 'regex', 'pattern': r'^(a)\1$', 'tag': '[DOUBLE]'},
+        ])
+        self.assertEqual(matcher.match('aa'), '[DOUBLE]')
+        self.assertEqual(matcher.match('wps.exe'), '[WPS]')
+        self.assertEqual(matcher.match('ab'), '[ab]')
+
+    def test_rule_order_kept_with_separate_rules(self):
+        matcher = TagMatcher(rules=[
+            {'match': 'regex', 'pattern': r'(x)\1', 'tag': '[XX]'},
+            {'match': 'glob', 'pattern': '*xx*', 'tag': '[GLOB]'},
+            {'match': 'regex', 'pattern': r'(?i)yy', 'tag': '[YY]'},
+        ])
+        self.assertEqual(matcher.match('axxb'), '[XX]')
+        self.assertEqual(matcher.match('YY.exe'), '[YY]')
+
+    def test_duplicate_group_names_across_rules(self):
+        matcher = TagMatcher(rules=[
+            {'match': 'regex', 'pattern': r'(?P<name>foo)', 'tag': '[FOO]'},
+            {'match': 'regex', 'pattern': r'(?P<name>bar)(?P=name)', 'tag': '[BAR]'},
+            {'match': 'exact', 'pattern': 'Code.exe', 'tag': '[CODE]'},
+        ])
+        self.assertEqual(matcher.match('barbar'), '[BAR]')
+        self.assertEqual(matcher.match('code.EXE'), '[CODE]')
+        self.assertEqual(matcher.match('xfoo'), '[FOO]')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,1016 @@
+#!/usr/bin/env python3
+"""全局文本捕获+自动写入DOCX软件 - 托盘程序
+
+监听鼠标选中的文本，自动抓取并保存到docx文档中
+支持区域OCR识别（右键截图）
+抓取/识别的文本按来源打标签
+
+捕获引擎（捕获循环、过滤去重打标签、批量写入）在 capture_core 中，
+这里只负责托盘界面，并在 QThread 中运行捕获引擎
+"""
+
+import sys
+import os
+from datetime import datetime
+
+from PyQt5.QtWidgets import QApplication, QSystemTrayIcon, QMenu, QAction, QFileDialog, QMessageBox, QWidget, QLabel, QLineEdit, QPushButton, QVBoxLayout, QHBoxLayout, QSpinBox, QStyle, QShortcut
+from PyQt5.QtGui import QIcon, QCursor, QPainter, QPen, QBrush, QColor
+from PyQt5.QtCore import Qt, QTimer, QPoint, QRect, QThread, pyqtSignal
+
+# 导入自定义模块
+import config
+import utils
+import capture_core
+import output_sinks
+import shards
+import metrics
+import profiling
+
+
+
+class TextCaptureApp(QApplication):
+    """主应用程序类"""
+    
+    def __init__(self, argv):
+        super().__init__(argv)
+        
+        # 设置应用程序属性，确保托盘图标存在时不退出
+        self.setQuitOnLastWindowClosed(False)
+        
+        # 按配置设置日志和文本清理器
+        capture_core.configure_runtime()
+        
+        # 初始化应用程序设置
+        self.settings = {
+            'capture_enabled': False,
+            'docx_path': config.config.get_docx_path(),
+        }
+        
+        # 过滤、去重、选区合并和打标签（捕获会话状态）
+        self.processor = capture_core.CaptureProcessor()
+        
+        # 初始化超时保护相关变量
+        self.capture_start_time = 0
+        self.max_capture_time = 300  # 最大捕获时间，默认300秒（5分钟）
+        self.max_capture_count = 10000   # 最大捕获次数，默认10000次
+        
+        # 初始化截图相关变量
+        self.is_screenshotting = False
+        self.screenshot_start = QPoint()
+        self.screenshot_end = QPoint()
+        self.screenshot_widget = None
+        
+        # 写入线程（在后台把捕获写入文档，避免阻塞界面）
+        self.writer_thread = None
+        self.pipeline_depth = 0  # 流水线中待处理的文本数
+        
+        # 初始化文档
+        self.init_document()
+        
+        # 创建系统托盘图标
+        self.create_tray_icon()
+        
+        # 创建捕获线程
+        self.capture_thread = None
+        
+        # 创建捕获定时器（用于单次检查）
+        self.capture_timer = QTimer()
+        self.capture_timer.timeout.connect(self.check_selection)
+        self.capture_timer.setInterval(int(config.config.get_capture_interval() * 1000))
+        
+        # 退出前确保文档已写入磁盘
+        self.aboutToQuit.connect(self.stop_writer_thread)
+        
+        # 性能分析（开始后才创建分析器），退出前写出结果
+        self.profiler = None
+        self.profiling_session = False  # 性能分析是否由捕获会话自动开始
+        self.aboutToQuit.connect(self.stop_profiling)
+        
+        # 本地指标接口（默认关闭）
+        self.metrics_server = None
+        if config.config.is_metrics_endpoint_enabled():
+            self.start_metrics_server()
+        self.aboutToQuit.connect(self.stop_metrics_server)
+        
+        # 创建OCR热键
+        self.register_hotkeys()
+        
+        utils.logger.info("应用程序初始化完成")
+        
+    def init_document(self):
+        """初始化文档
+        
+        启动时不解析已有文档（会话中的写入由写入线程负责打开），
+        只有文档不存在时才创建（docx格式时才加载python-docx）
+        """
+        try:
+            # 使用程序所在目录作为默认文档路径，扩展名与输出格式一致
+            output_format = capture_core.get_output_format(config.config.get_docx_path())
+            self.settings['docx_path'] = output_sinks.with_format_extension(
+                os.path.join(capture_core.APP_DIR, 'text_capture.docx'), output_format)
+            
+            # 恢复上次异常退出时尚未写入文档的捕获
+            capture_core.recover_journals()
+            
+            if not os.path.exists(self.settings['docx_path']):
+                sink = output_sinks.create_sink(self.settings['docx_path'], output_format)
+                sink.open()
+                sink.close()
+            utils.logger.info(f"文档已初始化：{self.settings['docx_path']}")
+        except Exception as e:
+            utils.logger.error(f"初始化文档失败：{e}")
+            QMessageBox.critical(None, '错误', f'无法创建或打开文档：\n{self.settings["docx_path"]}\n\n错误：{e}')
+            sys.exit(1)
+            
+    def create_tray_icon(self):
+        """创建系统托盘图标"""
+        # 创建托盘图标（使用Qt内置的信息图标）
+        self.tray_icon = QSystemTrayIcon()
+        self.tray_icon.setIcon(self.style().standardIcon(QStyle.SP_MessageBoxInformation))
+        self.tray_icon.setToolTip('文本捕获工具')
+        
+        # 显示托盘图标
+        self.tray_icon.show()
+        
+        # 创建菜单
+        tray_menu = QMenu()
+        
+        # 开始/停止捕获动作（动态切换）
+        self.start_stop_action = QAction('开始捕获', self)
+        self.start_stop_action.triggered.connect(self.toggle_capture)
+        tray_menu.addAction(self.start_stop_action)
+        
+        tray_menu.addSeparator()
+        
+        # 移除OCR截图动作，只保留快捷键启动方式
+        # ocr_action = QAction('区域OCR识别', self)
+        # ocr_action.triggered.connect(self.start_screenshot)
+        # tray_menu.addAction(ocr_action)
+        
+        # 设置动作
+        settings_action = QAction('设置', self)
+        settings_action.triggered.connect(self.show_settings)
+        tray_menu.addAction(settings_action)
+        
+        # 查看文档动作
+        view_doc_action = QAction('查看文档', self)
+        view_doc_action.triggered.connect(self.open_document)
+        tray_menu.addAction(view_doc_action)
+        
+        # 开始/停止性能分析动作（动态切换）
+        self.profile_action = QAction('开始性能分析', self)
+        self.profile_action.triggered.connect(self.toggle_profiling)
+        tray_menu.addAction(self.profile_action)
+        
+        # 关于动作
+        about_action = QAction('关于', self)
+        about_action.triggered.connect(self.show_about)
+        tray_menu.addAction(about_action)
+        
+        # 退出动作
+        exit_action = QAction('退出', self)
+        exit_action.triggered.connect(self.quit)
+        tray_menu.addAction(exit_action)
+        
+        # 设置托盘菜单
+        self.tray_icon.setContextMenu(tray_menu)
+        
+        # 显示托盘图标
+        self.tray_icon.show()
+        
+    def create_icon(self):
+        """创建简单的图标"""
+        from io import BytesIO
+        from PIL import Image, ImageDraw, ImageFont
+        from PyQt5.QtGui import QPixmap, QByteArray
+        from PyQt5.QtCore import QBuffer
+        
+        # 创建16x16像素的图标
+        img = Image.new('RGB', (16, 16), color='blue')
+        d = ImageDraw.Draw(img)
+        
+        try:
+            # 使用系统默认字体
+            font = ImageFont.truetype("arial.ttf", 8)
+        except:
+            font = ImageFont.load_default()
+            
+        d.text((1, 1), "T", fill='white', font=font)
+        
+        # 保存到内存
+        buffer = BytesIO()
+        img.save(buffer, format='PNG')
+        
+        # 转换为QPixmap
+        pixmap = QPixmap()
+        pixmap.loadFromData(buffer.getvalue())
+        
+        return pixmap
+        
+    def toggle_capture(self):
+        """切换捕获状态"""
+        if self.settings['capture_enabled']:
+            # 停止捕获
+            self.settings['capture_enabled'] = False
+            self.start_stop_action.setText('开始捕获')
+            self.tray_icon.setIcon(self.style().standardIcon(QStyle.SP_MessageBoxInformation))
+            
+            # 停止捕获线程
+            if self.capture_thread and self.capture_thread.isRunning():
+                self.capture_thread.stop()
+                self.capture_thread.wait()
+                self.capture_thread = None
+            
+            # 停止定时器
+            self.capture_timer.stop()
+            
+            self.processor.log_stats()
+            
+            # 等待写入线程把会话中尚未写入的内容落盘
+            self.stop_writer_thread()
+            
+            # 随会话开始的性能分析在会话结束时写出结果
+            if self.profiling_session:
+                self.stop_profiling()
+            
+            # 弹出保存文档对话框让用户选择路径
+            self.show_save_document_dialog()
+            
+            utils.logger.info("文本捕获已停止")
+        else:
+            # 开始捕获
+            self.settings['capture_enabled'] = True
+            self.start_stop_action.setText('停止捕获')
+            self.tray_icon.setIcon(self.style().standardIcon(QStyle.SP_MessageBoxCritical))
+            
+            # 重置捕获计数和去重状态，开始新的会话
+            self.processor.reset()
+            
+            # 每次开始捕获时创建新的文档
+            try:
+                # 生成带时间戳的新文档文件名
+                new_docx_path = capture_core.new_session_path()
+                
+                # 创建新文档，会话期间由写入线程保持打开
+                self.stop_writer_thread()
+                sink = capture_core.create_output_sink(new_docx_path)
+                sink.open()
+                sink.flush()
+                self.settings['docx_path'] = new_docx_path
+                self.start_writer_thread(sink)
+                
+                utils.logger.info(f"创建新文档：{new_docx_path}")
+                
+            except Exception as e:
+                utils.logger.error(f"创建新文档失败：{e}")
+                self.tray_icon.showMessage('文本捕获工具', f'无法创建新文档：{e}', QSystemTrayIcon.Critical, 3000)
+                return
+            
+            # 创建并启动捕获线程
+            source = capture_core.create_capture_source()
+            scheduler = capture_core.create_scheduler()
+            # 按配置对本次会话进行性能分析
+            if config.config.is_session_profiling_enabled() and not (self.profiler and self.profiler.is_running):
+                self.start_profiling()
+                self.profiling_session = True
+            
+            if config.config.get_capture_engine() == capture_core.ENGINE_ASYNCIO:
+                # 分阶段流水线：过滤、去重、打标签和提交都在流水线线程中完成
+                pipeline = capture_core.create_pipeline(
+                    source, scheduler, self.processor, self.writer_thread.submit,
+                    self.max_capture_time, self.max_capture_count,
+                    writer_alive=self.writer_thread.isRunning,
+                )
+                self.capture_thread = self.PipelineThread(pipeline)
+                self.capture_thread.entry_captured.connect(self.handle_entry_captured)
+                self.capture_thread.queue_depths_changed.connect(self.handle_pipeline_queue_depths)
+            else:
+                self.capture_thread = self.CaptureThread(self.max_capture_time, self.max_capture_count, source, scheduler)
+                self.capture_thread.text_captured.connect(self.handle_text_captured)
+            self.capture_thread.start()
+            
+            self.tray_icon.showMessage('文本捕获工具', f'已开始文本捕获，将持续{self.max_capture_time//60}分钟或捕获{self.max_capture_count}次后自动停止', QSystemTrayIcon.Information, 3000)
+            utils.logger.info(f"文本捕获已开始（持续模式），超时保护：{self.max_capture_time}秒/{self.max_capture_count}次")
+    
+    def show_save_document_dialog(self):
+        """显示保存文档对话框让用户选择保存路径"""
+        try:
+            # 如果没有捕获到任何文本，直接返回
+            if self.processor.capture_count == 0:
+                self.tray_icon.showMessage('文本捕获工具', '没有捕获到任何文本需要保存', QSystemTrayIcon.Information, 3000)
+                return
+            
+            # 弹出保存文件对话框（扩展名与当前输出格式一致）
+            output_format = capture_core.get_output_format()
+            file_path, _ = QFileDialog.getSaveFileName(
+                None, 
+                '保存文本捕获记录', 
+                os.path.join(os.path.expanduser('~'), 'Documents', f'text_capture_{datetime.now().strftime("%Y%m%d_%H%M%S")}{output_sinks.FORMAT_EXTENSIONS[output_format]}'), 
+                output_sinks.get_file_filter(output_format)
+            )
+            
+            if file_path:
+                # 如果用户选择了新的保存路径，更新设置并保存文档
+                if self.settings['docx_path'] != file_path:
+                    # 写入线程已在停止捕获时关闭并落盘，直接复制整个文件，不重新解析文档；
+                    # 多分片会话按同样的命名规则复制每个分片
+                    if os.path.exists(self.settings['docx_path']):
+                        copied = shards.copy_shards(self.settings['docx_path'], file_path)
+                        if len(copied) > 1:
+                            utils.logger.info(f"会话共{len(copied)}个分片，已全部另存")
+                    else:
+                        sink = output_sinks.create_sink(file_path, output_format)
+                        sink.open()
+                        sink.close()
+                    self.settings['docx_path'] = file_path
+                    
+                    self.tray_icon.showMessage('文本捕获工具', f'文档已保存到：{os.path.basename(file_path)}', QSystemTrayIcon.Information, 3000)
+                    utils.logger.info(f"文档已保存到：{file_path}")
+                    
+                    # 重置捕获计数
+                    self.processor.capture_count = 0
+                else:
+                    # 路径未改变，直接提示文档已存在
+                    self.tray_icon.showMessage('文本捕获工具', f'文档已存在：{os.path.basename(file_path)}', QSystemTrayIcon.Information, 3000)
+                    
+        except Exception as e:
+            utils.logger.error(f"保存文档失败：{e}")
+            self.tray_icon.showMessage('文本捕获工具', f'保存文档失败：{e}', QSystemTrayIcon.Critical, 3000)
+            
+    class CaptureThread(QThread):
+        """捕获线程类 - 在后台运行捕获循环（capture_core.CaptureLoop）"""
+        text_captured = pyqtSignal(str)  # 定义信号，用于发送捕获到的文本
+        
+        def __init__(self, max_capture_time=300, max_capture_count=10000, source=None, scheduler=None):
+            super().__init__()
+            # 捕获到的文本通过信号发给主线程
+            self.loop = capture_core.CaptureLoop(source, scheduler, max_capture_time, max_capture_count,
+                                                 on_text=self.text_captured.emit)
+        
+        @property
+        def capture_count(self):
+            """本次会话已捕获的次数"""
+            return self.loop.capture_count
+        
+        def run(self):
+            """线程运行函数"""
+            self.loop.run()
+        
+        def stop(self):
+            """停止线程"""
+            self.loop.stop()
+    
+    class PipelineThread(QThread):
+        """流水线线程类 - 在后台线程的asyncio事件循环中运行分阶段捕获流水线
+        
+        流水线的回调在流水线线程中调用，这里转成Qt信号交给主线程
+        """
+        entry_captured = pyqtSignal(object)  # 一条捕获已提交写入（CaptureEntry）
+        queue_depths_changed = pyqtSignal(dict)  # 各阶段队列深度变化
+        
+        def __init__(self, pipeline):
+            super().__init__()
+            self.pipeline = pipeline
+            self.pipeline.on_entry = self.entry_captured.emit
+            self.pipeline.on_queue_depths = self.queue_depths_changed.emit
+        
+        @property
+        def capture_count(self):
+            """本次会话已捕获的次数"""
+            return self.pipeline.capture_count
+        
+        def run(self):
+            """线程运行函数"""
+            self.pipeline.run()
+        
+        def stop(self):
+            """停止线程（已获取的文本处理完后退出）"""
+            self.pipeline.stop()
+    
+    class WriterThread(QThread):
+        """写入线程类 - 在后台运行批量写入（capture_core.CaptureWriter）
+        
+        捕获通过有界队列提交，线程每次取出队列中所有等待的捕获，
+        整批写入后最多保存一次文档；文档可以是任意格式的输出（见 output_sinks）
+        """
+        text_saved = pyqtSignal(int)  # 一批捕获写入成功，参数为条数
+        save_failed = pyqtSignal(str)  # 写入失败，参数为错误信息
+        queue_depth_changed = pyqtSignal(int)  # 待写入队列深度变化
+        backpressure = pyqtSignal(int)  # 磁盘过慢导致队列积压，参数为队列深度
+        
+        def __init__(self, sink, queue_size=256, max_batch_size=500, store=None):
+            super().__init__()
+            self.writer = capture_core.CaptureWriter(
+                sink, queue_size, max_batch_size, store,
+                on_saved=self.text_saved.emit,
+                on_failed=self.save_failed.emit,
+                on_queue_depth=self.queue_depth_changed.emit,
+                on_backpressure=self.backpressure.emit,
+            )
+        
+        @property
+        def path(self):
+            """写入的文档路径"""
+            return self.writer.path
+        
+        def queue_depth(self):
+            """当前待写入的捕获数"""
+            return self.writer.queue_depth()
+        
+        def submit(self, entry, timeout=0.5):
+            """提交一条捕获（CaptureEntry），队列已满且等待超时时返回False"""
+            return self.writer.submit(entry, timeout)
+        
+        def run(self):
+            """线程运行函数"""
+            self.writer.run()
+        
+        def stop(self):
+            """停止线程（队列中剩余的捕获写完后退出）"""
+            self.writer.stop()
+    
+    def handle_text_captured(self, selected_text):
+        """处理捕获到的文本：过滤、去重和打标签后提交给写入线程"""
+        entry = self.processor.process(selected_text)
+        if entry is not None:
+            self.save_entry(entry)
+    
+    def check_selection(self):
+        """检查当前选中的文本（单次检查）"""
+        try:
+            # 只有在捕获未启用时才进行单次检查
+            if not self.settings['capture_enabled']:
+                selected_text = utils.get_selected_text(deadline=config.config.get_probe_deadline_ms() / 1000.0,
+                                                       sanitize=False)
+                if selected_text:
+                    self.handle_text_captured(selected_text)
+                    
+        except Exception as e:
+            # 记录详细错误日志
+            utils.logger.error(f"检查选中文本时发生错误：{e}")
+            import traceback
+            utils.logger.error(traceback.format_exc())
+            
+    def browse_docx_path(self):
+        """浏览选择DOCX文档路径"""
+        try:
+            file_filter = ';;'.join(output_sinks.FORMAT_FILE_FILTERS.values())
+            file_path, _ = QFileDialog.getSaveFileName(None, '选择保存文档', self.docx_path_edit.text(), file_filter)
+            
+            if file_path:
+                self.docx_path_edit.setText(file_path)
+                
+        except Exception as e:
+            utils.logger.error(f"浏览DOCX文档路径失败：{e}")
+            self.tray_icon.showMessage('文本捕获工具', f'浏览DOCX文档路径失败：{e}', QSystemTrayIcon.Critical, 3000)
+            
+
+            
+    def save_settings(self):
+        """保存设置"""
+        try:
+            # 保存DOCX文档路径
+            docx_path = self.docx_path_edit.text()
+            if docx_path:
+                self.settings['docx_path'] = docx_path
+                
+                # 重新初始化文档
+                self.init_document()
+                
+
+                
+            # 批量修改配置，退出时一次性写入文件（没有变化则不写入）
+            with config.config.batch():
+                # 保存捕获间隔（转换为秒，因为配置文件中使用秒为单位）
+                capture_interval_ms = self.interval_spin.value()
+                capture_interval_sec = capture_interval_ms / 1000.0
+                config.config.set_capture_interval(capture_interval_sec)
+                
+                # 保存最小文本长度
+                min_text_length = self.min_length_spin.value()
+                config.config.set_min_text_length(min_text_length)
+                
+                # 保存最大文本长度
+                max_text_length = self.max_length_spin.value()
+                config.config.set_max_text_length(max_text_length)
+            
+            # 更新捕获定时器间隔（使用毫秒）
+            if self.capture_timer:
+                self.capture_timer.stop()
+                self.capture_timer.start(capture_interval_ms)
+                
+            utils.logger.info("设置已保存")
+            self.tray_icon.showMessage('文本捕获工具', '设置已保存', QSystemTrayIcon.Information, 3000)
+            
+            # 关闭设置窗口
+            if hasattr(self, 'settings_window') and self.settings_window:
+                self.settings_window.close()
+                self.settings_window = None
+                
+        except Exception as e:
+            utils.logger.error(f"保存设置失败：{e}")
+            self.tray_icon.showMessage('文本捕获工具', f'保存设置失败：{e}', QSystemTrayIcon.Critical, 3000)
+            
+    def start_writer_thread(self, sink):
+        """创建并启动写入线程"""
+        store = capture_core.create_store()
+        self.writer_thread = self.WriterThread(sink, config.config.get_writer_queue_size(), store=store)
+        self.writer_thread.text_saved.connect(self.handle_text_saved)
+        self.writer_thread.save_failed.connect(self.handle_save_failed)
+        self.writer_thread.queue_depth_changed.connect(self.handle_writer_queue_depth)
+        self.writer_thread.backpressure.connect(self.handle_writer_backpressure)
+        self.writer_thread.start()
+        return self.writer_thread
+        
+    def get_writer_thread(self):
+        """获取当前文档的写入线程，文档路径变化时重新创建"""
+        if self.writer_thread is None or self.writer_thread.path != self.settings['docx_path']:
+            self.stop_writer_thread()
+            self.start_writer_thread(capture_core.create_output_sink(self.settings['docx_path']))
+        return self.writer_thread
+        
+    def stop_writer_thread(self):
+        """停止写入线程，等待剩余捕获写入文档"""
+        if self.writer_thread:
+            self.writer_thread.stop()
+            self.writer_thread.wait()
+            self.writer_thread = None
+            self.handle_writer_queue_depth(0)
+            
+    def handle_text_saved(self, count):
+        """写入线程完成一批写入"""
+        utils.logger.info(f"文本保存成功（{count}条）")
+        self.update_tray_tooltip(self.writer_thread.queue_depth() if self.writer_thread else 0)
+        
+    def handle_save_failed(self, error):
+        """写入线程写入失败"""
+        self.tray_icon.showMessage('文本捕获工具', f'保存文本失败：{error}', QSystemTrayIcon.Critical, 3000)
+        
+    def handle_writer_queue_depth(self, depth):
+        """在托盘提示中显示待写入的捕获数"""
+        self.update_tray_tooltip(depth)
+        
+    def handle_entry_captured(self, entry):
+        """流水线提交了一条捕获"""
+        if utils.debug_enabled():
+            utils.logger.debug("流水线已提交捕获：%s", utils.truncate_text(entry.text, 50))
+        
+    def handle_pipeline_queue_depths(self, depths):
+        """在托盘提示中显示流水线中待处理的文本数"""
+        self.pipeline_depth = sum(depths.values())
+        self.update_tray_tooltip(self.writer_thread.queue_depth() if self.writer_thread else 0)
+        
+    def update_tray_tooltip(self, depth=0):
+        """更新托盘提示：待处理和待写入的捕获数，以及各阶段中位耗时"""
+        tooltip = f'文本捕获工具（待写入：{depth}）' if depth else '文本捕获工具'
+        if self.pipeline_depth:
+            tooltip += f'（待处理：{self.pipeline_depth}）'
+        summary = metrics.registry.summary()
+        if summary:
+            tooltip += f'\n{summary}'
+        self.tray_icon.setToolTip(tooltip)
+        
+    def toggle_profiling(self):
+        """切换性能分析状态（托盘菜单）"""
+        if self.profiler and self.profiler.is_running:
+            self.stop_profiling()
+        else:
+            self.start_profiling()
+            
+    def start_profiling(self):
+        """开始调用栈采样和内存快照分析"""
+        if self.profiler is None:
+            self.profiler = profiling.SessionProfiler(
+                sample_interval=config.config.get_profile_sample_interval_ms() / 1000.0)
+        self.profiler.start()
+        self.profiling_session = False
+        self.profile_action.setText('停止性能分析')
+        
+    def stop_profiling(self):
+        """停止性能分析并写出结果"""
+        if not (self.profiler and self.profiler.is_running):
+            return
+        written = self.profiler.stop()
+        self.profiling_session = False
+        self.profile_action.setText('开始性能分析')
+        if written:
+            self.tray_icon.showMessage('文本捕获工具', f'性能分析结果已保存到：{os.path.dirname(written[0])}', QSystemTrayIcon.Information, 3000)
+            
+    def start_metrics_server(self):
+        """启动本地指标接口（只监听127.0.0.1）"""
+        try:
+            self.metrics_server = metrics.MetricsServer(metrics.registry, config.config.get_metrics_port()).start()
+            utils.logger.info(f"指标接口已启动：http://127.0.0.1:{self.metrics_server.port}/metrics")
+        except OSError as e:
+            self.metrics_server = None
+            utils.logger.error(f"启动指标接口失败：{e}")
+            
+    def stop_metrics_server(self):
+        """停止本地指标接口"""
+        if self.metrics_server:
+            self.metrics_server.stop()
+            self.metrics_server = None
+            
+    def handle_writer_backpressure(self, depth):
+        """磁盘过慢，写入队列积压"""
+        utils.logger.warning(f"写入队列积压，待写入：{depth}")
+        self.handle_writer_queue_depth(depth)
+            
+    def save_text(self, text, source_tag='[未知来源]', entry_id=None, replace=False, process_name=None):
+        """保存文本到捕获存储和DOCX文档
+        
+        Args:
+            text: 捕获的文本
+            source_tag: 来源标签
+            entry_id: 捕获编号，用于之后原地更新
+            replace: 是否更新 entry_id 对应的捕获而不是新增段落
+            process_name: 来源进程名（写入捕获存储）
+        """
+        # 捕获来源已经清理过文本，这里不再重复清理
+        if not text:
+            utils.logger.debug("尝试保存空文本，已跳过")
+            return
+        self.save_entry(self.processor.make_entry(text, source_tag, entry_id, replace, process_name))
+        
+    def save_entry(self, entry):
+        """把一条捕获（CaptureEntry）提交给写入线程，由写入线程批量写入捕获存储和文档"""
+        try:
+            # 添加详细日志
+            if utils.debug_enabled():
+                utils.logger.debug("准备保存文本：%s（来源：%s，保存路径：%s）",
+                                   utils.truncate_text(entry.text, 100), entry.source_tag, self.settings['docx_path'])
+            
+            with metrics.timed('submit'):
+                submitted = self.get_writer_thread().submit(entry)
+            if not submitted:
+                raise Exception("写入队列已满，磁盘写入过慢")
+            
+        except Exception as e:
+            utils.logger.error(f"保存文本失败：{e}")
+            import traceback
+            utils.logger.error(traceback.format_exc())
+            self.tray_icon.showMessage('文本捕获工具', f'保存文本失败：{e}', QSystemTrayIcon.Critical, 3000)
+            
+    def start_screenshot(self):
+        """开始截图"""
+        self.is_screenshotting = False  # 初始状态为未开始选择
+        self.has_started_selection = False  # 是否已经开始选择
+        self.screenshot_start = None
+        self.screenshot_end = None
+        
+        # 创建截图区域选择窗口
+        self.screenshot_widget = QWidget()
+        self.screenshot_widget.setWindowFlags(Qt.FramelessWindowHint | Qt.WindowStaysOnTopHint)
+        
+        # 设置窗口为完全透明（不绘制背景）
+        self.screenshot_widget.setAttribute(Qt.WA_TranslucentBackground)
+        
+        # 获取整个屏幕的大小（适合截图全屏）
+        screen_rect = QApplication.desktop().screenGeometry()
+        self.screenshot_widget.setGeometry(screen_rect)
+        
+        # 添加绘制事件
+        self.screenshot_widget.paintEvent = self.on_screenshot_paint
+        
+        # 设置鼠标跟踪，确保能捕获鼠标移动事件
+        self.screenshot_widget.setMouseTracking(True)
+        
+        # 确保窗口获得焦点
+        self.screenshot_widget.raise_()
+        self.screenshot_widget.activateWindow()
+        
+        self.screenshot_widget.show()
+        
+        # 捕获全局鼠标事件
+        self.screenshot_widget.grabMouse()
+        
+        # 监听鼠标按下、移动和释放事件
+        self.screenshot_widget.mousePressEvent = self.on_screenshot_mouse_press
+        self.screenshot_widget.mouseMoveEvent = self.on_screenshot_mouse_move
+        self.screenshot_widget.mouseReleaseEvent = self.on_screenshot_mouse_release
+        
+        utils.logger.info("开始截图，等待第一次点击设置起始点")
+        
+    def on_screenshot_paint(self, event):
+        """截图窗口绘制事件"""
+        painter = QPainter(self.screenshot_widget)
+        
+        # 禁用抗锯齿以提高性能
+        # painter.setRenderHint(QPainter.Antialiasing, False)
+        
+        # 不绘制任何背景，保持窗口完全透明，让用户能看到屏幕内容
+        
+        # 如果已经开始选择，绘制十字准星和选择区域
+        if self.is_screenshotting and self.has_started_selection:
+            # 绘制十字准星（使用简单线条，提高性能）
+            painter.setPen(QPen(QColor(255, 0, 0), 1))
+            
+            # 水平线
+            painter.drawLine(0, self.screenshot_end.y(), 
+                            self.screenshot_widget.width(), self.screenshot_end.y())
+            # 垂直线
+            painter.drawLine(self.screenshot_end.x(), 0,
+                            self.screenshot_end.x(), self.screenshot_widget.height())
+            
+            # 绘制选择区域（只要起始点和结束点不同就绘制）
+            if self.screenshot_start != self.screenshot_end:
+                x1 = min(self.screenshot_start.x(), self.screenshot_end.x())
+                y1 = min(self.screenshot_start.y(), self.screenshot_end.y())
+                x2 = max(self.screenshot_start.x(), self.screenshot_end.x())
+                y2 = max(self.screenshot_start.y(), self.screenshot_end.y())
+                
+                # 绘制选择区域边框（使用简单边框）
+                painter.setPen(QPen(QColor(255, 0, 0), 2))
+                painter.drawRect(x1, y1, x2 - x1, y2 - y1)
+                
+                # 绘制选择区域内部（简化透明度）
+                painter.fillRect(x1, y1, x2 - x1, y2 - y1, QColor(0, 0, 0, 60))
+                
+                # 只在区域很大时才显示尺寸信息，减少文本绘制开销
+                if (x2 - x1) > 200 and (y2 - y1) > 100:
+                    painter.setPen(QColor(255, 0, 0))
+                    painter.setBrush(QColor(255, 255, 255, 200))
+                    painter.drawRect(x1, y1 - 25, 100, 20)
+                    painter.setPen(QColor(0, 0, 0))
+                    painter.drawText(x1 + 5, y1 - 10, f"{x2 - x1} x {y2 - y1}")
+        
+        painter.end()
+        
+    def on_screenshot_mouse_press(self, event):
+        """截图时鼠标按下事件"""
+        if event.button() == Qt.LeftButton:
+            if not self.has_started_selection:
+                # 第一次点击：设置起始点（使用窗口相对坐标）
+                self.screenshot_start = event.pos()
+                self.screenshot_end = self.screenshot_start
+                self.has_started_selection = True
+                self.is_screenshotting = True
+                utils.logger.info(f"设置选择起始点：{self.screenshot_start}")
+            else:
+                # 第二次点击：结束选择
+                utils.logger.info("结束选择区域，执行OCR识别")
+                
+                # 计算截图区域（使用全局坐标进行截图）
+                if self.screenshot_start and self.screenshot_end:
+                    # 获取窗口在屏幕上的位置
+                    window_pos = self.screenshot_widget.mapToGlobal(QPoint(0, 0))
+                    
+                    # 将窗口相对坐标转换为全局坐标
+                    global_start = self.screenshot_widget.mapToGlobal(self.screenshot_start)
+                    global_end = self.screenshot_widget.mapToGlobal(self.screenshot_end)
+                    
+                    x1 = min(global_start.x(), global_end.x())
+                    y1 = min(global_start.y(), global_end.y())
+                    x2 = max(global_start.x(), global_end.x())
+                    y2 = max(global_start.y(), global_end.y())
+                    
+                    # 确保区域有效
+                    if x2 - x1 > 10 and y2 - y1 > 10:
+                        # 截图
+                        screenshot = utils.capture_screen(bbox=(x1, y1, x2, y2))
+                        
+                        # OCR识别
+                        if screenshot is not None:
+                            self.perform_ocr(screenshot)
+                        else:
+                            utils.logger.error("截图失败，无法进行OCR识别")
+                    else:
+                        utils.logger.info("截图区域太小，取消截图")
+                
+                # 完全退出OCR识别模式
+                self.exit_screenshot_mode()
+            
+            # 重绘窗口
+            self.screenshot_widget.update()
+    
+    def exit_screenshot_mode(self):
+        """完全退出截图模式"""
+        # 隐藏截图窗口
+        if self.screenshot_widget:
+            self.screenshot_widget.hide()
+        
+        # 重置所有状态
+        self.is_screenshotting = False
+        self.has_started_selection = False
+        self.screenshot_start = None
+        self.screenshot_end = None
+        
+        # 释放鼠标捕获
+        if self.screenshot_widget:
+            self.screenshot_widget.releaseMouse()
+            self.screenshot_widget.releaseKeyboard()
+        
+        utils.logger.info("已退出OCR识别模式")
+    
+    def on_screenshot_mouse_move(self, event):
+        """截图时鼠标移动事件"""
+        if self.is_screenshotting and self.has_started_selection:
+            # 使用窗口相对坐标，确保绘制位置正确
+            new_pos = event.pos()
+            
+            # 只有当鼠标位置有较大变化时才更新，大幅减少重绘频率
+            if (self.screenshot_end is None or 
+                abs(new_pos.x() - self.screenshot_end.x()) > 3 or 
+                abs(new_pos.y() - self.screenshot_end.y()) > 3):
+                
+                self.screenshot_end = new_pos
+                # 使用update()而不是repaint()，让Qt优化重绘时机
+                self.screenshot_widget.update()
+        
+    def on_screenshot_mouse_release(self, event):
+        """截图时鼠标释放事件"""
+        # 现在通过鼠标按下事件处理选择逻辑
+        pass
+        
+
+            
+    def register_hotkeys(self):
+        """注册快捷键"""
+        try:
+            from PyQt5.QtGui import QKeySequence
+            
+            # 创建一个隐藏的窗口作为快捷键的父部件
+            self.hotkey_window = QWidget()
+            self.hotkey_window.setWindowFlags(Qt.Tool | Qt.FramelessWindowHint)
+            self.hotkey_window.setVisible(False)
+            
+            # 注释掉OCR快捷键注册，取消OCR功能
+            # shortcut = QShortcut(QKeySequence('Ctrl+Alt+O'), self.hotkey_window)
+            # shortcut.activated.connect(self.start_screenshot)
+            
+            utils.logger.info("已取消OCR快捷键注册")
+            
+        except Exception as e:
+            utils.logger.error(f"注册快捷键失败：{e}")
+            
+    def show_settings(self):
+        """显示设置界面"""
+        try:
+            # 创建设置窗口
+            settings_window = QWidget()
+            settings_window.setWindowTitle('文本捕获工具 - 设置')
+            settings_window.setGeometry(200, 200, 500, 400)
+            settings_window.setWindowFlags(Qt.WindowStaysOnTopHint)
+            
+            # 创建布局
+            layout = QVBoxLayout()
+            
+            # DOCX文档路径设置
+            docx_layout = QHBoxLayout()
+            docx_label = QLabel('DOCX文档路径：')
+            self.docx_path_edit = QLineEdit(self.settings['docx_path'])
+            self.docx_path_edit.setReadOnly(True)
+            docx_browse_btn = QPushButton('浏览')
+            docx_browse_btn.clicked.connect(self.browse_docx_path)
+            
+            docx_layout.addWidget(docx_label)
+            docx_layout.addWidget(self.docx_path_edit)
+            docx_layout.addWidget(docx_browse_btn)
+            layout.addLayout(docx_layout)
+            
+
+            
+            # 捕获间隔设置
+            interval_layout = QHBoxLayout()
+            interval_label = QLabel('捕获间隔（毫秒）：')
+            self.interval_spin = QSpinBox()
+            self.interval_spin.setRange(500, 5000)
+            # 将浮点数秒转换为整数毫秒
+            interval_ms = int(config.config.get_capture_interval() * 1000)
+            self.interval_spin.setValue(interval_ms)
+            
+            interval_layout.addWidget(interval_label)
+            interval_layout.addWidget(self.interval_spin)
+            layout.addLayout(interval_layout)
+            
+            # 最小文本长度设置
+            min_length_layout = QHBoxLayout()
+            min_length_label = QLabel('最小文本长度：')
+            self.min_length_spin = QSpinBox()
+            self.min_length_spin.setRange(1, 100)
+            self.min_length_spin.setValue(config.config.get_min_text_length())
+            
+            min_length_layout.addWidget(min_length_label)
+            min_length_layout.addWidget(self.min_length_spin)
+            layout.addLayout(min_length_layout)
+            
+            # 最大文本长度设置
+            max_length_layout = QHBoxLayout()
+            max_length_label = QLabel('最大文本长度：')
+            self.max_length_spin = QSpinBox()
+            self.max_length_spin.setRange(100, 10000)
+            self.max_length_spin.setValue(config.config.get_max_text_length())
+            
+            max_length_layout.addWidget(max_length_label)
+            max_length_layout.addWidget(self.max_length_spin)
+            layout.addLayout(max_length_layout)
+            
+            # 按钮布局
+            button_layout = QHBoxLayout()
+            save_btn = QPushButton('保存设置')
+            save_btn.clicked.connect(self.save_settings)
+            cancel_btn = QPushButton('取消')
+            cancel_btn.clicked.connect(settings_window.close)
+            
+            button_layout.addWidget(save_btn)
+            button_layout.addWidget(cancel_btn)
+            layout.addLayout(button_layout)
+            
+            # 设置布局
+            settings_window.setLayout(layout)
+            
+            # 显示窗口
+            settings_window.show()
+            
+            # 保存窗口引用，防止被垃圾回收
+            self.settings_window = settings_window
+            
+        except Exception as e:
+            utils.logger.error(f"显示设置界面失败：{e}")
+            self.tray_icon.showMessage('文本捕获工具', f'显示设置界面失败：{e}', QSystemTrayIcon.Critical, 3000)
+            
+    def open_document(self):
+        """打开文档"""
+        try:
+            # 多分片会话打开最新的分片
+            document_path = shards.latest_shard(self.settings['docx_path'])
+            if os.path.exists(document_path):
+                os.startfile(document_path)
+                utils.logger.info(f"文档已打开：{document_path}")
+            else:
+                utils.logger.warning("打开文档失败：文档不存在")
+                self.tray_icon.showMessage('文本捕获工具', '文档不存在', QSystemTrayIcon.Warning, 3000)
+                
+        except Exception as e:
+            utils.logger.error(f"打开文档失败：{e}")
+            self.tray_icon.showMessage('文本捕获工具', f'打开文档失败：{e}', QSystemTrayIcon.Critical, 3000)
+            
+    def show_about(self):
+        """显示关于对话框"""
+        try:
+            about_text = "文本捕获工具 v1.0\n\n" \
+                        "一个能够自动捕获并记录全局文本选择内容的工具。\n" \
+                        "支持快捷键操作、区域OCR识别、文本自动保存到Word文档等功能。\n\n" \
+                        "开发者：出久君\n" \
+                        "联系邮箱：2744314855@qq.com\n\n" \
+                        "版权所有 © 2025" \
+                        
+            QMessageBox.about(None, '关于文本捕获工具', about_text)
+            utils.logger.info("显示关于对话框")
+            
+        except Exception as e:
+            utils.logger.error(f"显示关于对话框失败：{e}")
+            self.tray_icon.showMessage('文本捕获工具', f'显示关于对话框失败：{e}', QSystemTrayIcon.Critical, 3000)
+            
+    def create_icon(self, active=False):
+        """创建简单的图标"""
+        from io import BytesIO
+        from PIL import Image, ImageDraw, ImageFont
+        
+        # 创建16x16像素的图标
+        img = Image.new('RGB', (16, 16), color='blue' if active else 'gray')
+        d = ImageDraw.Draw(img)
+        
+        try:
+            # 使用系统默认字体
+            font = ImageFont.truetype("arial.ttf", 8)
+        except:
+            font = ImageFont.load_default()
+            
+        d.text((1, 1), "T", fill='white', font=font)
+        
+        # 保存到内存
+        buffer = BytesIO()
+        img.save(buffer, format='PNG')
+        
+        return buffer
+        
+    def run(self):
+        """运行应用程序"""
+        print("应用程序已启动")
+        utils.logger.info("应用程序主循环已启动")
+        return self.exec_()
+        
+
+def main():
+    """主函数"""
+    try:
+        # 创建应用程序
+        app = TextCaptureApp(sys.argv)
+        
+        # 启动性能测试：托盘图标显示后立即退出（见 benchmarks/bench_startup.py）
+        if '--exit-after-startup' in sys.argv:
+            QTimer.singleShot(0, app.quit)
+        
+        # 运行应用程序
+        sys.exit(app.run())
+        
+    except Exception as e:
+        print(f"应用程序启动失败：{e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
+        
+
+if __name__ == '__main__':
+    main()
\ No newline at end of file
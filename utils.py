@@ -7,19 +7,106 @@
 import os
 import sys
 import time
+import atexit
+import queue
 import traceback
 from datetime import datetime
 import logging
+import logging.handlers
 
-# 配置日志
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler(os.path.join(os.path.dirname(__file__), 'text_capture.log'), encoding='utf-8'),
-        logging.StreamHandler(sys.stdout)
-    ]
-)
+import metrics
+
+LOG_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+# 日志文件路径
+LOG_FILE = os.path.join(os.path.dirname(__file__), 'text_capture.log')
+# 日志文件达到该大小后轮转
+LOG_MAX_BYTES = 5 * 1024 * 1024
+# 保留的轮转日志个数
+LOG_BACKUP_COUNT = 3
+
+# 后台写日志的监听线程和文件处理器
+_log_listener = None
+_log_file_handler = None
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """把日志记录放入队列，第一条日志到来时才启动后台监听线程
+    
+    只导入模块、没有输出日志时不启动线程，也不注册退出时的清理
+    """
+    
+    def __init__(self, log_queue, *handlers):
+        super().__init__(log_queue)
+        self.handlers = handlers
+        self.listener_started = False
+    
+    def enqueue(self, record):
+        # Handler.handle 在 self.lock 内调用 emit，监听线程只会启动一次
+        if not self.listener_started:
+            self.listener_started = True
+            start_log_listener(self.queue, *self.handlers)
+        super().enqueue(record)
+
+
+def start_log_listener(log_queue, *handlers):
+    """启动后台写日志的监听线程"""
+    global _log_listener
+    _log_listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _log_listener.start()
+    atexit.register(stop_logging)
+
+
+def setup_logging(level=logging.INFO, max_bytes=LOG_MAX_BYTES, backup_count=LOG_BACKUP_COUNT):
+    """配置日志
+    
+    调用线程只把日志记录放入队列，写文件和输出到控制台由后台监听线程完成，
+    捕获线程不会因为磁盘或控制台I/O阻塞；监听线程在第一条日志到来时才启动，
+    日志文件按大小轮转，在第一次写入时才打开
+    """
+    global _log_file_handler
+    
+    formatter = logging.Formatter(LOG_FORMAT)
+    _log_file_handler = logging.handlers.RotatingFileHandler(
+        LOG_FILE, maxBytes=max_bytes, backupCount=backup_count, encoding='utf-8', delay=True)
+    _log_file_handler.setFormatter(formatter)
+    stream_handler = logging.StreamHandler(sys.stdout)
+    stream_handler.setFormatter(formatter)
+    
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    root.addHandler(DeferredQueueHandler(queue.SimpleQueue(), _log_file_handler, stream_handler))
+    root.setLevel(level)
+
+
+def configure_logging(level=None, max_bytes=None, backup_count=None):
+    """按配置修改日志级别和轮转参数"""
+    if level is not None:
+        if isinstance(level, str):
+            level = logging.getLevelName(level.upper())
+        if isinstance(level, int):
+            logging.getLogger().setLevel(level)
+    if _log_file_handler is not None:
+        if max_bytes is not None:
+            _log_file_handler.maxBytes = int(max_bytes)
+        if backup_count is not None:
+            _log_file_handler.backupCount = int(backup_count)
+
+
+def stop_logging():
+    """停止后台日志线程，写完队列中剩余的日志"""
+    global _log_listener
+    if _log_listener is not None:
+        _log_listener.stop()
+        _log_listener = None
+
+
+def debug_enabled():
+    """是否输出调试日志；调试日志的参数计算较重时先检查，级别关闭时完全跳过"""
+    return logger.isEnabledFor(logging.DEBUG)
+
+
+setup_logging()
 logger = logging.getLogger(__name__)
 
 
@@ -73,14 +160,18 @@ def get_log_file_path():
 
 
 def clean_old_logs(days=30):
-    """清理旧日志文件"""
+    """清理旧日志文件
+    
+    当前日志文件按大小轮转，不会整个删除；这里只清理超过 days 天未修改的轮转日志
+    """
     try:
-        log_file = get_log_file_path()
-        if os.path.exists(log_file):
-            file_mod_time = os.path.getmtime(log_file)
-            current_time = time.time()
-            
-            if (current_time - file_mod_time) > days * 24 * 60 * 60:
+        current_time = time.time()
+        backup_count = _log_file_handler.backupCount if _log_file_handler else LOG_BACKUP_COUNT
+        for index in range(1, backup_count + 1):
+            log_file = f"{LOG_FILE}.{index}"
+            if not os.path.exists(log_file):
+                continue
+            if (current_time - os.path.getmtime(log_file)) > days * 24 * 60 * 60:
                 os.remove(log_file)
                 logger.info(f"旧日志文件已清理: {log_file}")
     except Exception as e:
@@ -113,21 +204,11 @@ def validate_file_path(file_path, extension=None):
 
 
 def sanitize_text(text):
-    """清理文本内容"""
+    """清理文本内容（使用 sanitizer 模块的默认清理策略）"""
     try:
-        if not isinstance(text, str):
-            return ""
-        
-        # 去除首尾空白字符
-        sanitized = text.strip()
-        
-        # 替换多个换行符为单个换行符
-        sanitized = '\n'.join([line.strip() for line in sanitized.split('\n') if line.strip()])
+        import sanitizer
         
-        # 替换多个空格为单个空格
-        sanitized = ' '.join(sanitized.split())
-        
-        return sanitized
+        return sanitizer.sanitize(text)
     except Exception as e:
         logger.error(f"清理文本失败: {e}")
         return ""
@@ -166,26 +247,117 @@ def get_process_name(pid):
         return "unknown.exe"
 
 
-def get_active_window_process_name():
-    """获取当前活动窗口的进程名"""
+def get_process_create_time(pid):
+    """获取进程创建时间，用于识别被复用的进程ID；获取失败时返回None"""
     try:
-        import win32gui
-        import win32process
-        
-        # 获取当前活动窗口
-        hwnd = win32gui.GetForegroundWindow()
+        import psutil
         
-        if hwnd == 0:
+        return psutil.Process(pid).create_time()
+    except Exception as e:
+        logger.debug("获取进程创建时间失败 PID=%s: %s", pid, e)
+        return None
+
+
+def get_foreground_window():
+    """获取当前前台窗口句柄"""
+    import win32gui
+    
+    return win32gui.GetForegroundWindow()
+
+
+def get_window_process_id(hwnd):
+    """获取窗口所属的进程ID"""
+    import win32process
+    
+    _, pid = win32process.GetWindowThreadProcessId(hwnd)
+    return pid
+
+
+class ProcessNameCache:
+    """前台窗口进程名缓存
+    
+    以 (窗口句柄, 进程ID, 进程创建时间) 为键缓存进程名：
+    - 前台窗口与上次查询相同时直接命中，不访问进程信息
+    - 切换到缓存中已有的窗口时，只核对进程创建时间，防止进程ID被复用后返回旧进程名
+    - 超过容量时淘汰最久未使用的记录
+    
+    窗口和进程查询函数均可注入，便于在非Windows环境测试
+    """
+    
+    def __init__(self, max_size=64, foreground_window_func=None, window_pid_func=None,
+                 create_time_func=None, process_name_func=None):
+        from collections import OrderedDict
+        
+        self.max_size = max(1, max_size)
+        self.get_foreground_window = foreground_window_func or get_foreground_window
+        self.get_window_pid = window_pid_func or get_window_process_id
+        self.get_create_time = create_time_func or get_process_create_time
+        self.get_name = process_name_func or get_process_name
+        self.entries = OrderedDict()  # (hwnd, pid) -> (create_time, process_name)
+        self.last_window = None  # 上次查询的 (hwnd, pid)
+        self.hits = 0
+        self.misses = 0
+    
+    def lookup(self):
+        """获取当前前台窗口的进程名，没有前台窗口时返回空字符串"""
+        hwnd = self.get_foreground_window()
+        if not hwnd:
             return ""
         
-        # 获取进程ID
-        _, pid = win32process.GetWindowThreadProcessId(hwnd)
-        
-        if pid == 0:
+        pid = self.get_window_pid(hwnd)
+        if not pid:
             return ""
         
-        # 获取进程名
-        return get_process_name(pid)
+        window = (hwnd, pid)
+        entry = self.entries.get(window)
+        
+        # 前台窗口没有变化：窗口还在，所属进程不可能退出并被复用
+        if entry is not None and window == self.last_window:
+            self.hits += 1
+            return entry[1]
+        
+        create_time = self.get_create_time(pid)
+        self.last_window = window
+        
+        if entry is not None and entry[0] == create_time:
+            self.hits += 1
+            self.entries.move_to_end(window)
+            return entry[1]
+        
+        self.misses += 1
+        process_name = self.get_name(pid)
+        self.entries[window] = (create_time, process_name)
+        self.entries.move_to_end(window)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+        return process_name
+    
+    def clear(self):
+        """清空缓存和计数"""
+        self.entries.clear()
+        self.last_window = None
+        self.hits = 0
+        self.misses = 0
+    
+    def stats(self):
+        """获取缓存命中统计"""
+        total = self.hits + self.misses
+        return {
+            'size': len(self.entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / total, 3) if total else 0.0,
+        }
+
+
+# 全局前台窗口进程名缓存
+process_name_cache = ProcessNameCache()
+
+
+def get_active_window_process_name():
+    """获取当前活动窗口的进程名（经过进程名缓存）"""
+    try:
+        return process_name_cache.lookup()
     except ImportError as e:
         logger.error(f"win32gui或win32process模块未安装: {e}")
         return ""
@@ -194,6 +366,21 @@ def get_active_window_process_name():
         return ""
 
 
+def get_active_window_title():
+    """获取当前活动窗口的标题"""
+    try:
+        import win32gui
+        
+        hwnd = get_foreground_window()
+        return win32gui.GetWindowText(hwnd) if hwnd else ""
+    except ImportError as e:
+        logger.error(f"win32gui模块未安装: {e}")
+        return ""
+    except Exception as e:
+        logger.error(f"获取当前活动窗口标题失败: {e}")
+        return ""
+
+
 def show_notification(title, message, timeout=5000):
     """显示系统通知"""
     try:
@@ -287,60 +474,158 @@ def save_text_to_docx(text, docx_path, source_tag=None):
         return False
 
 
-def get_selected_text() -> str:
+class ProbeStats:
+    """记录每次复制探测的耗时，用于调整探测截止时间"""
+    
+    def __init__(self, max_samples=1000):
+        from collections import deque
+        
+        self.latencies = deque(maxlen=max_samples)  # 最近的探测耗时（秒）
+        self.count = 0  # 探测总次数
+        self.timeouts = 0  # 超过截止时间仍未复制到内容的次数
+    
+    def record(self, latency, timed_out):
+        """记录一次探测"""
+        self.latencies.append(latency)
+        self.count += 1
+        if timed_out:
+            self.timeouts += 1
+    
+    def percentile(self, percent):
+        """获取最近探测耗时的百分位数（秒）"""
+        if not self.latencies:
+            return 0.0
+        ordered = sorted(self.latencies)
+        index = min(len(ordered) - 1, int(len(ordered) * percent / 100))
+        return ordered[index]
+    
+    def summary(self):
+        """获取探测耗时统计（毫秒）"""
+        return {
+            'count': self.count,
+            'timeouts': self.timeouts,
+            'p50_ms': round(self.percentile(50) * 1000, 1),
+            'p90_ms': round(self.percentile(90) * 1000, 1),
+            'p99_ms': round(self.percentile(99) * 1000, 1),
+            'max_ms': round(max(self.latencies, default=0.0) * 1000, 1),
+        }
+
+
+# 全局探测耗时统计
+probe_stats = ProbeStats()
+
+
+def send_ctrl_c(key_delay=0.01):
+    """
+    模拟按下Ctrl+C（Windows）
+    
+    Args:
+        key_delay: 按下和释放之间的间隔（秒）；按键事件连续到达时，
+            部分程序（Electron、远程桌面、某些Java界面）会漏掉组合键
+    """
+    import ctypes
+    
+    user32 = ctypes.windll.user32
+    user32.keybd_event(0x11, 0, 0, 0)  # Ctrl键按下
+    time.sleep(key_delay)
+    user32.keybd_event(0x43, 0, 0, 0)  # C键按下
+    time.sleep(key_delay)
+    user32.keybd_event(0x43, 0, 2, 0)  # C键释放
+    time.sleep(key_delay)
+    user32.keybd_event(0x11, 0, 2, 0)  # Ctrl键释放
+
+
+def probe_selected_text(clipboard, send_copy, deadline=0.3, poll_interval=0.005,
+                        clock=time.perf_counter, sleep=time.sleep, stats=None):
+    """
+    模拟复制并等待剪贴板变化，变化后立即返回
+    
+    剪贴板原内容（所有格式）通过 clipboard_tx 的事务保存，只有剪贴板确实被改动过时才恢复：
+    支持序号的剪贴板不需要先清空，没有选中文本时整个探测不写剪贴板；
+    剪贴板内容没有变化时沿用上次的快照，不再读取
+    
+    Args:
+        clipboard: clipboard_tx.Clipboard 剪贴板
+        send_copy: 发送复制按键的函数
+        deadline: 最长等待时间（秒）
+        poll_interval: 检查剪贴板的间隔（秒）
+        clock: 计时函数
+        sleep: 休眠函数
+        stats: 记录探测耗时的ProbeStats，默认使用全局 probe_stats
+    
+    Returns:
+        str: 复制到的原始文本，超时或没有选中文本时返回空字符串
+    """
+    stats = stats if stats is not None else probe_stats
+    
+    copied_text = ""
+    timed_out = True
+    with clipboard.begin() as transaction:
+        # 没有序号时只能通过剪贴板出现文本判断复制完成，需要先清空
+        use_sequence = transaction.start_sequence is not None
+        if not use_sequence and transaction.snapshot.formats:
+            clipboard.clear()
+            transaction.mark_changed()
+        
+        start_time = clock()
+        send_copy()
+        
+        # 等待剪贴板序号或内容变化，变化后立即读取
+        while True:
+            if use_sequence:
+                if clipboard.sequence() != transaction.start_sequence:
+                    with metrics.timed('paste'):
+                        copied_text = clipboard.read_text()
+                    timed_out = False
+                    break
+            else:
+                with metrics.timed('paste'):
+                    copied_text = clipboard.read_text()
+                if copied_text:
+                    transaction.mark_changed()
+                    timed_out = False
+                    break
+            
+            if clock() - start_time >= deadline:
+                break
+            sleep(poll_interval)
+        latency = clock() - start_time
+    
+    stats.record(latency, timed_out)
+    metrics.observe('probe', latency)
+    metrics.increment('probe_timeouts' if timed_out else 'probes')
+    logger.debug("复制探测耗时：%.1fms（%s）", latency * 1000, '超时' if timed_out else '完成')
+    
+    return copied_text or ""
+
+
+def get_selected_text(deadline=0.3, sanitize=True) -> str:
     """
     获取当前系统中选中的文本（通过模拟Ctrl+C操作）
     
+    Args:
+        deadline: 等待复制完成的最长时间（秒）
+        sanitize: 是否清理文本；捕获流程传入False，先去重再由 CaptureProcessor 清理
+    
     Returns:
         str: 选中的文本内容，如果获取失败则返回空字符串
     """
     try:
-        import pyperclip
-        import ctypes
-        import time
-        from ctypes import wintypes
+        import clipboard_tx
         
-        # 定义Windows API函数
-        user32 = ctypes.windll.user32
-        
-        # 保存当前剪贴板内容，以便稍后恢复
-        try:
-            original_clipboard = pyperclip.paste()
-        except Exception:
-            original_clipboard = ""
-        
-        # 清空剪贴板
-        pyperclip.copy("")
-        
-        # 发送Ctrl+C命令复制选中文本（优化时间间隔）
-        user32.keybd_event(0x11, 0, 0, 0)  # Ctrl键按下
-        time.sleep(0.02)  # 减少等待时间
-        user32.keybd_event(0x43, 0, 0, 0)  # C键按下
-        time.sleep(0.1)   # 大幅减少等待时间
-        user32.keybd_event(0x43, 0, 2, 0)  # C键释放
-        time.sleep(0.02)  # 减少等待时间
-        user32.keybd_event(0x11, 0, 2, 0)  # Ctrl键释放
-        
-        # 等待系统处理复制操作（优化时间）
-        time.sleep(0.05)  # 大幅减少等待时间
-        
-        # 获取剪贴板内容
-        copied_text = pyperclip.paste()
-        logger.debug(f"从剪贴板获取到文本: {repr(copied_text)}")
+        copied_text = probe_selected_text(clipboard_tx.get_clipboard(), send_ctrl_c, deadline=deadline)
+        if debug_enabled():
+            logger.debug("从剪贴板获取到文本: %s", truncate_text(repr(copied_text), 200))
         
         # 如果获取到的文本为空，可能是没有选中文本
         if not copied_text or copied_text.strip() == "":
             logger.warning("剪贴板中没有可用的选中文本")
-            # 恢复原来的剪贴板内容
-            if original_clipboard:
-                pyperclip.copy(original_clipboard)
             return ""
         
-        # 恢复原来的剪贴板内容
-        if original_clipboard:
-            pyperclip.copy(original_clipboard)
-        
-        return sanitize_text(copied_text)
+        if not sanitize:
+            return copied_text
+        with metrics.timed('sanitize'):
+            return sanitize_text(copied_text)
         
     except ImportError:
         logger.error("pyperclip模块未安装")
@@ -388,7 +673,7 @@ def is_user_active():
         return True  # 如果无法获取信息，默认认为用户活跃
         
     except Exception as e:
-        logger.debug(f"检测用户活动状态失败: {e}")
+        logger.debug("检测用户活动状态失败: %s", e)
         return True  # 如果出错，默认认为用户活跃
 
 